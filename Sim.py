@@ -3,10 +3,10 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import cv2
 import os
-import math
 import serial
 import time
 from matplotlib.patches import Circle
+from ik_table import analytic_ik, forward_kinematics_batch
 
 # Thông số robot SCARA
 L1, L2 = 140, 120  # Chiều dài các khâu (mm)
@@ -160,6 +160,18 @@ def forward_kinematics(theta1, theta2):
     
     return (x1, y1), (x2, y2)
 
+def compute_arm_trajectory(points):
+    """Tính động học ngược rồi động học thuận cho toàn bộ đường đi một lần
+    
+    Trả về (angles, reachable, elbow, tip): góc khớp (N, 2) theo độ, mặt nạ điểm trong tầm với,
+    vị trí khuỷu và đầu bút (N, 2) cho từng khung hình của animation.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    theta1, theta2, reachable = analytic_ik(points, L1, L2, elbow_up=True)
+    
+    elbow, tip = forward_kinematics_batch(theta1, theta2, L1, L2)
+    return np.column_stack((theta1, theta2)), reachable, elbow, tip
+
 def update(frame):
     """Hàm cập nhật cho animation"""
     if frame >= len(robot_points):
@@ -168,16 +180,11 @@ def update(frame):
     x, y = robot_points[frame]
     
     # Kiểm tra xem điểm có nằm trong phạm vi làm việc không
-    d = math.sqrt(x**2 + y**2)
-    if d > L1 + L2 or d < abs(L1 - L2):
+    if not arm_reachable[frame]:
         print(f"Điểm ({x:.1f}, {y:.1f}) nằm ngoài phạm vi hoạt động, bỏ qua.")
         return []
         
-    result = inverse_kinematics(x, y)
-    if result is None:
-        return []
-        
-    theta1, theta2 = result
+    theta1, theta2 = arm_angles[frame]
 
     # Gửi góc tới Arduino nếu được kết nối
     if arduino_connected:
@@ -190,8 +197,9 @@ def update(frame):
         if response:
             print(f"Arduino phản hồi: {response}")
 
-    # Tính toán tọa độ Cartesian của các khớp
-    (x1, y1), (x2, y2) = forward_kinematics(theta1, theta2)
+    # Tọa độ Cartesian của các khớp lấy từ động học thuận đã tính sẵn
+    x1, y1 = arm_elbow[frame]
+    x2, y2 = arm_tip[frame]
 
     # Cập nhật danh sách các điểm đã vẽ chỉ khi bút được hạ xuống
     if pen_down:
@@ -318,6 +326,7 @@ def export_to_file(robot_points, pen_commands, filename="robot_path.txt"):
 
 def main():
     global x_drawn, y_drawn, theta1_list, theta2_list, ax1, ax2, ax3, image_original, robot_points, pen_down
+    global arm_angles, arm_reachable, arm_elbow, arm_tip
     
     # Khởi tạo biến toàn cục
     x_drawn, y_drawn = [], []
@@ -370,6 +379,9 @@ def main():
     print(f"Số điểm cần vẽ ban đầu: {len(image_points)}")
     print(f"Số điểm sau khi tối ưu: {len(robot_points)}")
     
+    # Tính sẵn góc khớp và vị trí cánh tay cho mọi khung hình
+    arm_angles, arm_reachable, arm_elbow, arm_tip = compute_arm_trajectory(robot_points)
+    
     # Xuất tọa độ ra file để tải lên Arduino (tùy chọn)
     export_to_file(robot_points, pen_commands)
     
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import os
 import math
 from matplotlib.patches import Circle
+from ik_table import analytic_ik, forward_kinematics_batch
 
 # Thông số robot SCARA
 L1 = 145 
@@ -83,6 +84,7 @@ def convert_to_robot_coords(image_points):
 
 def inverse_kinematics(x, y):
     """Tính toán động học nghịch"""
+    
     # Tính khoảng cách từ gốc đến điểm
     d = (x**2 + y**2 - L1**2 - L2**2) / (2 * L1 * L2)
     
@@ -153,8 +155,9 @@ def visualize_robot_simulation(img, robot_points, angles):
     ax2.add_patch(workspace_circle)
     ax2.add_patch(min_workspace_circle)
     
-    # Khởi tạo biến lưu vết
-    x_drawn, y_drawn = [], []
+    # Tính động học thuận cho cả quỹ đạo một lần, mỗi khung hình chỉ cần tra chỉ số
+    angles = np.asarray(angles, dtype=float)
+    elbow, tip = forward_kinematics_batch(angles[:, 0], angles[:, 1], L1, L2)
     
     # Hàm cập nhật animation
     def update(frame):
@@ -176,16 +179,10 @@ def visualize_robot_simulation(img, robot_points, angles):
         ax2.add_patch(workspace_circle)
         ax2.add_patch(min_workspace_circle)
         
-        # Lấy tọa độ và góc hiện tại
-        x, y = robot_points[frame]
+        # Lấy góc và vị trí các khớp hiện tại
         theta1, theta2 = angles[frame]
-        
-        # Tính toán vị trí các khớp
-        (x1, y1), (x2, y2) = forward_kinematics(theta1, theta2)
-        
-        # Thêm điểm vào đường vẽ
-        x_drawn.append(x2)
-        y_drawn.append(y2)
+        x1, y1 = elbow[frame]
+        x2, y2 = tip[frame]
         
         # Vẽ cánh tay robot
         ax2.plot([0, x1], [0, y1], 'ro-', linewidth=3, label='Link 1')
@@ -197,7 +194,7 @@ def visualize_robot_simulation(img, robot_points, angles):
         ax2.plot(x2, y2, 'go', markersize=6)  # Điểm đầu cuối
         
         # Vẽ đường di chuyển của điểm đầu cuối
-        ax2.plot(x_drawn, y_drawn, 'g-', linewidth=1)
+        ax2.plot(tip[:frame + 1, 0], tip[:frame + 1, 1], 'g-', linewidth=1)
         
         # Hiển thị thông tin góc
         ax2.set_title(f'Bước {frame+1}/{len(robot_points)} - θ1: {theta1:.2f}°, θ2: {theta2:.2f}°')
@@ -296,16 +293,10 @@ def main():
     # Chuyển đổi sang tọa độ robot
     robot_points = convert_to_robot_coords(image_points)
     
-    # Tính góc khớp cho mỗi điểm
-    angles = []
-    valid_points = []
-    for point in robot_points:
-        result = inverse_kinematics(point[0], point[1])
-        if result is not None:
-            angles.append(result)
-            valid_points.append(point)
+    # Kiểm tra tầm với của tất cả các điểm trong một lần
+    _, _, reachable = analytic_ik(robot_points, L1, L2, elbow_up=True)
     
-    robot_points = valid_points  # Cập nhật lại chỉ giữ các điểm hợp lệ
+    robot_points = [p for p, ok in zip(robot_points, reachable) if ok]  # Cập nhật lại chỉ giữ các điểm hợp lệ
     
     print(f"Số điểm cần vẽ ban đầu: {len(image_points)}")
     print(f"Số điểm hợp lệ sau khi tính toán: {len(robot_points)}")
\ No newline at end of file
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+
+def densify(points, closed):
+    """Lấy mẫu đều theo đường gấp khúc, khoảng cách giữa hai mẫu không quá 1 pixel
+
+    Với đường kín, điểm đầu không được lặp lại ở cuối.
+    """
+    pts = points.reshape(-1, 2).astype(np.float64)
+    if closed:
+        pts = np.vstack([pts, pts[:1]])
+    if len(pts) < 2:
+        return pts
+
+    seg = np.diff(pts, axis=0)
+    counts = np.maximum(np.ceil(np.hypot(seg[:, 0], seg[:, 1])).astype(np.int64), 1)
+    index = np.repeat(np.arange(len(seg)), counts)
+    t = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / np.repeat(counts, counts)
+    dense = pts[index] + seg[index] * t[:, None]
+    if not closed:
+        dense = np.vstack([dense, pts[-1:]])
+    return dense
+
+
+def _runs(mask):
+    """Các đoạn liên tiếp True trong mảng bool: danh sách (đầu, cuối không gồm)"""
+    edges = np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def dedup_contours(contours, closed, shape, tolerance, min_cut=0.0):
+    """Bỏ các contour trùng hoặc gần trùng với nét đã lên kế hoạch, trả về (contour, cờ kín, chiều dài bỏ)
+
+    Các nét đã nhận được vẽ vào một lưới phủ (mỗi ô một pixel làm việc) với bề dày
+    2*tolerance+1, nên kiểm tra một điểm chỉ là một lần tra ô. Contour được lấy mẫu dày
+    (densify) theo thứ tự đã sắp: nằm trọn trong vùng phủ thì bị bỏ; có đoạn nằm trong
+    vùng phủ dài từ min_cut pixel trở lên thì bị cắt, chỉ giữ các phần chưa vẽ dưới dạng
+    nét mở; đoạn phủ ngắn hơn (chỗ giao nhau) được vẽ lại vì rẻ hơn một lần nhấc bút.
+    closed là cờ kín của từng contour đầu vào.
+    """
+    coverage = np.zeros(shape[:2], dtype=np.uint8)
+    thickness = 2 * int(np.ceil(tolerance)) + 1
+    height, width = coverage.shape
+
+    kept, kept_closed = [], []
+    removed = 0.0
+    for contour, closed in zip(contours, closed):
+        dense = densify(contour, closed)
+        ix = np.clip(np.round(dense[:, 0]).astype(np.int64), 0, width - 1)
+        iy = np.clip(np.round(dense[:, 1]).astype(np.int64), 0, height - 1)
+        covered = coverage[iy, ix] > 0
+
+        # Chiều dài gắn với mỗi mẫu: đoạn tới mẫu kế tiếp (vòng lại với đường kín)
+        following = np.roll(dense, -1, axis=0) if closed else np.vstack([dense[1:], dense[-1:]])
+        step = np.hypot(*(following - dense).T)
+
+        if not covered.any():
+            pieces = [(contour, closed)]
+        elif covered.all():
+            removed += float(step.sum())
+            pieces = []
+        else:
+            # Với đường kín, xoay để bắt đầu tại đầu một đoạn phủ, không có đoạn nào vắt qua điểm 0
+            if closed:
+                shift = int(np.flatnonzero(covered & ~np.roll(covered, 1))[0])
+                dense, covered, step = (np.roll(a, -shift, axis=0) for a in (dense, covered, step))
+
+            cut = np.zeros_like(covered)
+            for start, end in _runs(covered):
+                if step[start:end].sum() >= min_cut:
+                    cut[start:end] = True
+            if closed and cut.any():
+                shift = int(np.argmax(cut))
+                dense, cut, step = (np.roll(a, -shift, axis=0) for a in (dense, cut, step))
+
+            if not cut.any():
+                pieces = [(contour, closed)]
+            else:
+                removed += float(step[cut].sum())
+                pieces = []
+                for start, end in _runs(~cut):
+                    # Nối tới mẫu bị cắt kế tiếp để phần giữ lại chạm đúng mép vùng đã vẽ
+                    piece = dense[start:min(end + 1, len(dense))]
+                    if closed and end == len(dense):
+                        piece = np.vstack([piece, dense[:1]])
+                    if len(piece) >= 2:
+                        pieces.append((piece.astype(np.float32).reshape(-1, 1, 2), False))
+
+        for piece, piece_closed in pieces:
+            kept.append(piece)
+            kept_closed.append(piece_closed)
+            cv2.polylines(coverage, [np.round(piece.reshape(-1, 2)).astype(np.int32)], piece_closed, 255, thickness)
+
+    return kept, kept_closed, removed
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+
+
+class JobCancelled(Exception):
+    """Lần chạy pipeline bị hủy vì đã có yêu cầu xử lý mới hơn"""
+
+
+class DrawingJob:
+    """Pipeline xử lý nhiều bước, mỗi bước nhớ kết quả theo khóa đầu vào của chính nó
+
+    Khóa của một bước gồm tham số riêng của bước đó và phiên bản kết quả của các bước phía
+    trước, nên khi chỉ một tham số ở cuối pipeline thay đổi (ví dụ offset), các bước từ đọc
+    ảnh đến nội suy được lấy lại ngay và chỉ các bước phía sau được tính lại. Bộ đệm ảnh
+    trung gian được cấp phát một lần và dùng lại giữa các lần chạy.
+    """
+
+    def __init__(self):
+        self._stages = {}  # tên bước -> (khóa, phiên bản, kết quả)
+        self._buffers = {}
+        self._next_version = 0
+        self.recomputed = []  # Các bước đã tính lại (kèm thời gian) kể từ reset_stats
+        self.reused = []
+        self.cancel_check = None  # Hàm không đối số, trả về True khi lần chạy hiện tại nên dừng
+
+    def run(self, name, params, compute, depends=()):
+        """Trả về kết quả của bước name, chỉ gọi compute() khi tham số hoặc bước phía trước đã đổi"""
+        key = (params, tuple(self.version(dep) for dep in depends))
+        entry = self._stages.get(name)
+        if entry is not None and entry[0] == key:
+            self.reused.append(name)
+            return entry[2]
+
+        # Dừng trước mỗi bước cần tính lại; các bước đã xong vẫn được nhớ cho lần chạy sau
+        if self.cancel_check is not None and self.cancel_check():
+            raise JobCancelled(name)
+
+        start = time.perf_counter()
+        result = compute()
+        self.recomputed.append((name, time.perf_counter() - start))
+
+        self._next_version += 1
+        self._stages[name] = (key, self._next_version, result)
+        return result
+
+    def version(self, name):
+        """Phiên bản kết quả hiện tại của một bước (None nếu chưa chạy)"""
+        entry = self._stages.get(name)
+        return entry[1] if entry is not None else None
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """Mảng tạm dùng lại giữa các lần chạy, chỉ cấp phát lại khi kích thước hoặc kiểu đổi"""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def reset_stats(self):
+        self.recomputed = []
+        self.reused = []
+
+    def clear(self):
+        """Bỏ toàn bộ kết quả đã nhớ (giữ lại bộ đệm)"""
+        self._stages.clear()
+        self.reset_stats()
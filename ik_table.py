@@ -0,0 +1,227 @@
+import math
+import os
+import time
+
+import numpy as np
+
+
+def analytic_ik(points, L1, L2, elbow_up=True):
+    """Động học ngược giải tích (arccos/arctan2) cho mảng điểm (N, 2), dùng làm chuẩn so sánh"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    x, y = points[:, 0], points[:, 1]
+
+    d = (x**2 + y**2 - L1**2 - L2**2) / (2 * L1 * L2)
+    reachable = np.abs(d) <= 1
+
+    theta2 = np.arccos(np.clip(d, -1.0, 1.0))
+    if not elbow_up:
+        theta2 = -theta2
+    theta1 = np.arctan2(y, x) - np.arctan2(L2 * np.sin(theta2), L1 + L2 * np.cos(theta2))
+
+    return np.degrees(theta1), np.degrees(theta2), reachable
+
+
+def forward_kinematics_batch(theta1, theta2, L1, L2):
+    """Động học thuận cho cả quỹ đạo khớp (độ), trả về vị trí khuỷu và đầu bút dạng mảng (N, 2)"""
+    theta1 = np.radians(np.asarray(theta1, dtype=float)).reshape(-1)
+    theta12 = theta1 + np.radians(np.asarray(theta2, dtype=float)).reshape(-1)
+
+    elbow = np.column_stack((L1 * np.cos(theta1), L1 * np.sin(theta1)))
+    tip = elbow + np.column_stack((L2 * np.cos(theta12), L2 * np.sin(theta12)))
+
+    return elbow, tip
+
+
+class IKTable:
+    """Bảng tra động học ngược trên vành khuyên làm việc (bán kính |L1-L2| đến L1+L2)
+
+    Với robot SCARA 2 khâu, θ2 và góc lệch của θ1 so với hướng điểm chỉ phụ thuộc vào
+    khoảng cách tới gốc, nên bảng là một chiều (nội suy cực): θ1 = atan2(y, x) - lệch.
+    Bảng lập trên biến u = sqrt(1 + d) - sqrt(1 - d) với d = cos(θ2): θ2 trơn theo u kể cả
+    ở mép trong và mép ngoài vành khuyên, nên lưới đều theo u cho phép tra O(1) bằng
+    nội suy tuyến tính. Số nút được nhân đôi cho đến khi sai số lớn nhất không vượt quá
+    max_error_deg. Bảng được lưu ra đĩa theo bộ (L1, L2, khuỷu, sai số).
+
+    Bảng chỉ có lợi khi tra từng điểm (solve_point), nhanh hơn khoảng 3.5 lần so với
+    arccos/arctan2 trên số vô hướng. Với cả mảng, solve không nhanh hơn analytic_ik; mainne.py,
+    Sim.py và Tag1.py đều tính IK theo lô nên không dùng bảng, bảng chỉ còn để đo (benchmark).
+    """
+
+    U_MAX = math.sqrt(2.0)
+
+    def __init__(self, L1, L2, elbow_up=True, max_error_deg=0.01, cache_dir="ik_tables"):
+        self.L1 = L1
+        self.L2 = L2
+        self.elbow_up = elbow_up
+        self.max_error_deg = max_error_deg
+        self.cache_dir = cache_dir
+
+        if not self._load():
+            self._build()
+            self._save()
+
+        self._prepare()
+
+    def _prepare(self):
+        n = len(self.theta2_nodes)
+        self._inv_step = (n - 1) / (2 * self.U_MAX)
+
+        # Lưu giá trị nút và độ dốc để mỗi lần tra chỉ cần một phép nhân cộng
+        self._theta2_slope = np.append(np.diff(self.theta2_nodes), 0.0)
+        self._offset_slope = np.append(np.diff(self.offset_nodes), 0.0)
+
+        # Bản sao dạng list cho đường tra từng điểm (nhanh hơn NumPy với số vô hướng)
+        self._theta2_list = self.theta2_nodes.tolist()
+        self._offset_list = self.offset_nodes.tolist()
+        self._theta2_slope_list = self._theta2_slope.tolist()
+        self._offset_slope_list = self._offset_slope.tolist()
+
+    def _cache_path(self):
+        elbow = "up" if self.elbow_up else "down"
+        name = f"ik_{self.L1:g}_{self.L2:g}_{elbow}_{self.max_error_deg:g}.npz"
+        return os.path.join(self.cache_dir, name)
+
+    def _load(self):
+        path = self._cache_path()
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                self.theta2_nodes = data["theta2_nodes"]
+                self.offset_nodes = data["offset_nodes"]
+                self.error_deg = float(data["error_deg"])
+            return True
+        except Exception as e:
+            print(f"Không thể đọc bảng IK {path}: {e}")
+            return False
+
+    def _save(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(self._cache_path(), theta2_nodes=self.theta2_nodes,
+                     offset_nodes=self.offset_nodes, error_deg=self.error_deg)
+        except OSError as e:
+            print(f"Không thể lưu bảng IK: {e}")
+
+    def _exact(self, u):
+        """θ2 và góc lệch chính xác (độ) tại các giá trị u"""
+        # u = 2 cos(q/2 + π/4) với q = |θ2|
+        q = np.clip(2 * np.arccos(np.clip(u / 2, -1.0, 1.0)) - np.pi / 2, 0.0, np.pi)
+        theta2 = q if self.elbow_up else -q
+        offset = np.arctan2(self.L2 * np.sin(theta2), self.L1 + self.L2 * np.cos(theta2))
+        return np.degrees(theta2), np.degrees(offset)
+
+    def _build(self):
+        n = 65
+        while True:
+            u = np.linspace(-self.U_MAX, self.U_MAX, n)
+            self.theta2_nodes, self.offset_nodes = self._exact(u)
+            self.error_deg = self._measure_error(u)
+            if self.error_deg <= self.max_error_deg or n > 1 << 22:
+                break
+            n = 2 * n - 1
+
+    def _measure_error(self, u):
+        """Sai số lớn nhất (độ) so với lời giải giải tích, đo tại các điểm giữa và một phần tư các nút"""
+        probes = np.concatenate([u[:-1] + (u[1:] - u[:-1]) * t for t in (0.25, 0.5, 0.75)])
+        theta2, offset = self._exact(probes)
+        err2 = np.abs(np.interp(probes, u, self.theta2_nodes) - theta2)
+        err1 = np.abs(np.interp(probes, u, self.offset_nodes) - offset)
+        return float(max(err1.max(), err2.max()))
+
+    def solve(self, points):
+        """Tra bảng cho mảng điểm (N, 2), trả về (theta1, theta2, reachable) như IK giải tích
+
+        Dùng để kiểm tra sai số của bảng; tính theo lô thì analytic_ik nhanh tương đương.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+
+        d = (x**2 + y**2 - self.L1**2 - self.L2**2) / (2 * self.L1 * self.L2)
+        reachable = np.abs(d) <= 1
+        d = np.clip(d, -1.0, 1.0)
+
+        f = (np.sqrt(1 + d) - np.sqrt(1 - d) + self.U_MAX) * self._inv_step
+        i = f.astype(np.intp)
+        t = f - i
+
+        theta2 = self.theta2_nodes[i] + self._theta2_slope[i] * t
+        theta1 = np.degrees(np.arctan2(y, x)) - (self.offset_nodes[i] + self._offset_slope[i] * t)
+
+        return theta1, theta2, reachable
+
+    def solve_point(self, x, y):
+        """Tra bảng cho một điểm, cùng giao diện với inverse_kinematics: (θ1, θ2) hoặc None"""
+        d = (x * x + y * y - self.L1**2 - self.L2**2) / (2 * self.L1 * self.L2)
+        if d > 1 or d < -1:
+            return None
+
+        f = (math.sqrt(1 + d) - math.sqrt(1 - d) + self.U_MAX) * self._inv_step
+        i = int(f)
+        t = f - i
+
+        theta2 = self._theta2_list[i] + self._theta2_slope_list[i] * t
+        offset = self._offset_list[i] + self._offset_slope_list[i] * t
+        return math.degrees(math.atan2(y, x)) - offset, theta2
+
+
+def benchmark(L1=140, L2=120, n_points=1_000_000, max_error_deg=0.01, elbow_up=True):
+    """So sánh tốc độ và sai số lớn nhất giữa bảng tra và lời giải giải tích"""
+    rng = np.random.default_rng(0)
+    r = rng.uniform(abs(L1 - L2), L1 + L2, n_points)
+    phi = rng.uniform(-np.pi, np.pi, n_points)
+    points = np.column_stack((r * np.cos(phi), r * np.sin(phi)))
+
+    start = time.perf_counter()
+    table = IKTable(L1, L2, elbow_up=elbow_up, max_error_deg=max_error_deg)
+    setup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ref1, ref2, _ = analytic_ik(points, L1, L2, elbow_up)
+    analytic_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tab1, tab2, _ = table.solve(points)
+    table_time = time.perf_counter() - start
+
+    # Sai số θ1 tính theo hiệu góc đã quy về [-180, 180)
+    err1 = np.abs((tab1 - ref1 + 180) % 360 - 180)
+    err2 = np.abs(tab2 - ref2)
+
+    # Đường từng điểm (phát trực tiếp)
+    n_scalar = min(n_points, 100_000)
+    scalar_points = points[:n_scalar].tolist()
+    sign = 1 if elbow_up else -1
+
+    # Lời giải từng điểm giống inverse_kinematics hiện có (hàm NumPy trên số vô hướng)
+    start = time.perf_counter()
+    for x, y in scalar_points:
+        d = (x**2 + y**2 - L1**2 - L2**2) / (2 * L1 * L2)
+        q = sign * np.arccos(d)
+        np.degrees(np.arctan2(y, x) - np.arctan2(L2 * np.sin(q), L1 + L2 * np.cos(q))), np.degrees(q)
+    analytic_scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for x, y in scalar_points:
+        table.solve_point(x, y)
+    table_scalar_time = time.perf_counter() - start
+
+    print(f"Bảng IK: {len(table.theta2_nodes)} nút, sai số thiết kế {table.error_deg:.5f}°, tạo/đọc {setup_time * 1000:.1f} ms")
+    print(f"Mảng {n_points} điểm: giải tích {n_points / analytic_time / 1e6:.2f} Mđiểm/s, "
+          f"bảng tra {n_points / table_time / 1e6:.2f} Mđiểm/s")
+    print(f"Từng điểm ({n_scalar}): giải tích {n_scalar / analytic_scalar_time / 1e3:.0f} kđiểm/s, "
+          f"bảng tra {n_scalar / table_scalar_time / 1e3:.0f} kđiểm/s")
+    print(f"Sai số lớn nhất: θ1 {err1.max():.5f}°, θ2 {err2.max():.5f}°")
+
+    return {
+        "analytic_time": analytic_time,
+        "table_time": table_time,
+        "analytic_scalar_time": analytic_scalar_time,
+        "table_scalar_time": table_scalar_time,
+        "max_error_theta1": float(err1.max()),
+        "max_error_theta2": float(err2.max()),
+    }
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Tăng khi thay đổi thuật toán xử lý để bỏ qua các kết quả cũ trong cache
+CACHE_VERSION = 9
+
+
+class JobCache:
+    """Cache trên đĩa các kết quả xử lý ảnh dưới dạng file .npz, xóa theo LRU khi vượt dung lượng"""
+
+    def __init__(self, cache_dir="job_cache", max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._hash_memo = {}
+
+    def image_hash(self, image_path):
+        """Băm nội dung file ảnh (không phụ thuộc tên file hay thời gian sửa)
+
+        Kết quả được nhớ theo (đường dẫn, thời gian sửa, kích thước) để không đọc lại file
+        mỗi lần đổi tham số.
+        """
+        stat = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        if memo_key in self._hash_memo:
+            return self._hash_memo[memo_key]
+
+        h = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        self._hash_memo[memo_key] = h.hexdigest()
+        return self._hash_memo[memo_key]
+
+    def make_key(self, image_path, params):
+        """Tạo khóa cache từ nội dung ảnh và các tham số xử lý"""
+        params = dict(params, version=CACHE_VERSION)
+        params_text = json.dumps(params, sort_keys=True, default=str)
+        params_hash = hashlib.sha256(params_text.encode()).hexdigest()
+        return f"{self.image_hash(image_path)[:24]}_{params_hash[:24]}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def load(self, key):
+        """Đọc kết quả theo khóa, trả về dict các mảng hoặc None nếu không có"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = {name: data[name] for name in data.files}
+        except Exception as e:
+            print(f"Bỏ qua file cache hỏng {path}: {e}")
+            self._remove(path)
+            return None
+
+        # Cập nhật thời gian để đánh dấu vừa được dùng (LRU)
+        os.utime(path, None)
+        return result
+
+    def store(self, key, **arrays):
+        """Ghi kết quả vào cache rồi xóa bớt các mục cũ nếu vượt dung lượng"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+
+        # Ghi ra file tạm riêng cho lần ghi này rồi đổi tên, để không để lại file dở dang và
+        # hai luồng/tiến trình cùng ghi một khóa không ghi đè file tạm của nhau
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=key + ".", suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            try:
+                np.savez_compressed(f, **arrays)
+            except BaseException:
+                f.close()
+                self._remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def invalidate(self, key=None):
+        """Xóa một mục cache, hoặc toàn bộ cache nếu không truyền khóa"""
+        if key is not None:
+            self._remove(self._path(key))
+            return
+
+        for entry in self._entries():
+            self._remove(entry.path)
+
+    def invalidate_image(self, image_path):
+        """Xóa mọi mục cache của một ảnh, với mọi bộ tham số"""
+        prefix = self.image_hash(image_path)[:24] + "_"
+        for entry in self._entries():
+            if entry.name.startswith(prefix):
+                self._remove(entry.path)
+
+    def evict(self):
+        """Xóa các mục ít được dùng gần đây nhất cho đến khi tổng dung lượng nằm trong giới hạn"""
+        entries = []
+        for e in self._entries():
+            try:
+                stat = e.stat()
+            except OSError:
+                continue  # Vừa bị luồng/tiến trình khác xóa
+            entries.append((stat.st_mtime, stat.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [e for e in os.scandir(self.cache_dir) if e.is_file() and e.name.endswith(".npz")]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class MemoryLRU:
+    """Cache trong bộ nhớ cho các kết quả đã xử lý, bỏ mục ít được dùng gần đây nhất khi vượt số lượng
+
+    An toàn khi gọi từ nhiều luồng (kết quả xử lý nền được đưa vào từ luồng của process pool).
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
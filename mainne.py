@@ -6,9 +6,46 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import cv2
 import os
+import shutil
 import serial
 import time
 import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from job_cache import JobCache, MemoryLRU
+from drawing_job import DrawingJob, JobCancelled
+from ik_table import forward_kinematics_batch
+from threshold_levels import ThresholdLevels, auto_threshold, otsu_threshold
+from skeleton import thin, trace_strokes
+from contour_dedup import dedup_contours
+from tiled import tile_boxes, map_tiles, clip_to_core, stitch_pieces, read_reduced_gray
+from vector_import import VECTOR_EXTENSIONS, is_vector_file, load_vector_drawing
+from travel_order import order_segments
+from path_buffer import PathBuffer
+
+class FixedVar:
+    """Giá trị cố định có giao diện get() như biến Tk, dùng khi chạy pipeline ngoài giao diện"""
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def get(self):
+        return self.value
+
+def precompute_job(image_path, state, settings):
+    """Chạy pipeline cho một ảnh trong tiến trình con, ghi vào cache đĩa và trả về (khóa cache, kết quả)"""
+    controller = RobotArmController.from_state(state)
+    key = controller.job_cache.make_key(image_path, controller.pipeline_params(*settings))
+    
+    cached_job = controller.job_cache.load(key)
+    if cached_job is not None:
+        return key, cached_job
+    
+    job = controller.run_pipeline(image_path, *settings)
+    try:
+        controller.job_cache.store(key, **job)
+    except OSError as e:
+        print(f"Không thể ghi cache: {e}")
+    return key, job
 
 class RobotArmController:
     def __init__(self, root):
@@ -33,11 +70,52 @@ class RobotArmController:
         self.scale = self.workspace_size / self.image_size
         
         # Tham số mới cho việc tối ưu hóa
-        self.step_size = 2.0  # Kích thước bước (mm) - càng nhỏ càng mịn
-        self.step_per_mm = 10  # Số bước/mm
+        self.chord_tolerance = 0.1  # Độ lệch lớn nhất (mm) của đường bút giữa hai điểm so với đoạn thẳng cần vẽ
         self.servo_delay = 0.02  # Thời gian chờ giữa các lệnh servo (giây)
         self.motor_delay = 0.01  # Thời gian chờ giữa các lệnh động cơ (giây)
         
+        # Mô hình động cơ khớp: 200 bước/vòng x 16 vi bước x hộp số 3 (STEPS_PER_RADIAN trong circle1.ino)
+        self.steps_per_degree = 200 * 16 * 3 / 360
+        self.max_joint_speed = 1000 / self.steps_per_degree  # setMaxSpeed(1000) trong servo.ino (độ/giây)
+        self.max_joint_accel = 500 / self.steps_per_degree  # setAcceleration(500) trong servo.ino (độ/giây²)
+        self.max_pen_speed = 1000 / 60  # Tốc độ đầu bút khi vẽ (mm/giây), bằng F1000 trong G-code
+        self.junction_time = 0.02  # Thời gian cho phép để đổi vận tốc khớp tại điểm gãy của đường (giây)
+        self.pen_servo_time = 0.3  # delay(300) sau lệnh PU/PD trong servo.ino (giây)
+        self.min_step_change = 2  # Bỏ điểm vẽ nếu không khớp nào đổi ít nhất chừng này bước so với điểm giữ lại trước đó
+        self.timestamps = np.empty(0)  # Thời điểm tới từng điểm của robot_path tính từ lúc bắt đầu (giây)
+        self.feed_limits = np.empty(0)  # Tốc độ tiến lớn nhất của bước chuyển tới từng điểm (mm/phút), dùng cho G-code
+        self.travel_feed = 3000  # Tốc độ di chuyển nhấc bút lớn nhất (mm/phút), bằng F3000 trong G-code
+        self.ill_conditioned = 10.0  # Số điều kiện Jacobian coi là gần kỳ dị (duỗi thẳng hoặc sát vòng trong); vượt quá thì giảm thêm tốc độ vẽ
+        
+        # Chọn nhánh khuỷu (elbow-up/down) cho từng đoạn để giảm quãng đường khớp
+        self.optimize_elbow = True
+        self.elbow_up = np.empty(0, dtype=bool)
+        self.trajectory_report = {}
+        
+        # Giới hạn khớp (độ): θ1 cho phép vượt ±180° một chút để không phải quay vòng giữa đường vẽ
+        self.joint_limits = ((-200.0, 200.0), (-180.0, 180.0))
+        
+        # Độ phân giải xử lý ảnh theo kích thước hình vẽ thực tế và nét bút
+        self.pen_width = 0.5  # Bề rộng nét bút (mm), chi tiết nhỏ hơn không vẽ được
+        self.pixels_per_pen_width = 4  # Số pixel xử lý trên một bề rộng nét bút (đủ để nét mảnh còn lại sau làm mịn 5x5)
+        self.skeleton_spur = 2.0  # Phương pháp "skeleton": bỏ nhánh cụt ngắn hơn bấy nhiêu bề rộng nét bút
+        self.dedup_tolerance = 1.0  # Bỏ phần contour nằm trong bấy nhiêu bề rộng nét bút quanh nét đã vẽ (0: tắt)
+        self.tiling = "auto"  # Xử lý theo ô: "auto" khi ảnh làm việc lớn hơn tile_pixels, "on" luôn luôn, "off" không bao giờ
+        self.tile_pixels = 2_000_000  # Ngưỡng của "auto" (ảnh làm việc mặc định tới ~3,7 MP: cạnh dài 1920 pixel)
+        self.tile_size = 1024  # Cạnh vùng lõi của mỗi ô (pixel)
+        self.tile_overlap = 16  # Lề chồng giữa các ô, lớn hơn bán kính tổng của các bộ lọc
+        self.vector_tolerance = 0.05  # Sai số dây cung (mm) khi rời rạc hóa đường cong của file SVG/DXF
+        self.source_shape = None  # (cao, rộng) của ảnh gốc, dùng để đổi tọa độ sang robot
+        self.travel_time_limit = 2.0  # Thời gian tối đa (giây) cải thiện thứ tự nét để giảm quãng nhấc bút
+        
+        # Tự động căn chỉnh hình vẽ vào vành khuyên làm việc
+        self.auto_place = tk.BooleanVar(value=False)
+        self.placement_mode = tk.StringVar(value="size")  # "size": hình lớn nhất, "travel": ít di chuyển khớp nhất
+        self.placement_margin = 1.0  # Khoảng an toàn tới biên vùng làm việc (mm)
+        self.placement_min_y = 0.0  # Không vẽ phía sau đế robot (y nhỏ nhất, mm)
+        self.placement = None  # (tỉ lệ, góc xoay (độ), offset_x, offset_y) của lần căn chỉnh gần nhất
+        self.trajectory_info = "Quỹ đạo: -"
+        
         # COM port and baudrate
         self.com_port = tk.StringVar(value="COM14")
         self.baudrate = tk.IntVar(value=115200)
@@ -52,13 +130,37 @@ class RobotArmController:
         
         # Biến lưu ảnh và đường dẫn
         self.original_image = None
-        self.drawing_path = []
-        self.robot_path = []
+        self.drawing_path = PathBuffer()  # Đường nét theo tọa độ ảnh gốc
+        self.robot_path = PathBuffer()  # Đường đi robot (mm) với trạng thái bút từng điểm
+        self.joint_angles = np.empty((0, 2))  # Quỹ đạo khớp (θ1, θ2) tính sẵn cho robot_path
+        self.reachable = np.empty(0, dtype=bool)  # Mặt nạ điểm nằm trong tầm với
+        self.arm_elbow = np.empty((0, 2))  # Vị trí khuỷu (x1, y1) tại từng điểm, tính sẵn cho mô phỏng
+        self.arm_tip = np.empty((0, 2))  # Vị trí đầu bút (x2, y2) tại từng điểm
         self.current_image = None
         self.prev_angles = [0, 0]
         
+        # Pipeline xử lý theo từng bước, nhớ kết quả để chỉ tính lại phần bị ảnh hưởng
+        self.drawing_job = DrawingJob()
+        self.debug_log = False  # In thống kê chẩn đoán của từng bước xử lý ra console
+        
+        # Cache kết quả xử lý ảnh trên đĩa và trong bộ nhớ
+        self.job_cache = JobCache("job_cache")
+        self.memory_cache = MemoryLRU(max_entries=32)
+        
+        # Xử lý nền mọi ảnh trong danh sách bằng process pool
+        self.precompute_pool = None
+        self.precompute_futures = {}  # đường dẫn ảnh -> (tham số, future)
+        
+        # Xử lý lại ảnh khi đổi tham số chạy trong một luồng riêng, không chặn giao diện
+        self.reprocess_worker = ThreadPoolExecutor(max_workers=1)
+        self.reprocess_generation = 0  # Tăng mỗi lần có yêu cầu mới; việc mang số cũ bị bỏ
+        self.reprocess_timer = None
+        self.reprocess_delay_ms = 150  # Chờ thanh trượt đứng yên bấy nhiêu ms rồi mới xử lý
+        self.pipeline_worker = None  # Bộ xử lý không giao diện của luồng nền, giữ drawing_job giữa các lần
+        
         # Khởi tạo UI sau khi các biến đã được chuẩn bị
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Cập nhật danh sách ảnh
         self.update_image_list()
@@ -69,8 +171,8 @@ class RobotArmController:
         self.drawing_thread = None
         
     def find_image_files(self):
-        """Tìm tất cả các file ảnh trong thư mục hiện tại"""
-        extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.gif']
+        """Tìm tất cả các file ảnh (và bản vẽ SVG/DXF) trong thư mục hiện tại"""
+        extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.gif', *VECTOR_EXTENSIONS]
         image_files = []
         
         for file in os.listdir('.'):
@@ -131,6 +233,7 @@ class RobotArmController:
         
         ttk.Button(btn_frame, text="Tải ảnh", command=self.load_image).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="Làm mới", command=self.update_image_list).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Xóa cache", command=self.clear_job_cache).pack(side=tk.LEFT, padx=5)
         
         # Cài đặt vẽ
         settings_frame = ttk.LabelFrame(control_frame, text="Cài đặt vẽ", padding=5)
@@ -138,9 +241,12 @@ class RobotArmController:
         
         ttk.Label(settings_frame, text="Ngưỡng cắt:").grid(row=0, column=0, sticky=tk.W, pady=2)
         self.threshold_var = tk.IntVar(value=100)  # Giảm ngưỡng để lấy được nhiều chi tiết hơn
-        threshold_slider = ttk.Scale(settings_frame, from_=0, to=255, variable=self.threshold_var, orient=tk.HORIZONTAL, length=150)
+        threshold_slider = ttk.Scale(settings_frame, from_=0, to=255, variable=self.threshold_var, orient=tk.HORIZONTAL, length=150,
+                                     command=self.request_reprocess)
         threshold_slider.grid(row=0, column=1, padx=5, pady=2)
-        threshold_slider.bind("<ButtonRelease-1>", self.process_current_image)
+        self.auto_threshold = tk.BooleanVar(value=False)  # Tự chọn ngưỡng từ histogram, bỏ qua thanh trượt
+        ttk.Checkbutton(settings_frame, text="Tự động", variable=self.auto_threshold,
+                        command=self.process_current_image).grid(row=0, column=2, sticky=tk.W, pady=2)
         
         ttk.Label(settings_frame, text="Đảo màu:").grid(row=1, column=0, sticky=tk.W, pady=2)
         self.invert_var = tk.BooleanVar(value=True)
@@ -150,16 +256,16 @@ class RobotArmController:
         ttk.Label(settings_frame, text="Phương pháp:").grid(row=2, column=0, sticky=tk.W, pady=2)
         self.method_var = tk.StringVar(value="contour")
         method_combo = ttk.Combobox(settings_frame, textvariable=self.method_var, state="readonly", width=15, 
-                                    values=["contour", "canny", "adaptive"])
+                                    values=["contour", "canny", "adaptive", "skeleton"])
         method_combo.grid(row=2, column=1, sticky=tk.W, pady=2)
         method_combo.bind("<<ComboboxSelected>>", self.process_current_image)
         
         # Chất lượng đường
         ttk.Label(settings_frame, text="Chi tiết:").grid(row=3, column=0, sticky=tk.W, pady=2)
         self.detail_var = tk.DoubleVar(value=0.5)
-        detail_slider = ttk.Scale(settings_frame, from_=0.1, to=5.0, variable=self.detail_var, orient=tk.HORIZONTAL, length=150)
+        detail_slider = ttk.Scale(settings_frame, from_=0.1, to=5.0, variable=self.detail_var, orient=tk.HORIZONTAL, length=150,
+                                  command=self.request_reprocess)
         detail_slider.grid(row=3, column=1, padx=5, pady=2)
-        detail_slider.bind("<ButtonRelease-1>", self.process_current_image)
         
         # Thêm tùy chỉnh gốc tọa độ
         ttk.Label(settings_frame, text="Dịch X:").grid(row=4, column=0, sticky=tk.W, pady=2)
@@ -170,7 +276,15 @@ class RobotArmController:
         self.offset_y = tk.DoubleVar(value=100)  # Dịch gốc tọa độ
         ttk.Entry(settings_frame, textvariable=self.offset_y, width=8).grid(row=5, column=1, padx=5, pady=2)
         
-        ttk.Button(settings_frame, text="Áp dụng", command=self.process_current_image).grid(row=6, column=1, padx=5, pady=5)
+        # Tự động căn chỉnh tỉ lệ, góc xoay và vị trí để mọi điểm nằm trong tầm với
+        ttk.Label(settings_frame, text="Tự căn chỉnh:").grid(row=6, column=0, sticky=tk.W, pady=2)
+        ttk.Checkbutton(settings_frame, variable=self.auto_place, command=self.process_current_image).grid(row=6, column=1, sticky=tk.W, pady=2)
+        placement_combo = ttk.Combobox(settings_frame, textvariable=self.placement_mode, state="readonly", width=15,
+                                       values=["size", "travel"])
+        placement_combo.grid(row=7, column=1, sticky=tk.W, pady=2)
+        placement_combo.bind("<<ComboboxSelected>>", self.process_current_image)
+        
+        ttk.Button(settings_frame, text="Áp dụng", command=self.process_current_image).grid(row=8, column=1, padx=5, pady=5)
         
         # Điều khiển vẽ
         draw_frame = ttk.LabelFrame(control_frame, text="Điều khiển vẽ", padding=5)
@@ -243,8 +357,8 @@ class RobotArmController:
         ttk.Label(robot_info_frame, text="Link 2:").grid(row=1, column=0, sticky=tk.W, pady=2)
         ttk.Label(robot_info_frame, text=f"{self.L2} mm").grid(row=1, column=1, sticky=tk.W, pady=2)
         
-        ttk.Label(robot_info_frame, text="Tỷ lệ bước/mm:").grid(row=2, column=0, sticky=tk.W, pady=2)
-        ttk.Label(robot_info_frame, text=f"{self.step_per_mm}").grid(row=2, column=1, sticky=tk.W, pady=2)
+        ttk.Label(robot_info_frame, text="Bước/độ:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Label(robot_info_frame, text=f"{self.steps_per_degree:.2f}").grid(row=2, column=1, sticky=tk.W, pady=2)
         
         # Thông tin vẽ
         drawing_info_frame = ttk.LabelFrame(info_frame, text="Thông tin vẽ", padding=5)
@@ -253,6 +367,9 @@ class RobotArmController:
         self.points_var = tk.StringVar(value="Số điểm: 0")
         ttk.Label(drawing_info_frame, textvariable=self.points_var).pack(anchor=tk.W, pady=2)
         
+        self.trajectory_info_var = tk.StringVar(value="Quỹ đạo: -")
+        ttk.Label(drawing_info_frame, textvariable=self.trajectory_info_var, wraplength=250).pack(anchor=tk.W, pady=2)
+        
         self.progress_var = tk.StringVar(value="Tiến độ: 0%")
         ttk.Label(drawing_info_frame, textvariable=self.progress_var).pack(anchor=tk.W, pady=2)
         
@@ -305,12 +422,106 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         if self.available_images and not self.image_choice.get():
             self.image_choice.set(self.available_images[0])
             self.show_image_preview()
+        
+        # Xử lý trước các ảnh trong danh sách để chuyển ảnh không phải chờ
+        self.start_precompute()
+    
+    def start_precompute(self):
+        """Gửi mọi ảnh trong danh sách vào process pool với tham số hiện tại
+        
+        Ảnh đang chọn được xử lý trước, sau đó là các ảnh gần nó trong danh sách (kế tiếp
+        rồi liền trước), là thứ tự người dùng hay chọn nhất. Kết quả được đưa vào
+        memory_cache khi xong; các việc cũ chưa chạy bị hủy.
+        """
+        images = [path for path in self.available_images if os.path.exists(path)]
+        if not images:
+            return
+        
+        if self.precompute_pool is None:
+            self.precompute_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        
+        for _, future in self.precompute_futures.values():
+            future.cancel()
+        self.precompute_futures = {}
+        
+        settings = (self.current_threshold(), self.invert_var.get(), self.method_var.get(), self.detail_var.get())
+        signature = repr(sorted(self.pipeline_params(*settings).items()))
+        state = self.pipeline_state()
+        
+        current = self.image_choice.get()
+        start = images.index(current) if current in images else 0
+        
+        def likelihood(i):
+            ahead, behind = (i - start) % len(images), (start - i) % len(images)
+            return min(ahead, behind), ahead > behind
+        
+        for i in sorted(range(len(images)), key=likelihood):
+            future = self.precompute_pool.submit(precompute_job, images[i], state, settings)
+            future.add_done_callback(self.store_precomputed)
+            self.precompute_futures[images[i]] = (signature, future)
+    
+    def store_precomputed(self, future):
+        """Đưa kết quả xử lý nền vào cache bộ nhớ (gọi từ luồng của process pool, không chạm tới Tk)"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        key, job = future.result()
+        self.memory_cache.put(key, job)
+    
+    def wait_precomputed(self, image_path, params, cancelled):
+        """Chờ việc xử lý nền đang chạy cho ảnh này nếu cùng tham số, thay vì xử lý lại từ đầu
+        
+        Chờ từng khoảng ngắn và bỏ (JobCancelled) ngay khi cancelled() đúng, để yêu cầu mới
+        hơn không phải xếp hàng sau việc xử lý nền của ảnh cũ.
+        """
+        entry = self.precompute_futures.get(image_path)
+        if entry is None or entry[0] != repr(sorted(params.items())) or entry[1].cancelled():
+            return None
+        future = entry[1]
+        while not future.done():
+            if cancelled():
+                raise JobCancelled("precompute")
+            wait([future], timeout=0.1)
+        try:
+            _, job = future.result()
+        except Exception:
+            return None
+        return job
+    
+    def pipeline_state(self):
+        """Chụp các tham số cần cho pipeline dưới dạng gửi được sang tiến trình con
+        
+        Giữ các giá trị đơn giản và cache đĩa; biến Tk được đổi thành FixedVar.
+        Cửa sổ, widget, cổng serial và kết quả đã tính không được chép.
+        """
+        state = {}
+        for name, value in vars(self).items():
+            if isinstance(value, tk.Variable):
+                state[name] = FixedVar(value.get())
+            elif isinstance(value, (int, float, str, tuple, type(None), JobCache)):
+                state[name] = value
+        return state
+    
+    @classmethod
+    def from_state(cls, state):
+        """Tạo bộ xử lý không có giao diện từ trạng thái chụp bởi pipeline_state"""
+        controller = cls.__new__(cls)
+        controller.__dict__.update(state)
+        controller.drawing_job = DrawingJob()
+        return controller
+    
+    def on_close(self):
+        """Dừng các việc xử lý nền rồi đóng cửa sổ"""
+        if self.precompute_pool is not None:
+            self.precompute_pool.shutdown(wait=False, cancel_futures=True)
+        self.reprocess_generation += 1
+        self.reprocess_worker.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
     
     def load_image(self):
         """Mở hộp thoại chọn file ảnh"""
         file_path = filedialog.askopenfilename(
             title="Chọn ảnh",
-            filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.gif")]
+            filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.gif"), ("Vector files", "*.svg *.dxf")]
         )
         
         if file_path:
@@ -319,10 +530,14 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             
             # Nếu file không trong thư mục hiện tại, sao chép vào
             if not os.path.exists(file_name):
-                # Đọc file ảnh
-                img = Image.open(file_path)
-                # Lưu vào thư mục hiện tại
-                img.save(file_name)
+                if is_vector_file(file_name):
+                    # Bản vẽ vector được chép nguyên file
+                    shutil.copyfile(file_path, file_name)
+                else:
+                    # Đọc file ảnh
+                    img = Image.open(file_path)
+                    # Lưu vào thư mục hiện tại
+                    img.save(file_name)
             
             # Cập nhật danh sách ảnh
             self.update_image_list()
@@ -335,7 +550,13 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         """Hiển thị xem trước ảnh"""
         image_path = self.image_choice.get()
         
-        if image_path and os.path.exists(image_path):
+        if image_path and os.path.exists(image_path) and is_vector_file(image_path):
+            # Bản vẽ vector không có ảnh xem trước; đường nét hiện ở khung đường nét sau khi nhập
+            self.preview_label.configure(image="", text=f"Bản vẽ vector: {os.path.basename(image_path)}")
+            self.preview_label.image = None
+            self.current_image = image_path
+            self.process_current_image()
+        elif image_path and os.path.exists(image_path):
             try:
                 # Hiển thị ảnh gốc
                 img = Image.open(image_path).convert("L")
@@ -355,206 +576,677 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         else:
             self.preview_label.configure(image=None, text="Không tìm thấy ảnh.")
     
+    def request_reprocess(self, *args):
+        """Hẹn xử lý lại ảnh khi tham số đứng yên reprocess_delay_ms (gọi liên tục khi kéo thanh trượt)"""
+        if self.reprocess_timer is not None:
+            self.root.after_cancel(self.reprocess_timer)
+        self.reprocess_timer = self.root.after(self.reprocess_delay_ms, self.process_current_image)
+    
     def process_current_image(self, event=None):
-        """Xử lý ảnh hiện tại để trích xuất đường nét"""
+        """Xử lý ảnh hiện tại để trích xuất đường nét
+        
+        Kết quả đã có trong cache bộ nhớ được hiển thị ngay; nếu không, việc xử lý được gửi
+        sang luồng nền và kết quả được hiển thị qua root.after khi xong. Mỗi lần gọi làm
+        các việc đang chờ hoặc đang chạy trước đó bị hủy, nên chỉ bộ tham số mới nhất chạy hết.
+        """
+        self.reprocess_timer = None
         if not self.current_image or not os.path.exists(self.current_image):
             return
         
+        self.reprocess_generation += 1
+        generation = self.reprocess_generation
+        
         try:
             # Trích xuất đường nét từ ảnh
-            threshold = self.threshold_var.get()
+            threshold = self.current_threshold()
             invert = self.invert_var.get()
             method = self.method_var.get()
             detail_level = self.detail_var.get()
             
-            self.original_image, self.drawing_path = self.extract_drawing_path(
-                self.current_image, threshold, invert, method, detail_level
-            )
-            
-            # Tối ưu đường đi
-            self.drawing_path = self.optimize_path(self.drawing_path)
-            
-            # Chuyển sang tọa độ robot
-            _, self.robot_path = self.convert_to_robot_coords(self.drawing_path)
-            
-            # Tạo G-code
-            self.generate_gcode()
-            
-            # Hiển thị đường nét
-            self.show_drawing_path()
-            
-            # Cập nhật thông tin
-            self.points_var.set(f"Số điểm: {len(self.robot_path)}")
-            self.progress_var.set("Tiến độ: 0%")
-            self.progress['value'] = 0
+            params = self.pipeline_params(threshold, invert, method, detail_level)
+            cache_key = self.job_cache.make_key(self.current_image, params)
+            cached_job = self.memory_cache.get(cache_key)
         except Exception as e:
             messagebox.showerror("Lỗi", f"Không thể xử lý ảnh: {str(e)}")
+            return
+        
+        if cached_job is not None:
+            self.show_processed_job(generation, cache_key, cached_job)
+            return
+        
+        # Biến Tk chỉ được đọc ở đây (luồng giao diện); luồng nền nhận bản chụp
+        self.progress_var.set("Đang xử lý ảnh...")
+        settings = (threshold, invert, method, detail_level)
+        self.reprocess_worker.submit(self.reprocess_image, generation, self.current_image, params, cache_key,
+                                     self.pipeline_state(), settings)
     
-    def extract_drawing_path(self, image_path, threshold=128, invert=True, method="contour", detail_level=0.5):
-        """Trích xuất đường nét từ ảnh với nhiều phương pháp khác nhau"""
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    def reprocess_image(self, generation, image_path, params, cache_key, state, settings):
+        """Chạy trong luồng nền: lấy kết quả từ xử lý nền, cache đĩa hoặc chạy pipeline"""
+        def cancelled():
+            return generation != self.reprocess_generation
         
-        if img is None:
-            raise ValueError(f"Không thể đọc ảnh: {image_path}")
+        if cancelled():
+            return
         
-        # Áp dụng bộ lọc khử nhiễu (làm mịn)
-        img_blur = cv2.GaussianBlur(img, (5, 5), 0)
+        try:
+            # Thử lấy kết quả đã xử lý: việc xử lý nền đang chạy, rồi cache đĩa
+            job = self.wait_precomputed(image_path, params, cancelled)
+            if job is None:
+                job = self.job_cache.load(cache_key)
+            
+            if job is None:
+                if self.pipeline_worker is None:
+                    self.pipeline_worker = RobotArmController.from_state(state)
+                else:
+                    self.pipeline_worker.__dict__.update(state)
+                worker = self.pipeline_worker
+                worker.drawing_job.cancel_check = cancelled
+                job = worker.run_pipeline(image_path, *settings)
+                
+                # Lưu kết quả vào cache
+                worker.store_cached_job(cache_key, job)
+        except JobCancelled:
+            return
+        except Exception as e:
+            if not cancelled():
+                self.root.after(0, lambda msg=str(e): messagebox.showerror("Lỗi", f"Không thể xử lý ảnh: {msg}"))
+            return
         
-        # Áp dụng bộ lọc tăng cường cạnh trước khi phân ngưỡng
-        img_enhanced = cv2.Laplacian(img_blur, cv2.CV_8U, ksize=3)
-        img_blur = cv2.addWeighted(img_blur, 0.7, img_enhanced, 0.3, 0)
+        self.root.after(0, lambda: self.show_processed_job(generation, cache_key, job))
+    
+    def show_processed_job(self, generation, cache_key, job):
+        """Hiển thị kết quả xử lý (luồng giao diện), bỏ qua nếu đã có yêu cầu mới hơn"""
+        self.memory_cache.put(cache_key, job)
+        if generation != self.reprocess_generation:
+            return
         
-        drawing_path = []
+        self.restore_cached_job(job)
         
-        # Detail level ảnh hưởng đến epsilon trong approxPolyDP
-        epsilon_factor = 0.03 / detail_level  # Càng nhỏ càng chi tiết
+        # Hiển thị đường nét
+        self.show_drawing_path()
         
-        if method == "contour":
-            # Phương pháp ngưỡng nhị phân và tìm đường viền
-            if invert:
-                _, binary = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY_INV)
-            else:
-                _, binary = cv2.threshold(img_blur, threshold, 255, cv2.THRESH_BINARY)
-            
-            # Áp dụng phép toán hình thái học để nối các đường gần nhau
-            kernel = np.ones((2, 2), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-            
-            # Tìm tất cả các contour, bao gồm cả contour bên trong
-            contours, hierarchy = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-            
-        elif method == "canny":
-            # Phương pháp dùng Canny Edge Detection
-            edges = cv2.Canny(img_blur, threshold, threshold * 2)
-            # Áp dụng phép giãn nở để kết nối các cạnh bị đứt
-            kernel = np.ones((2, 2), np.uint8)
-            edges = cv2.dilate(edges, kernel, iterations=1)
-            contours, hierarchy = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-            
-        elif method == "adaptive":
-            # Phương pháp ngưỡng thích ứng
-            block_size = 11  # Kích thước block - cần là số lẻ
-            C = 2  # Hằng số hiệu chỉnh
-            
-            if invert:
-                binary = cv2.adaptiveThreshold(img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                            cv2.THRESH_BINARY_INV, block_size, C)
-            else:
-                binary = cv2.adaptiveThreshold(img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                            cv2.THRESH_BINARY, block_size, C)
-            
-            # Áp dụng phép toán hình thái học để nối các đường gần nhau
-            kernel = np.ones((2, 2), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-            
-            contours, hierarchy = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        # Cập nhật thông tin
+        self.points_var.set(f"Số điểm: {len(self.robot_path)}")
+        self.trajectory_info_var.set(self.trajectory_info)
+        self.progress_var.set("Tiến độ: 0%")
+        self.progress['value'] = 0
+    
+    def current_threshold(self):
+        """Ngưỡng từ thanh trượt, hoặc None khi bật chế độ tự động"""
+        return None if self.auto_threshold.get() else self.threshold_var.get()
+    
+    def pipeline_params(self, threshold, invert, method, detail_level):
+        """Mọi tham số mà run_pipeline đọc (ảnh hưởng tới kết quả xử lý), dùng làm khóa cache
+        
+        Thêm tham số mới cho pipeline thì phải thêm vào đây, nếu không cache sẽ trả về kết quả cũ.
+        """
+        return {
+            "threshold": float(threshold) if threshold is not None else "auto",
+            "invert": bool(invert),
+            "method": method,
+            "detail": round(float(detail_level), 4),
+            "chord_tolerance": self.chord_tolerance,
+            "working_resolution": (self.pen_width, self.pixels_per_pen_width),
+            "workspace_size": self.workspace_size,
+            "image_size": self.image_size,
+            "skeleton_spur": self.skeleton_spur,
+            "dedup_tolerance": self.dedup_tolerance,
+            "tiling": (self.tiling, self.tile_pixels, self.tile_size, self.tile_overlap),
+            "vector_tolerance": self.vector_tolerance,
+            "travel_time_limit": self.travel_time_limit,
+            "offset_x": float(self.offset_x.get()),
+            "offset_y": float(self.offset_y.get()),
+            "L1": self.L1,
+            "L2": self.L2,
+            "optimize_elbow": self.optimize_elbow,
+            "min_step_change": self.min_step_change,
+            "steps_per_degree": self.steps_per_degree,
+            "joint_limits": self.joint_limits,
+            "auto_place": self.auto_place.get() and self.placement_mode.get(),
+            "placement": (self.placement_margin, self.placement_min_y),
+            "timing": (self.max_joint_speed, self.max_joint_accel, self.max_pen_speed, self.travel_feed,
+                       self.junction_time, self.pen_servo_time),
+            "ill_conditioned": self.ill_conditioned,
+        }
+    
+    def debug(self, message):
+        """Thông tin chẩn đoán của các bước xử lý, chỉ in ra khi bật debug_log"""
+        if self.debug_log:
+            print(message)
+    
+    def run_pipeline(self, image_path, threshold, invert, method, detail_level):
+        """Chạy toàn bộ các bước xử lý cho một ảnh, trả về kết quả dạng mảng như trong cache
+        
+        Các bước được nhớ trong drawing_job: chỉ những bước có tham số hoặc đầu vào thay đổi
+        so với lần chạy trước mới được tính lại.
+        """
+        job = self.drawing_job
+        job.reset_stats()
+        
+        self.original_image, drawing_path = self.extract_drawing_path(
+            image_path, threshold, invert, method, detail_level
+        )
+        
+        # Sắp thứ tự và chiều vẽ các nét để giảm quãng nhấc bút
+        drawing_path = job.run("travel", (self.travel_time_limit,), lambda: self.order_strokes(drawing_path),
+                               depends=("simplify", "vector"))
+        
+        self.drawing_path = drawing_path
+        
+        # Chuyển sang tọa độ robot
+        transform_params = (float(self.offset_x.get()), float(self.offset_y.get()),
+                            self.auto_place.get() and self.placement_mode.get(), self.placement_margin,
+                            self.placement_min_y, self.L1, self.L2, self.workspace_size)
+        robot_path, self.placement = job.run(
+            "transform", transform_params,
+            lambda: (self.convert_to_robot_coords(self.drawing_path)[1], self.placement),
+            depends=("travel", "decode", "vector"),
+        )
+        
+        # Chèn điểm nơi chuyển động khớp giữa hai điểm lệch khỏi đoạn thẳng cần vẽ
+        resample_params = (self.chord_tolerance, self.L1, self.L2)
+        self.robot_path = job.run("resample", resample_params, lambda: self.resample_robot_path(robot_path),
+                                  depends=("transform",))
+        
+        # Tính động học ngược cho toàn bộ đường đi một lần
+        ik_params = (self.L1, self.L2, self.optimize_elbow, self.joint_limits, self.min_step_change, self.chord_tolerance,
+                     self.max_joint_speed,
+                     self.max_joint_accel, self.max_pen_speed, self.travel_feed, self.junction_time,
+                     self.pen_servo_time, self.ill_conditioned)
+        trajectory = job.run("ik", ik_params, self.joint_trajectory_stage, depends=("resample",))
+        for name, value in trajectory.items():
+            setattr(self, name, value)
         
+        # Tạo G-code
+        self.gcode_list = job.run("gcode", (), self.generate_gcode, depends=("ik",))
+        
+        recomputed = ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in job.recomputed)
+        self.debug(f"Pipeline: tính lại [{recomputed or 'không'}], dùng lại {len(job.reused)} bước")
+        
+        return self.job_arrays()
+    
+    def joint_trajectory_stage(self):
+        """Bước IK của pipeline: tính quỹ đạo khớp và trả về mọi thuộc tính mà nó tạo ra"""
+        self.compute_joint_trajectory()
+        names = ("robot_path", "joint_angles", "reachable", "elbow_up", "timestamps", "feed_limits",
+                 "arm_elbow", "arm_tip", "trajectory_report", "trajectory_info")
+        return {name: getattr(self, name) for name in names}
+    
+    def job_arrays(self):
+        """Đường nét, quỹ đạo và G-code hiện tại dưới dạng các mảng (định dạng của cache)"""
+        return {
+            **self.drawing_path.to_arrays("drawing_"),
+            **self.robot_path.to_arrays("robot_"),
+            "joint_angles": self.joint_angles,
+            "reachable": self.reachable,
+            "timestamps": self.timestamps,
+            "feed_limits": self.feed_limits,
+            "gcode": np.array("\n".join(self.gcode_list)),
+            "trajectory_info": np.array(self.trajectory_info),
+        }
+    
+    def store_cached_job(self, cache_key, job=None):
+        """Lưu đường nét, quỹ đạo và G-code hiện tại vào cache"""
+        try:
+            self.job_cache.store(cache_key, **(job if job is not None else self.job_arrays()))
+        except OSError as e:
+            print(f"Không thể ghi cache: {e}")
+    
+    def restore_cached_job(self, cached_job):
+        """Khôi phục kết quả xử lý từ cache, bỏ qua toàn bộ các bước xử lý ảnh"""
+        self.original_image = None
+        self.source_shape = None
+        self.drawing_path = PathBuffer.from_arrays(cached_job, "drawing_")
+        self.robot_path = PathBuffer.from_arrays(cached_job, "robot_")
+        self.joint_angles = cached_job["joint_angles"]
+        self.reachable = cached_job["reachable"]
+        self.timestamps = cached_job["timestamps"]
+        self.feed_limits = cached_job["feed_limits"]
+        self.compute_arm_positions()
+        gcode_text = str(cached_job["gcode"])
+        self.gcode_list = gcode_text.split("\n") if gcode_text else []
+        self.trajectory_info = str(cached_job["trajectory_info"])
+    
+    def clear_job_cache(self):
+        """Xóa toàn bộ cache kết quả xử lý"""
+        self.job_cache.invalidate()
+        self.memory_cache.clear()
+        messagebox.showinfo("Thông báo", "Đã xóa cache xử lý ảnh.")
+    
+    def working_resolution(self):
+        """Số pixel theo cạnh dài của ảnh cần để phân giải nét bút trên hình vẽ thực tế"""
+        drawing_size = self.workspace_size * 0.8  # Cạnh dài của hình vẽ (mm), như convert_to_robot_coords
+        return int(np.ceil(drawing_size / self.pen_width * self.pixels_per_pen_width))
+    
+    def decode_working_image(self, image_path):
+        """Đọc ảnh xám ở độ phân giải làm việc và cắt theo vùng có nội dung
+        
+        Ảnh lớn được giải mã thu nhỏ ngay khi đọc: PNG/TIFF không nén theo từng dải hàng
+        (read_reduced_gray), định dạng khác bằng IMREAD_REDUCED_* (JPEG không cần giải mã
+        toàn bộ); sau đó cắt theo khung bao nội dung (pixel khác màu nền ở viền ảnh), rồi thu nhỏ về
+        working_resolution theo kích thước ảnh gốc. Trả về (ảnh, tỉ lệ, gốc cắt, kích thước gốc):
+        tọa độ gốc = tọa độ làm việc / tỉ lệ + gốc cắt.
+        """
+        try:
+            with Image.open(image_path) as header:
+                width, height = header.size
+        except (OSError, ValueError):
+            width = height = None
+        
+        target = self.working_resolution()
+        reduction = 1
+        if width is not None:
+            for factor, flag in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                                 (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+                if max(width, height) / factor >= target:
+                    reduction = factor
+                    img = read_reduced_gray(image_path, factor)
+                    if img is None:
+                        img = cv2.imread(image_path, flag)
+                    break
+        if reduction == 1:
+            img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        
+        if img is None:
+            raise ValueError(f"Không thể đọc ảnh: {image_path}")
+        if width is None:
+            height, width = img.shape
+        
+        decoded_scale = np.array([img.shape[1] / width, img.shape[0] / height])
+        
+        # Khung bao nội dung: pixel lệch khỏi màu nền (trung vị viền ảnh) sau khi làm mịn
+        border = np.concatenate((img[0], img[-1], img[:, 0], img[:, -1]))
+        background = np.median(border)
+        content = cv2.absdiff(cv2.blur(img, (3, 3)), np.full_like(img, int(background))) > 16
+        x, y, w, h = cv2.boundingRect(content.astype(np.uint8))
+        if w > 0 and h > 0:
+            # Chừa lề cho bộ lọc làm mịn và các phép hình thái học
+            margin = 8
+            x0, y0 = max(x - margin, 0), max(y - margin, 0)
+            x1, y1 = min(x + w + margin, img.shape[1]), min(y + h + margin, img.shape[0])
+            img = img[y0:y1, x0:x1]
         else:
-            raise ValueError(f"Phương pháp không hợp lệ: {method}")
+            x0 = y0 = 0
+        
+        # Thu nhỏ tiếp (không phóng to) sao cho cạnh dài của ảnh gốc ứng với target pixel
+        resize = min(1.0, target / max(width, height)) / decoded_scale.max()
+        if resize < 1.0:
+            size = (max(1, int(round(img.shape[1] * resize))), max(1, int(round(img.shape[0] * resize))))
+            resize_scale = np.array([size[0] / img.shape[1], size[1] / img.shape[0]])
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        else:
+            resize_scale = np.ones(2)
         
-        # Sắp xếp contour theo kích thước (từ lớn đến nhỏ)
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)
+        scale = decoded_scale * resize_scale
+        origin = np.array([x0, y0]) / decoded_scale
+        return img, scale, origin, (height, width)
+    
+    def extract_drawing_path(self, image_path, threshold=128, invert=True, method="contour", detail_level=0.5):
+        """Trích xuất đường nét từ ảnh với nhiều phương pháp khác nhau
+        
+        Ảnh được xử lý ở độ phân giải làm việc (decode_working_image); tọa độ trả về vẫn
+        theo pixel của ảnh gốc. Mỗi bước (đọc ảnh, tiền xử lý, nhị phân hóa, tìm contour,
+        sắp xếp, đơn giản hóa) được nhớ trong drawing_job theo tham số của chính nó, nên
+        đổi một tham số chỉ tính lại các bước phụ thuộc vào nó. threshold=None chọn ngưỡng
+        tự động (select_threshold). File SVG/DXF được nhập trực tiếp (import_vector_path).
+        """
+        if is_vector_file(image_path):
+            return self.import_vector_path(image_path)
+        
+        job = self.drawing_job
+        stat = os.stat(image_path)
+        
+        img, work_scale, work_origin, self.source_shape = job.run(
+            "decode", (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, self.working_resolution()),
+            lambda: self.decode_working_image(image_path),
+        )
+        # Vẽ lại một đoạn đã vẽ có lợi khi nhanh hơn một lần nhấc + hạ bút (PU/PD)
+        mm_per_pixel = self.pen_width / self.pixels_per_pen_width
+        retrace_limit = 2 * self.pen_servo_time * self.max_pen_speed / mm_per_pixel
+        auto = threshold is None
+        
+        if self.use_tiling(img, method):
+            # Ảnh làm việc lớn: xử lý theo ô song song, bộ nhớ trung gian chỉ theo kích thước ô
+            if auto:
+                threshold = job.run("auto_threshold", (method, "tiled"), lambda: self.select_threshold_tiled(img, method),
+                                    depends=("decode",))
+            contours, closed = job.run("contours", (method, threshold, invert, "tiled", self.tile_size, self.tile_overlap),
+                                       lambda: self.extract_contours_tiled(img, threshold, invert, method),
+                                       depends=("decode",))
+        else:
+            contours, closed = self.extract_contours(job, img, threshold, invert, method, retrace_limit, mm_per_pixel)
         
-        # Tạo danh sách điểm từ contours, ưu tiên contour lớn trước
-        for contour in contours:
-            # Bỏ qua contour quá nhỏ
-            if cv2.contourArea(contour) < 3:  # Giảm kích thước tối thiểu để bắt nhiều chi tiết hơn
-                continue
-            
-            # Độ chi tiết của đường viền phụ thuộc vào detail_level
-            epsilon = epsilon_factor * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
-            
-            # Thêm điểm đánh dấu đường viền mới
-            if len(drawing_path) > 0:
-                drawing_path.append((-1, -1))  # Đánh dấu đường viền mới
-            
-            # Thêm các điểm từ đường viền này
-            for point in approx:
-                x, y = point[0]
-                drawing_path.append((x, y))
+        contours, closed = job.run("order", (), lambda: self.order_contours(contours, closed), depends=("contours",))
+        
+        # Bỏ contour trùng / gần trùng (viền trong của nét mảnh, cạnh kép của Canny)
+        tolerance = self.dedup_tolerance * self.pixels_per_pen_width
+        if tolerance > 0:
+            contours, closed, removed = job.run(
+                "dedup", (tolerance, retrace_limit),
+                lambda: dedup_contours(contours, closed, img.shape, tolerance, retrace_limit), depends=("order", "decode"),
+            )
+            self.debug(f"Bỏ nét trùng: còn {len(contours)} nét, bớt {removed * mm_per_pixel:.1f} mm vẽ")
+        
+        drawing_path = job.run("simplify", (detail_level,),
+                               lambda: self.simplify_contours(contours, detail_level, work_scale, work_origin, closed),
+                               depends=("order", "dedup", "decode"))
         
         # Đảm bảo có đường nét để vẽ
         if not drawing_path:
-            # Nếu không tìm thấy đường viền với ngưỡng hiện tại, thử lại với ngưỡng thấp hơn
-            if method == "contour" and threshold > 50:
-                print("Thử lại với ngưỡng thấp hơn:", threshold - 30)
-                return self.extract_drawing_path(image_path, threshold - 30, invert, method, detail_level)
-            else:
-                raise ValueError("Không thể trích xuất đường nét từ ảnh. Hãy thử điều chỉnh ngưỡng hoặc phương pháp.")
+            # Không có đường viền với ngưỡng đã chọn: thử một lần với ngưỡng tự động. Ảnh và
+            # các bước trước ngưỡng đã được nhớ trong drawing_job nên không đọc/lọc lại ảnh.
+            if not auto and method != "adaptive":
+                print("Không tìm thấy đường nét, thử với ngưỡng tự động")
+                return self.extract_drawing_path(image_path, None, invert, method, detail_level)
+            raise ValueError("Không thể trích xuất đường nét từ ảnh. Hãy thử điều chỉnh ngưỡng hoặc phương pháp.")
         
         return img, drawing_path
     
-    def optimize_path(self, drawing_path):
-        """Tối ưu đường đi để có chuyển động mượt hơn"""
+    def import_vector_path(self, image_path):
+        """Nhập bản vẽ SVG/DXF thành drawing_path, bỏ qua toàn bộ các bước xử lý ảnh
+        
+        Đường cong được rời rạc hóa theo vector_tolerance (mm) ở kích thước vẽ mặc định
+        (cạnh dài = 80% vùng làm việc, như convert_to_robot_coords). Các tham số ngưỡng,
+        phương pháp và mức chi tiết không áp dụng.
+        """
+        stat = os.stat(image_path)
+        drawing_size = self.workspace_size * 0.8
+        drawing_path, self.source_shape, skipped = self.drawing_job.run(
+            "vector", (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, self.vector_tolerance, drawing_size),
+            lambda: load_vector_drawing(image_path, self.vector_tolerance, drawing_size),
+        )
+        if skipped:
+            print("DXF: bỏ qua thực thể không hỗ trợ " + ", ".join(f"{count} {name}" for name, count in sorted(skipped.items())))
+        self.debug(f"Nhập {os.path.basename(image_path)}: {drawing_path.segment_count} nét, {len(drawing_path)} điểm")
         if not drawing_path:
-            return []
-            
-        optimized_path = []
-        current_contour = []
-        
-        for point in drawing_path:
-            if point == (-1, -1):  # Đánh dấu đường viền mới
-                if current_contour:
-                    # Đóng đường viền (kết nối điểm đầu và cuối)
-                    if len(current_contour) > 1 and current_contour[0] != current_contour[-1]:
-                        current_contour.append(current_contour[0])
-                    
-                    # Thêm vào đường đi tối ưu
-                    optimized_path.extend(current_contour)
-                    
-                    # Đánh dấu bắt đầu đường viền mới
-                    if optimized_path:
-                        optimized_path.append((-1, -1))
-                        
-                current_contour = []
+            raise ValueError("Không tìm thấy đường nét nào trong bản vẽ vector.")
+        return None, drawing_path
+    
+    def extract_contours(self, job, img, threshold, invert, method, retrace_limit, mm_per_pixel):
+        """Các bước tiền xử lý, phân ngưỡng và tìm contour trên cả ảnh làm việc: (contour, cờ kín)"""
+        img_blur = job.run("preprocess", (), lambda: self.preprocess_image(img), depends=("decode",))
+        
+        if threshold is None:
+            threshold = job.run("auto_threshold", (method,), lambda: self.select_threshold(img_blur, method),
+                                depends=("preprocess",))
+        
+        if method == "contour":
+            # Contour theo mọi ngưỡng được tra từ ảnh mức tính một lần cho mỗi ảnh
+            levels = job.run("levels", (invert,), lambda: ThresholdLevels(img_blur, invert), depends=("preprocess",))
+            contours = job.run("contours", (method, levels.level(threshold)), lambda: levels.contours(threshold),
+                               depends=("levels",))
+        elif method == "skeleton":
+            # Đường trục của nét (một nét bút cho mỗi nét trong ảnh) thay vì đường viền hai bên nét
+            levels = job.run("levels", (invert,), lambda: ThresholdLevels(img_blur, invert), depends=("preprocess",))
+            skeleton = job.run("skeleton", (levels.level(threshold),), lambda: thin(levels.binary(threshold)),
+                               depends=("levels",))
+            min_spur = self.skeleton_spur * self.pixels_per_pen_width
+            contours, report = job.run("contours", (method, min_spur, retrace_limit),
+                                       lambda: trace_strokes(skeleton, min_spur, retrace_limit), depends=("skeleton",))
+            retrace_mm = report["retrace"] * mm_per_pixel
+            saved = (report["branch_strokes"] - report["strokes"]) * 2 * self.pen_servo_time - retrace_mm / self.max_pen_speed
+            self.debug(f"Đồ thị nét: {report['branch_strokes']} -> {report['strokes']} lần nhấc bút, "
+                       f"vẽ lại {retrace_mm:.1f} mm, tiết kiệm ~{saved:.1f} s")
+        else:
+            if method == "canny":
+                # Gradient không phụ thuộc ngưỡng, chỉ bước trễ (hysteresis) của Canny chạy lại
+                gradients = job.run("gradients", (), lambda: self.image_gradients(img_blur), depends=("preprocess",))
+                binarize, source = (lambda: self.canny_edges(gradients, threshold)), "gradients"
+            else:
+                binarize, source = (lambda: self.binarize_image(img_blur, threshold, invert, method)), "preprocess"
+            binary = job.run("binarize", (method, threshold, invert), binarize, depends=(source,))
+            contours = job.run("contours", (method,),
+                               lambda: cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0],
+                               depends=("binarize",))
+        return contours, [method != "skeleton"] * len(contours)
+    
+    def select_threshold(self, img_blur, method):
+        """Ngưỡng tự động trong một lượt, không cần thử nhiều ngưỡng
+        
+        contour/skeleton: Otsu hoặc tam giác trên histogram của ảnh đã tiền xử lý. canny:
+        Otsu trên phân bố độ lớn gradient (L1, như cv2.Canny) cho ngưỡng trên; ngưỡng truyền
+        vào canny_edges là ngưỡng dưới = một nửa. adaptive không dùng ngưỡng toàn cục.
+        """
+        if method == "adaptive":
+            return 0  # Ngưỡng thích ứng tự tính theo từng vùng
+        
+        gradients = None
+        if method == "canny":
+            gradients = self.drawing_job.run("gradients", (), lambda: self.image_gradients(img_blur), depends=("preprocess",))
+        return self.threshold_from_histogram(self.threshold_histogram(img_blur, method, gradients), method)
+    
+    def threshold_histogram(self, img_blur, method, gradients=None):
+        """Histogram để chọn ngưỡng: mức xám (contour/skeleton) hoặc độ lớn gradient L1 (canny)
+        
+        Độ dài cố định nên histogram của từng ô ảnh cộng trực tiếp được với nhau.
+        """
+        if method == "canny":
+            dx, dy = gradients if gradients is not None else self.image_gradients(img_blur)
+            magnitude = np.abs(dx.astype(np.int32)) + np.abs(dy.astype(np.int32))
+            return np.bincount(magnitude.ravel(), minlength=8 * 255 + 1)
+        return np.bincount(img_blur.ravel(), minlength=256)
+    
+    def threshold_from_histogram(self, hist, method):
+        """Ngưỡng tự động từ histogram của threshold_histogram"""
+        if method == "canny":
+            hist = hist.copy()
+            hist[0] = 0  # Vùng phẳng chiếm gần hết ảnh nét vẽ, không mang thông tin cạnh
+            threshold = otsu_threshold(hist) / 2
+        else:
+            threshold = auto_threshold(hist)
+        self.debug(f"Ngưỡng tự động ({method}): {threshold:g}")
+        return threshold
+    
+    def use_tiling(self, img, method):
+        """Có xử lý ảnh làm việc theo ô không (theo self.tiling; "skeleton" cần cả ảnh nên không chia ô)"""
+        if method == "skeleton" or self.tiling == "off":
+            return False
+        if self.tiling == "on":
+            return img.shape[0] > self.tile_size or img.shape[1] > self.tile_size
+        return img.size > self.tile_pixels
+    
+    def select_threshold_tiled(self, img, method):
+        """Như select_threshold cho chế độ xử lý theo ô: cộng histogram vùng lõi của từng ô"""
+        if method == "adaptive":
+            return 0
+        
+        def work(tile, core, padded):
+            img_blur = self.preprocess_image(tile, buffer=self.fresh_buffer)
+            gradients = self.image_gradients(img_blur) if method == "canny" else None
+            x0, y0 = core[0] - padded[0], core[1] - padded[1]
+            inner = (slice(y0, y0 + core[3] - core[1]), slice(x0, x0 + core[2] - core[0]))
+            if gradients is not None:
+                gradients = (gradients[0][inner], gradients[1][inner])
+            return self.threshold_histogram(img_blur[inner], method, gradients)
+        
+        boxes = tile_boxes(img.shape, self.tile_size, self.tile_overlap)
+        return self.threshold_from_histogram(np.sum(map_tiles(img, boxes, work), axis=0), method)
+    
+    def extract_contours_tiled(self, img, threshold, invert, method):
+        """Tìm contour theo từng ô có lề chồng nhau, chạy song song, rồi nối qua mép ô: (contour, cờ kín)
+        
+        Các bước tiền xử lý và phân ngưỡng đều cục bộ (bán kính nhỏ hơn tile_overlap) nên ảnh
+        nhị phân trong lõi mỗi ô giống hệt khi xử lý cả ảnh; riêng bước trễ của Canny có thể
+        lan xa hơn lề nên có thể khác đôi chút ở mép ô. Contour nằm trọn trong lõi được giữ
+        nguyên, contour cắt mép lõi được chia thành đoạn và nối lại bằng stitch_pieces.
+        """
+        def work(tile, core, padded):
+            img_blur = self.preprocess_image(tile, buffer=self.fresh_buffer)
+            if method == "contour":
+                binary = ThresholdLevels(img_blur, invert).binary(threshold)
+            elif method == "canny":
+                binary = self.canny_edges(self.image_gradients(img_blur), threshold, buffer=self.fresh_buffer)
             else:
-                current_contour.append(point)
+                binary = self.binarize_image(img_blur, threshold, invert, method, buffer=self.fresh_buffer)
+            
+            # Hai lần findContours cho cùng danh sách contour: dạng rút gọn cho contour nằm trọn
+            # trong lõi (như khi xử lý cả ảnh), đủ điểm cho contour cắt mép lõi
+            whole, pieces = [], []
+            offset = np.array(padded[:2], dtype=np.int32)
+            x0, y0, x1, y1 = core[0] - padded[0], core[1] - padded[1], core[2] - padded[0], core[3] - padded[1]
+            simple = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0]
+            full = None
+            for i, contour in enumerate(simple):
+                x, y, w, h = cv2.boundingRect(contour)
+                if x >= x1 or y >= y1 or x + w <= x0 or y + h <= y0:
+                    continue  # Thuộc lõi của ô khác
+                if x >= x0 and y >= y0 and x + w <= x1 and y + h <= y1:
+                    whole.append(contour + offset)
+                    continue
+                if full is None:
+                    full = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)[0]
+                pieces.extend(clip_to_core(full[i] + offset, core)[1])
+            return whole, pieces
+        
+        boxes = tile_boxes(img.shape, self.tile_size, self.tile_overlap)
+        results = map_tiles(img, boxes, work)
+        
+        contours = [contour for whole, _ in results for contour in whole]
+        closed = [True] * len(contours)
+        pieces = [piece for _, parts in results for piece in parts]
+        for points, is_closed in stitch_pieces(pieces):
+            contours.append(points.reshape(-1, 1, 2).astype(np.int32))
+            closed.append(is_closed)
+        
+        self.debug(f"Xử lý theo ô: {len(boxes)} ô, nối {len(pieces)} đoạn qua mép ô, "
+                   f"{closed.count(False)} nét chưa khép kín")
+        return contours, closed
+    
+    @staticmethod
+    def fresh_buffer(name, shape, dtype=np.uint8):
+        """Bộ đệm mới mỗi lần gọi, dùng thay DrawingJob.buffer khi nhiều luồng xử lý song song"""
+        return np.empty(shape, dtype=dtype)
+    
+    def preprocess_image(self, img, buffer=None):
+        """Làm mịn và tăng cường cạnh trước khi phân ngưỡng (ghi vào bộ đệm dùng lại của drawing_job)"""
+        buffer = buffer or self.drawing_job.buffer
+        
+        # Áp dụng bộ lọc khử nhiễu (làm mịn)
+        img_blur = cv2.GaussianBlur(img, (5, 5), 0, dst=buffer("blur", img.shape))
+        
+        # Áp dụng bộ lọc tăng cường cạnh trước khi phân ngưỡng
+        img_enhanced = cv2.Laplacian(img_blur, cv2.CV_8U, dst=buffer("laplacian", img.shape), ksize=3)
+        return cv2.addWeighted(img_blur, 0.7, img_enhanced, 0.3, 0, dst=buffer("preprocessed", img.shape))
+    
+    def binarize_image(self, img_blur, threshold, invert, method, buffer=None):
+        """Ảnh nhị phân để tìm contour theo ngưỡng thích ứng (adaptive)
+        
+        Phương pháp "contour" dùng ThresholdLevels và "canny" dùng canny_edges.
+        """
+        if method != "adaptive":
+            raise ValueError(f"Phương pháp không hợp lệ: {method}")
+        
+        buffer = buffer or self.drawing_job.buffer
+        shape = img_blur.shape
+        kernel = np.ones((2, 2), np.uint8)
+        
+        # Phương pháp ngưỡng thích ứng
+        block_size = 11  # Kích thước block - cần là số lẻ
+        C = 2  # Hằng số hiệu chỉnh
+        
+        mode = cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY
+        binary = cv2.adaptiveThreshold(img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, mode, block_size, C,
+                                       dst=buffer("binary", shape))
+        
+        # Áp dụng phép toán hình thái học để nối các đường gần nhau
+        return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, dst=buffer("closed", shape))
+    
+    def image_gradients(self, img_blur):
+        """Đạo hàm Sobel 3x3 (dx, dy) như bên trong cv2.Canny, tính một lần cho mọi ngưỡng"""
+        dx = cv2.Sobel(img_blur, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        dy = cv2.Sobel(img_blur, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        return dx, dy
+    
+    def canny_edges(self, gradients, threshold, buffer=None):
+        """Canny Edge Detection từ gradient đã tính sẵn"""
+        buffer = buffer or self.drawing_job.buffer
+        dx, dy = gradients
+        kernel = np.ones((2, 2), np.uint8)
+        
+        edges = cv2.Canny(dx, dy, threshold, threshold * 2, edges=buffer("binary", dx.shape))
+        # Áp dụng phép giãn nở để kết nối các cạnh bị đứt
+        return cv2.dilate(edges, kernel, dst=buffer("closed", dx.shape), iterations=1)
+    
+    def order_contours(self, contours, closed):
+        """Bỏ contour quá nhỏ và sắp xếp theo diện tích (từ lớn đến nhỏ) để vẽ contour lớn trước
+        
+        closed là cờ kín của từng contour. Nét mở (phương pháp "skeleton", đoạn chưa nối được
+        khi xử lý theo ô) được xếp sau, theo chiều dài. Trả về (contour, cờ kín).
+        """
+        areas = [cv2.contourArea(contour) if is_closed else 0.0 for contour, is_closed in zip(contours, closed)]
+        lengths = [0.0 if is_closed else cv2.arcLength(contour, False) for contour, is_closed in zip(contours, closed)]
+        order = sorted(range(len(contours)), key=lambda i: (closed[i], areas[i], lengths[i]), reverse=True)
+        # Giảm kích thước tối thiểu để bắt nhiều chi tiết hơn
+        order = [i for i in order if not closed[i] or areas[i] >= 3]
+        return [contours[i] for i in order], [closed[i] for i in order]
+    
+    def simplify_contours(self, contours, detail_level, work_scale, work_origin, closed):
+        """Đơn giản hóa contour theo mức chi tiết và nối thành drawing_path theo tọa độ ảnh gốc
+        
+        closed là cờ kín của từng contour: contour kín được nối lại điểm đầu ở cuối, nét mở
+        giữ nguyên hai đầu.
+        """
+        segments = []
         
-        # Xử lý contour cuối cùng
-        if current_contour:
-            # Đóng đường viền nếu cần
-            if len(current_contour) > 1 and current_contour[0] != current_contour[-1]:
-                current_contour.append(current_contour[0])
+        # Detail level ảnh hưởng đến epsilon trong approxPolyDP
+        epsilon_factor = 0.03 / detail_level  # Càng nhỏ càng chi tiết
+        
+        for contour, is_closed in zip(contours, closed):
+            # Độ chi tiết của đường viền phụ thuộc vào detail_level; nét mở dùng sai số theo
+            # bề rộng nét bút vì tỉ lệ theo chiều dài sẽ làm nét dài bị cắt góc quá nhiều
+            if is_closed:
+                epsilon = epsilon_factor * cv2.arcLength(contour, True)
+            else:
+                epsilon = 0.25 * self.pixels_per_pen_width / detail_level
+            approx = cv2.approxPolyDP(contour, epsilon, is_closed)
             
-            # Thêm vào đường đi tối ưu
-            optimized_path.extend(current_contour)
-        
-        # Nội suy thêm điểm để đường đi mượt hơn
-        interpolated_path = []
-        for i in range(len(optimized_path)):
-            if optimized_path[i] == (-1, -1):
-                interpolated_path.append((-1, -1))
-                continue
-                
-            # Thêm điểm hiện tại
-            interpolated_path.append(optimized_path[i])
-            # Nội suy thêm điểm giữa điểm hiện tại và điểm tiếp theo
-            if i < len(optimized_path) - 1 and optimized_path[i+1] != (-1, -1) and optimized_path[i] != (-1, -1):
-                x1, y1 = optimized_path[i]
-                x2, y2 = optimized_path[i+1]
-                
-                # Tính khoảng cách giữa 2 điểm
-                distance = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-                
-                # Nếu khoảng cách đủ lớn, thêm điểm ở giữa
-                step = self.step_size
-                if distance > step * 2:
-                    num_points = int(distance / step) - 1
-                    for j in range(1, num_points + 1):
-                        ratio = j / (num_points + 1)
-                        x = x1 + (x2 - x1) * ratio
-                        y = y1 + (y2 - y1) * ratio
-                        interpolated_path.append((x, y))
-        
-        return interpolated_path
+            # Các điểm của đường viền này (đổi về tọa độ ảnh gốc)
+            points = approx.reshape(-1, 2) / work_scale + work_origin
+            
+            # Đóng đường viền (kết nối điểm đầu và cuối)
+            if is_closed and len(points) > 1 and np.any(points[0] != points[-1]):
+                points = np.vstack((points, points[:1]))
+            segments.append(points)
+        
+        return PathBuffer.from_segments(segments)
+    
+    def order_strokes(self, drawing_path):
+        """Sắp lại thứ tự nét trong drawing_path để giảm tổng quãng nhấc bút giữa các nét
+        
+        Nét mở có thể được vẽ ngược chiều, nét kín (điểm cuối trùng điểm đầu) được bắt đầu
+        tại đỉnh gần nét trước nhất. Tour tham lam rồi cải thiện bằng 2-opt/Or-opt trong tối
+        đa travel_time_limit giây (xem travel_order.order_segments).
+        """
+        if drawing_path.segment_count < 2:
+            return drawing_path
+        
+        segments = drawing_path.segments()
+        closed = [len(points) > 2 and bool(np.all(points[0] == points[-1])) for points in segments]
+        order, reverse, starts, report = order_segments(segments, closed, self.travel_time_limit)
+        
+        ordered = []
+        for s in order:
+            points = segments[s]
+            if starts[s] > 0:
+                # Xoay nét kín, giữ điểm lặp cuối để vẫn đóng kín
+                points = np.concatenate((points[starts[s]:], points[1:starts[s] + 1]))
+            elif reverse[s]:
+                points = points[::-1]
+            ordered.append(points)
+        
+        # Đổi sang mm theo tỉ lệ mặc định của convert_to_robot_coords
+        height, width = self.source_shape if self.source_shape is not None else (self.image_size, self.image_size)
+        mm = self.workspace_size * 0.8 / max(width, height)
+        self.debug(f"Thứ tự nét: nhấc bút {report['before'] * mm:.0f} mm -> {report['after'] * mm:.0f} mm "
+                   f"({len(segments)} nét)")
+        return PathBuffer.from_segments(ordered)
     
     def convert_to_robot_coords(self, drawing_path):
         """Chuyển đường nét từ tọa độ ảnh sang tọa độ robot với việc xử lý nhấc/hạ bút tốt hơn"""
-        robot_coords = []
-        
-        # Tìm kích thước ảnh
-        if self.original_image is not None:
+        # Tìm kích thước ảnh gốc (ảnh xử lý có thể đã được cắt và thu nhỏ)
+        if self.source_shape is not None:
+            height, width = self.source_shape
+        elif self.original_image is not None:
             height, width = self.original_image.shape
         else:
             height, width = self.image_size, self.image_size
@@ -566,56 +1258,265 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         offset_x = self.offset_x.get()
         offset_y = self.offset_y.get()
         
-        current_segments = []
-        current_segment = []
-        
-        # Tách các đoạn (khoảng cách -1, -1)
-        for point in drawing_path:
-            if point == (-1, -1):
-                if current_segment:
-                    current_segments.append(current_segment)
-                    current_segment = []
+        if not drawing_path:
+            return self.original_image, PathBuffer()
+        
+        # Tọa độ ảnh với gốc ở giữa ảnh và trục y hướng lên
+        points = drawing_path.points.astype(float)
+        centered = np.column_stack((points[:, 0] - width / 2, height / 2 - points[:, 1]))
+        
+        rotation = 0.0
+        self.placement = None
+        if self.auto_place.get():
+            placement = self.optimize_placement(centered, drawing_path.lengths(), scale)
+            if placement is not None:
+                scale, rotation, offset_x, offset_y = placement
+                self.placement = placement
+                self.debug(f"Căn chỉnh tự động: tỉ lệ {scale:.4f} mm/px, xoay {rotation:.1f}°, "
+                           f"gốc ({offset_x:.1f}, {offset_y:.1f}) mm")
             else:
-                current_segment.append(point)
-        
-        # Thêm đoạn cuối cùng nếu có
-        if current_segment:
-            current_segments.append(current_segment)
-        
-        # Nhấc bút lên ở vị trí bắt đầu
-        first_segment = True
+                print("Không tìm được vị trí đặt hình nằm trọn trong vùng làm việc, giữ cách đặt thủ công")
+        
+        # Chuyển toàn bộ điểm sang tọa độ robot một lần
+        cos_r, sin_r = np.cos(np.radians(rotation)), np.sin(np.radians(rotation))
+        robot_xy = np.column_stack((
+            (centered[:, 0] * cos_r - centered[:, 1] * sin_r) * scale + offset_x,
+            (centered[:, 0] * sin_r + centered[:, 1] * cos_r) * scale + offset_y,
+        ))
+        
+        # Mỗi nét k điểm thành k + 2 điểm robot: di chuyển nhấc bút tới điểm đầu, hạ bút tại
+        # điểm đầu, vẽ qua các điểm còn lại và nhấc bút tại điểm cuối
+        lengths = drawing_path.lengths()
+        offsets = drawing_path.offsets + 2 * np.arange(len(drawing_path.offsets))
+        segment = np.repeat(np.arange(len(lengths)), lengths + 2)
+        within = np.arange(offsets[-1]) - offsets[segment]
+        source = drawing_path.offsets[segment] + np.clip(within - 1, 0, lengths[segment] - 1)
+        pen = ((within > 0) & (within <= lengths[segment])).astype(np.uint8)
+        
+        return self.original_image, PathBuffer(robot_xy[source], offsets, pen)
+    
+    def resample_robot_path(self, robot_path):
+        """Chèn điểm vào các cạnh vẽ mà chuyển động khớp lệch khỏi đoạn thẳng quá chord_tolerance (mm)
+        
+        Giữa hai điểm liên tiếp cánh tay chạy thẳng trong không gian khớp nên đầu bút đi theo
+        một cung chứ không theo đoạn thẳng. Cạnh vẽ được giữ nguyên nếu độ lệch đủ nhỏ (đoạn
+        thẳng chỉ còn hai đầu, dù dài), ngược lại được chia đôi tại trung điểm cho tới khi mọi
+        phần đạt sai số. Nhánh khuỷu chưa được chọn ở bước này nên độ lệch lấy lớn nhất giữa
+        hai nhánh; cạnh có đầu ngoài tầm với được giữ nguyên.
+        """
+        pen = robot_path.pen
+        edges = np.flatnonzero((pen[:-1] == 1) & (pen[1:] == 1))
+        if len(edges) == 0:
+            return robot_path
+        
+        points = robot_path.points.astype(float)
+        origin, direction = points[edges], points[edges + 1] - points[edges]
+        
+        # Các phần đang xét: (cạnh, tham số đầu, tham số cuối) trên đoạn origin + t·direction
+        edge = np.arange(len(edges))
+        t0, t1 = np.zeros(len(edges)), np.ones(len(edges))
+        new_edge, new_t = [], []
+        for _ in range(16):
+            start = origin[edge] + t0[:, None] * direction[edge]
+            end = origin[edge] + t1[:, None] * direction[edge]
+            deviation = self.joint_chord_deviation(start, end)
+            split = np.flatnonzero((deviation > self.chord_tolerance) & (np.hypot(*(end - start).T) > 1e-3))
+            if len(split) == 0:
+                break
+            middle = (t0[split] + t1[split]) / 2
+            new_edge.append(edge[split])
+            new_t.append(middle)
+            edge = np.concatenate((edge[split], edge[split]))
+            t0, t1 = np.concatenate((t0[split], middle)), np.concatenate((middle, t1[split]))
+        
+        added = sum(len(e) for e in new_edge)
+        self.debug(f"Lấy mẫu theo sai số dây cung {self.chord_tolerance} mm: {len(edges)} cạnh vẽ, thêm {added} điểm")
+        if added == 0:
+            return robot_path
+        
+        # Điểm chèn được đặt trước điểm cuối của cạnh, theo thứ tự tham số trên cạnh
+        new_edge, new_t = np.concatenate(new_edge), np.concatenate(new_t)
+        order = np.lexsort((new_t, new_edge))
+        new_edge, new_t = new_edge[order], new_t[order]
+        new_points = origin[new_edge] + new_t[:, None] * direction[new_edge]
+        return robot_path.insert(edges[new_edge] + 1, new_points, 1)
+    
+    def joint_chord_deviation(self, start, end):
+        """Độ lệch lớn nhất (mm) giữa đường đầu bút khi nội suy tuyến tính góc khớp và đoạn thẳng start-end
+        
+        Đường đầu bút được lấy mẫu tại 1/4, 1/2 và 3/4 hành trình khớp với cả hai nhánh khuỷu.
+        Phần có đầu ngoài tầm với trả về 0.
+        """
+        theta1_a, theta2_a, reach_a = self.inverse_kinematics_batch(start)
+        theta1_b, theta2_b, reach_b = self.inverse_kinematics_batch(end)
+        down_a, down_b = np.column_stack((theta1_a, theta2_a)), np.column_stack((theta1_b, theta2_b))
+        
+        chord = end - start
+        chord_sq = np.maximum(np.einsum("ij,ij->i", chord, chord), 1e-12)
+        deviation = np.zeros(len(start))
+        for angles_a, angles_b in ((down_a, down_b),
+                                   (self.mirror_elbow_branch(start, down_a), self.mirror_elbow_branch(end, down_b))):
+            delta = angles_b - angles_a
+            delta[:, 0] = (delta[:, 0] + 180) % 360 - 180  # θ1 đi theo chiều quay ngắn nhất
+            for t in (0.25, 0.5, 0.75):
+                angles = angles_a + t * delta
+                tip = forward_kinematics_batch(angles[:, 0], angles[:, 1], self.L1, self.L2)[1]
+                offset = tip - start
+                s = np.clip(np.einsum("ij,ij->i", offset, chord) / chord_sq, 0.0, 1.0)
+                deviation = np.maximum(deviation, np.hypot(*(offset - s[:, None] * chord).T))
+        return np.where(reach_a & reach_b, deviation, 0.0)
+    
+    def placement_scale_limits(self, vectors, targets):
+        """Tỉ lệ lớn nhất để các điểm t + s*v nằm trong vùng làm việc, cho từng ứng viên t
+        
+        vectors: (M, 2) vị trí điểm so với tâm hình (đã xoay), targets: (K, 2) tâm hình trong
+        tọa độ robot. Với mỗi điểm, ràng buộc bán kính ngoài, bán kính trong và y tối thiểu là
+        các bất phương trình bậc hai/bậc nhất theo s nên giải được trực tiếp; kết quả là tỉ lệ
+        lớn nhất mà mọi s' trong [0, s] đều hợp lệ. Ứng viên không hợp lệ trả về 0.
+        """
+        r_out = self.L1 + self.L2 - self.placement_margin
+        r_in = abs(self.L1 - self.L2) + self.placement_margin
+        
+        tx, ty = targets[:, 0:1], targets[:, 1:2]
+        vx, vy = vectors[None, :, 0], vectors[None, :, 1]
+        
+        a = vx**2 + vy**2
+        b = 2 * (tx * vx + ty * vy)
+        t2 = tx**2 + ty**2
+        safe_a = np.where(a > 0, a, 1.0)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # |t + s v| <= r_out: nghiệm dương của phương trình bậc hai
+            disc_out = np.maximum(b**2 - 4 * a * (t2 - r_out**2), 0)
+            s_out = np.where(a > 0, (-b + np.sqrt(disc_out)) / (2 * safe_a), np.inf)
+            
+            # |t + s v| >= r_in: điểm đi vào vòng trong tại nghiệm nhỏ (khi đi về phía gốc)
+            disc_in = b**2 - 4 * a * (t2 - r_in**2)
+            s_in = np.where((a > 0) & (b < 0) & (disc_in >= 0),
+                            (-b - np.sqrt(np.maximum(disc_in, 0))) / (2 * safe_a), np.inf)
+            
+            # t_y + s v_y >= y_min
+            s_y = np.where(vy < 0, (ty - self.placement_min_y) / -np.where(vy < 0, vy, -1.0), np.inf)
+        
+        limit = np.minimum(np.minimum(s_out, s_in), s_y).min(axis=1)
+        valid = (t2[:, 0] < r_out**2) & (t2[:, 0] > r_in**2) & (ty[:, 0] >= self.placement_min_y)
+        return np.where(valid, np.maximum(limit, 0), 0.0)
+    
+    def optimize_placement(self, centered, lengths, default_scale):
+        """Tìm tỉ lệ, góc xoay và vị trí đặt hình sao cho mọi điểm nằm trong vùng làm việc
+        
+        Chế độ "size" chọn hình lớn nhất; chế độ "travel" giữ tỉ lệ mặc định (nếu đặt vừa)
+        và chọn cách đặt có tổng quãng đường khớp ước lượng nhỏ nhất. Việc tìm kiếm chạy trên
+        tập điểm rút gọn, sau đó tỉ lệ được tính lại trên toàn bộ điểm nên luôn đảm bảo với mọi điểm.
+        lengths là số điểm của từng nét trong centered. Trả về (tỉ lệ, góc xoay (độ), offset_x, offset_y) hoặc None.
+        """
+        if len(centered) == 0:
+            return None
         
-        # Tạo đường đi robot với việc nhấc/hạ bút rõ ràng
-        for segment in current_segments:
-            if not segment:
-                continue
-            
-            # Chuyển đổi các điểm trong segment sang tọa độ robot
-            robot_segment = []
-            for point in segment:
-                x_img, y_img = point
-                x_robot = (x_img - width/2) * scale + offset_x
-                y_robot = (height/2 - y_img) * scale + offset_y
-                robot_segment.append((x_robot, y_robot))
-            
-            # Thêm lệnh nhấc bút và di chuyển đến điểm đầu tiên của segment
-            first_x, first_y = robot_segment[0]
-            
-            # Nhấc bút lên trước khi di chuyển đến vị trí mới
-            robot_coords.append((first_x, first_y, 0))  # Di chuyển với bút lên
-            
-            # Hạ bút xuống tại vị trí đầu của segment
-            robot_coords.append((first_x, first_y, 1))  # Hạ bút xuống
-            
-            # Thêm các điểm còn lại trong segment (đều với bút hạ xuống)
-            for x, y in robot_segment[1:]:
-                robot_coords.append((x, y, 1))  # Vẽ với bút xuống
-            
-            # Nhấc bút lên tại điểm cuối của segment
-            last_x, last_y = robot_segment[-1]
-            robot_coords.append((last_x, last_y, 0))  # Nhấc bút lên
+        # Tâm đường tròn nhỏ nhất bao hình: mọi cách đặt đều xoay quanh tâm này
+        (cx, cy), _ = cv2.minEnclosingCircle(centered.astype(np.float32))
+        local = centered - (cx, cy)
+        
+        # Tập điểm rút gọn cho tìm kiếm: gộp theo lưới rồi giới hạn số lượng
+        extent = max(np.ptp(local[:, 0]), np.ptp(local[:, 1]), 1e-9)
+        grid = np.floor((local - local.min(axis=0)) / (extent / 128)).astype(np.int64)
+        cells = np.unique(grid[:, 0] * 256 + grid[:, 1], return_index=True)[1]
+        reduced = local[cells]
+        if len(reduced) > 1000:
+            reduced = reduced[np.random.default_rng(0).choice(len(reduced), 1000, replace=False)]
+        
+        # Bán kính ngoài và y tối thiểu luôn đạt cực trị tại bao lồi nên giữ đủ các đỉnh bao lồi
+        hull = cv2.convexHull(local.astype(np.float32)).reshape(-1, 2)
+        reduced = np.vstack((reduced, hull))
+        
+        # Đường đi rút gọn để ước lượng quãng đường khớp (giữ thứ tự và ranh giới đoạn)
+        stride = max(1, len(local) // 400)
+        order = np.arange(0, len(local), stride)
+        order_segment = np.searchsorted(np.cumsum(lengths), order, side='right')
+        same_segment = order_segment[1:] == order_segment[:-1]  # Bước nhảy giữa hai nét là nhấc bút, không tính
+        
+        r_out = self.L1 + self.L2
+        r_in = abs(self.L1 - self.L2)
+        
+        def candidates(rotations, directions, distances):
+            rot, direc, dist = np.meshgrid(rotations, directions, distances, indexing='ij')
+            targets = np.column_stack((dist.ravel() * np.cos(direc.ravel()), dist.ravel() * np.sin(direc.ravel())))
+            return rot.ravel(), targets
+        
+        def evaluate(rotations, targets, points):
+            limits = np.empty(len(rotations))
+            for angle in np.unique(rotations):
+                mask = rotations == angle
+                c, s = np.cos(angle), np.sin(angle)
+                rotated = np.column_stack((points[:, 0] * c - points[:, 1] * s, points[:, 0] * s + points[:, 1] * c))
+                # Chia nhỏ theo ứng viên để giới hạn bộ nhớ
+                chunk = max(1, 2_000_000 // max(len(points), 1))
+                idx = np.flatnonzero(mask)
+                for i in range(0, len(idx), chunk):
+                    part = idx[i:i + chunk]
+                    limits[part] = self.placement_scale_limits(rotated, targets[part])
+            return limits
+        
+        def joint_travel(rotations, targets, scale):
+            travel = np.empty(len(rotations))
+            sample = local[order]
+            for k in range(len(rotations)):
+                c, s = np.cos(rotations[k]), np.sin(rotations[k])
+                xy = np.column_stack((sample[:, 0] * c - sample[:, 1] * s, sample[:, 0] * s + sample[:, 1] * c))
+                theta1, theta2, _ = self.inverse_kinematics_batch(xy * scale + targets[k])
+                d1 = np.abs((np.diff(theta1) + 180) % 360 - 180)
+                d2 = np.abs(np.diff(theta2))
+                travel[k] = (d1 + d2)[same_segment].sum()
+            return travel
+        
+        # Tìm thô trên lưới (góc xoay, hướng và khoảng cách tâm hình)
+        min_direction = np.arcsin(np.clip(self.placement_min_y / r_out, -1, 1))
+        rotations, targets = candidates(
+            np.radians(np.arange(0, 360, 15)),
+            np.linspace(min_direction, np.pi - min_direction, 13),
+            np.linspace(r_in, r_out, 14)[1:-1],
+        )
+        limits = evaluate(rotations, targets, reduced)
+        
+        mode = self.placement_mode.get()
+        if mode == "travel":
+            feasible = np.flatnonzero(limits >= default_scale)
+            if len(feasible) > 0:
+                # Chỉ xét các ứng viên tốt nhất theo khoảng dư tỉ lệ để giới hạn thời gian
+                feasible = feasible[np.argsort(-limits[feasible])[:200]]
+                travel = joint_travel(rotations[feasible], targets[feasible], default_scale)
+                best = feasible[np.argmin(travel)]
+            else:
+                mode = "size"
+        
+        if mode != "travel":
+            best = int(np.argmax(limits))
+            if limits[best] <= 0:
+                return None
+            
+            # Tinh chỉnh quanh ứng viên tốt nhất
+            t = targets[best]
+            base_dist, base_dir = np.hypot(*t), np.arctan2(t[1], t[0])
+            rotations, targets = candidates(
+                rotations[best] + np.radians(np.linspace(-7.5, 7.5, 7)),
+                np.clip(base_dir + np.linspace(-0.12, 0.12, 7), min_direction, np.pi - min_direction),
+                np.clip(base_dist + np.linspace(-12, 12, 7), r_in, r_out),
+            )
+            limits = evaluate(rotations, targets, reduced)
+            best = int(np.argmax(limits))
+        
+        # Kiểm tra lại với toàn bộ điểm để đảm bảo mọi điểm đều trong tầm với
+        rotation, target = rotations[best], targets[best]
+        full_limit = evaluate(np.array([rotation]), target[None, :], local)[0]
+        scale = full_limit * (1 - 1e-6) if mode != "travel" else min(default_scale, full_limit * (1 - 1e-6))
+        if scale <= 0:
+            return None
         
-        return self.original_image, robot_coords
+        # Đổi về dạng tỉ lệ, góc xoay và offset cho tọa độ ảnh đã căn giữa
+        c, s = np.cos(rotation), np.sin(rotation)
+        offset_x = target[0] - scale * (cx * c - cy * s)
+        offset_y = target[1] - scale * (cx * s + cy * c)
+        return float(scale), float(np.degrees(rotation)), float(offset_x), float(offset_y)
     
     def generate_gcode(self):
         """Tạo G-code từ đường đi robot"""
@@ -631,32 +1532,45 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         gcode.append("G0 X0 Y0 ; Move to home position")
         
         # Feedrate (tốc độ di chuyển)
-        travel_speed = 3000  # mm/min khi di chuyển không vẽ
-        drawing_speed = 1000  # mm/min khi vẽ
+        travel_speed = int(self.travel_feed)  # mm/min khi di chuyển không vẽ
+        drawing_speed = int(round(self.max_pen_speed * 60))  # mm/min khi vẽ
         
         pen_up_position = 5  # mm
         pen_down_position = 0  # mm
         
         prev_pen_state = 0  # Bắt đầu với bút lên
         
-        for x, y, pen_state in self.robot_path:
+        # Giới hạn tốc độ tiến từng đoạn (giảm gần tư thế kỳ dị), làm tròn xuống bội số 10 mm/min
+        feed_limits = self.feed_limits if len(self.feed_limits) == len(self.robot_path) else None
+        feed = travel_speed
+        
+        for i, (x, y, pen_state) in enumerate(self.robot_path):
             # Nếu trạng thái bút thay đổi
             if pen_state != prev_pen_state:
                 if pen_state == 1:  # Hạ bút xuống
                     gcode.append(f"G0 Z{pen_down_position} ; Lower pen")
                     gcode.append(f"G1 F{drawing_speed} ; Set drawing speed")
+                    feed = drawing_speed
                 else:  # Nâng bút lên
                     gcode.append(f"G0 Z{pen_up_position} ; Lift pen")
                     gcode.append(f"G0 F{travel_speed} ; Set travel speed")
+                    feed = travel_speed
                 prev_pen_state = pen_state
             
+            # Chỉ ghi F khi giới hạn của đoạn khác tốc độ đang dùng
+            speed = drawing_speed if pen_state == 1 else travel_speed
+            if feed_limits is not None:
+                speed = min(speed, max(10, int(feed_limits[i] // 10) * 10))
+            feed_word = f" F{speed}" if speed != feed else ""
+            feed = speed
+            
             # Lệnh di chuyển
             if pen_state == 1:
                 # Bút xuống - vẽ đường
-                gcode.append(f"G1 X{x:.2f} Y{y:.2f}")
+                gcode.append(f"G1 X{x:.2f} Y{y:.2f}{feed_word}")
             else:
                 # Bút lên - di chuyển
-                gcode.append(f"G0 X{x:.2f} Y{y:.2f}")
+                gcode.append(f"G0 X{x:.2f} Y{y:.2f}{feed_word}")
         
         # Kết thúc với bút lên và về home
         gcode.append("G0 Z5 ; Lift pen to safe height")
@@ -722,32 +1636,12 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         if not self.drawing_path:
             return
         
-        # Phân tách các đường viền để vẽ
-        segments = []
-        current_segment = []
-        
-        for point in self.drawing_path:
-            if point == (-1, -1):
-                if current_segment:
-                    segments.append(current_segment)
-                    current_segment = []
-            else:
-                current_segment.append(point)
-        
-        # Thêm đoạn cuối cùng nếu có
-        if current_segment:
-            segments.append(current_segment)
-        
         # Vẽ từng đoạn với màu khác nhau
         colors = ['b', 'g', 'r', 'c', 'm', 'y', 'k']
         
-        for i, segment in enumerate(segments):
+        for i, segment in enumerate(self.drawing_path.segments()):
             color = colors[i % len(colors)]
-            
-            x_vals = [p[0] for p in segment]
-            y_vals = [p[1] for p in segment]
-            
-            self.ax_path.plot(x_vals, y_vals, f'{color}-', linewidth=1.2)
+            self.ax_path.plot(segment[:, 0], segment[:, 1], f'{color}-', linewidth=1.2)
         
         self.ax_path.set_aspect('equal')
         self.ax_path.axis('off')
@@ -765,61 +1659,41 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         self.ax_robot.grid(True, linestyle='--', alpha=0.3)
         
         # Vẽ đường đã vẽ (chỉ những điểm có pen_state = 1)
-        path_x = []
-        path_y = []
-        
-        # Tách đường thành nhiều đoạn dựa vào trạng thái bút
-        drawing_segments = []
-        current_segment = []
-        pen_down = False
-        
-        for i, (x, y, pen) in enumerate(robot_coords[:frame_idx+1]):
-            if pen == 1:  # Bút đang hạ xuống
-                if not pen_down:  # Bút vừa được hạ xuống
-                    pen_down = True
-                    current_segment = [(x, y)]
-                else:  # Bút tiếp tục vẽ
-                    current_segment.append((x, y))
-                    # Thêm vào đường đã vẽ
-                    self.drawn_path_x.append(x)
-                    self.drawn_path_y.append(y)
-            else:  # Bút đang nhấc lên
-                if pen_down:  # Bút vừa được nhấc lên
-                    pen_down = False
-                    if len(current_segment) > 1:
-                        drawing_segments.append(current_segment)
-                    current_segment = []
-        
-        # Thêm đoạn cuối cùng nếu bút vẫn đang hạ xuống
-        if pen_down and len(current_segment) > 1:
-            drawing_segments.append(current_segment)
+        points = robot_coords.points[:frame_idx+1]
+        pen_down = robot_coords.pen[:frame_idx+1] == 1
+        
+        # Điểm vẽ tiếp sau một điểm vẽ được thêm vào đường đã vẽ
+        drawing = pen_down.copy()
+        drawing[0] = False
+        drawing[1:] &= pen_down[:-1]
+        self.drawn_path_x.extend(points[drawing, 0].tolist())
+        self.drawn_path_y.extend(points[drawing, 1].tolist())
+        
+        # Tách đường thành các đoạn bút hạ liên tiếp (bỏ đoạn chỉ có một điểm)
+        edges = np.diff(np.concatenate(([0], pen_down.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        drawing_segments = [points[s:e] for s, e in zip(starts, ends) if e - s > 1]
         
         # Vẽ từng đoạn với màu khác nhau
         colors = ['green', 'blue', 'red', 'purple', 'orange', 'teal']
         for i, segment in enumerate(drawing_segments):
             color = colors[i % len(colors)]
-            segment_x = [p[0] for p in segment]
-            segment_y = [p[1] for p in segment]
-            self.ax_robot.plot(segment_x, segment_y, color=color, linewidth=1.5, zorder=2)
+            self.ax_robot.plot(segment[:, 0], segment[:, 1], color=color, linewidth=1.5, zorder=2)
         
-        # Lấy tọa độ và trạng thái bút hiện tại
-        x, y, pen = robot_coords[frame_idx]
+        # Trạng thái bút hiện tại
+        pen = robot_coords.pen[frame_idx]
         
-        # Tính góc từ tọa độ bằng động học ngược
-        angles = self.inverse_kinematics(x, y)
-        if not angles:
+        # Lấy góc từ quỹ đạo khớp đã tính sẵn
+        if frame_idx >= len(self.reachable) or not self.reachable[frame_idx]:
             return
         
-        theta1, theta2 = angles
+        theta1, theta2 = self.joint_angles[frame_idx]
         self.theta1_var.set(f"θ1: {theta1:.1f}°")
         self.theta2_var.set(f"θ2: {theta2:.1f}°")
         
-        # Tính toán vị trí điểm nối và điểm cuối
-        x1 = self.L1 * np.cos(np.radians(theta1))
-        y1 = self.L1 * np.sin(np.radians(theta1))
-        
-        x2 = x1 + self.L2 * np.cos(np.radians(theta1 + theta2))
-        y2 = y1 + self.L2 * np.sin(np.radians(theta1 + theta2))
+        # Vị trí điểm nối và điểm cuối lấy từ động học thuận đã tính sẵn
+        x1, y1 = self.arm_elbow[frame_idx]
+        x2, y2 = self.arm_tip[frame_idx]
         
         # Vẽ cánh tay robot với độ dày và màu sắc rõ ràng hơn
         self.ax_robot.plot([0, x1], [0, y1], 'ro-', linewidth=4, markersize=8, zorder=3)  # Link 1
@@ -868,6 +1742,578 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         # Chuyển từ radian sang độ
         return np.degrees(theta1), np.degrees(theta2)
     
+    def inverse_kinematics_batch(self, points):
+        """Tính động học ngược cho cả mảng điểm (N, 2) trong một lần NumPy
+        
+        Trả về (theta1, theta2, reachable): hai mảng góc (độ) và mặt nạ điểm trong tầm với.
+        Góc của điểm ngoài tầm với được tính với d đã kẹp về [-1, 1], cần lọc bằng reachable.
+        Nhánh elbow-up tương ứng lấy bằng mirror_elbow_branch.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        
+        d = (x**2 + y**2 - self.L1**2 - self.L2**2) / (2 * self.L1 * self.L2)
+        reachable = np.abs(d) <= 1
+        
+        # Cùng cấu hình elbow-down như inverse_kinematics
+        theta2 = -np.arccos(np.clip(d, -1.0, 1.0))
+        theta1 = np.arctan2(y, x) - np.arctan2(self.L2 * np.sin(theta2), self.L1 + self.L2 * np.cos(theta2))
+        
+        return np.degrees(theta1), np.degrees(theta2), reachable
+    
+    def compute_joint_trajectory(self):
+        """Tính sẵn quỹ đạo khớp cho toàn bộ robot_path, các vòng lặp vẽ/mô phỏng chỉ cần tra chỉ số"""
+        self.trajectory_report = {}
+        self.trajectory_info = "Quỹ đạo: -"
+        
+        if not self.robot_path:
+            self.joint_angles = np.empty((0, 2))
+            self.reachable = np.empty(0, dtype=bool)
+            self.elbow_up = np.empty(0, dtype=bool)
+            self.timestamps = np.empty(0)
+            self.feed_limits = np.empty(0)
+            self.compute_arm_positions()
+            return self.joint_angles, self.reachable
+        
+        xy, pen = self.robot_path.points.astype(float), self.robot_path.pen.astype(int)
+        theta1, theta2, reachable = self.inverse_kinematics_batch(xy)
+        
+        self.joint_angles = np.column_stack((theta1, theta2))
+        self.reachable = reachable
+        self.elbow_up = np.zeros(len(xy), dtype=bool)
+        
+        if self.optimize_elbow:
+            self.select_elbow_branches(xy, pen)
+        
+        # Gỡ bước nhảy ±360° của θ1 và giữ góc trong giới hạn khớp
+        self.unwrap_joint_trajectory(pen)
+        
+        # Lượng tử hóa theo độ phân giải bước của động cơ và bỏ các điểm không tạo ra bước nào
+        self.compact_joint_trajectory()
+        
+        # Gán mốc thời gian cho từng điểm theo giới hạn tốc độ và gia tốc thực của động cơ
+        self.compute_trajectory_timing()
+        
+        # Giới hạn tốc độ tiến từng bước chuyển theo Jacobian (giảm tốc gần tư thế kỳ dị)
+        self.compute_feed_limits()
+        
+        # Vị trí khuỷu và đầu bút cho mọi khung hình mô phỏng
+        self.compute_arm_positions()
+        
+        return self.joint_angles, self.reachable
+    
+    def compute_arm_positions(self):
+        """Tính động học thuận một lần cho cả quỹ đạo khớp, mô phỏng chỉ cần tra chỉ số"""
+        self.arm_elbow, self.arm_tip = forward_kinematics_batch(
+            self.joint_angles[:, 0], self.joint_angles[:, 1], self.L1, self.L2
+        )
+        return self.arm_elbow, self.arm_tip
+    
+    def unwrap_joint_trajectory(self, pen):
+        """Gỡ bước nhảy ±360° của θ1 dọc theo từng đoạn và giữ quỹ đạo trong giới hạn khớp
+        
+        arctan2 trả θ1 trong ±180°, nên một đường đi qua trục X âm sẽ làm cánh tay quay gần một
+        vòng giữa hai điểm kề nhau. Trong mỗi đoạn, θ1 được nối liên tục theo chiều quay ngắn nhất,
+        sau đó cả đoạn được dịch một bội số 360° để nằm trong giới hạn và gần điểm cuối đoạn trước.
+        Nếu một đoạn vẽ vượt quá giới hạn, nó được tách bằng một lần nhấc bút để phần quay
+        ngược diễn ra khi bút đang nhấc.
+        """
+        (lo1, hi1), (lo2, hi2) = self.joint_limits
+        angles = self.joint_angles
+        
+        # Điểm không thể đặt θ1 vào giới hạn bằng bất kỳ bội số 360° nào, hoặc θ2 ngoài giới hạn
+        k_min = np.ceil((lo1 - angles[:, 0]) / 360)
+        k_max = np.floor((hi1 - angles[:, 0]) / 360)
+        self.reachable &= (k_min <= k_max) & (angles[:, 1] >= lo2) & (angles[:, 1] <= hi2)
+        
+        idx = np.flatnonzero(self.reachable)
+        if len(idx) == 0:
+            return
+        
+        theta1 = angles[idx, 0]
+        travel_move, group, starts, ends = self.segment_groups(pen[idx])
+        
+        # Số bước chuyển θ1 vượt quá nửa vòng trước khi xử lý (tính cả bước từ home)
+        raw_wraps = int(np.count_nonzero(np.abs(np.diff(theta1, prepend=0.0)) > 180))
+        
+        # Nối θ1 liên tục trong từng đoạn theo chiều quay ngắn nhất
+        step = np.diff(theta1, prepend=theta1[0])
+        step = (step + 180) % 360 - 180
+        step[travel_move] = 0
+        cumulative = np.cumsum(step)
+        continuous = theta1[starts][group] + cumulative - cumulative[starts][group]
+        
+        def shift_towards(value, target):
+            """Bội số 360° đưa value vào giới hạn và gần target nhất"""
+            k = np.clip(np.round((target - value) / 360), np.ceil((lo1 - value) / 360), np.floor((hi1 - value) / 360))
+            return 360 * k
+        
+        result = np.empty_like(continuous)
+        splits = []  # Các lần tách: (vị trí bắt đầu phần mới trong idx, θ1 cũ hoặc None, θ1 mới)
+        prev_end = 0.0  # Bắt đầu từ home
+        
+        for start, end in zip(starts, ends):
+            pos = start
+            shift = shift_towards(continuous[pos], prev_end)
+            
+            while True:
+                values = continuous[pos:end + 1] + shift
+                outside = np.flatnonzero((values < lo1) | (values > hi1))
+                if len(outside) == 0:
+                    result[pos:end + 1] = values
+                    prev_end = values[-1]
+                    break
+                
+                # Vẽ tới điểm cuối còn trong giới hạn rồi nhấc bút, quay ngược về phía còn lại
+                cut = pos + outside[0]
+                result[pos:cut] = values[:outside[0]]
+                direction = np.sign(continuous[cut] - continuous[cut - 1])
+                target = lo1 - 360 if direction > 0 else hi1 + 360
+                shift = shift_towards(continuous[cut - 1], target)
+                
+                if lo1 <= continuous[cut] + shift <= hi1:
+                    # Phần mới bắt đầu lại từ điểm cuối của phần trước để không mất nét
+                    pos = cut - 1
+                else:
+                    # Giới hạn quá hẹp: bắt đầu phần mới ở điểm kế tiếp
+                    print(f"Cảnh báo: giới hạn khớp quá hẹp, bỏ một nét ngắn tại điểm {idx[cut]}")
+                    pos = cut
+                    shift = shift_towards(continuous[pos], continuous[pos - 1] + shift)
+                splits.append((pos, result[pos] if pos < cut else None, continuous[pos] + shift))
+        
+        angles[idx, 0] = result
+        
+        if splits:
+            self.insert_pen_lifts(idx, splits)
+        
+        remaining = int(np.count_nonzero(np.abs(np.diff(self.joint_angles[self.reachable, 0], prepend=0.0)) > 180))
+        self.trajectory_report.update({"wraps_before": raw_wraps, "wraps_after": remaining, "limit_splits": len(splits)})
+        if raw_wraps or splits:
+            self.debug(f"Gỡ quay vòng θ1: {raw_wraps} bước nhảy > 180° trước, {remaining} sau "
+                       f"(tất cả khi nhấc bút), {len(splits)} lần tách đoạn do giới hạn khớp")
+    
+    def angles_to_steps(self, angles):
+        """Đổi góc khớp (độ) sang vị trí tuyệt đối của động cơ (bước), làm tròn tới bước gần nhất"""
+        return np.rint(np.asarray(angles, dtype=float) * self.steps_per_degree).astype(np.int64)
+    
+    def compact_joint_trajectory(self):
+        """Lượng tử hóa quỹ đạo khớp theo bước động cơ và bỏ các điểm vẽ không làm khớp nào đổi đủ bước
+        
+        Góc được đổi sang vị trí bước tuyệt đối rồi làm tròn, nên phần dư làm tròn của mỗi điểm
+        không cộng dồn sang các điểm sau. Điểm bên trong một nét vẽ bị bỏ nếu cả hai khớp đổi ít hơn
+        min_step_change bước so với điểm giữ lại gần nhất (không phải điểm kề trước), nên các thay đổi
+        nhỏ liên tiếp vẫn được giữ khi cộng lại đủ lớn. Điểm đổi trạng thái bút luôn được giữ, và
+        điểm bị bỏ làm đường bút lệch quá chord_tolerance được lấy lại (restore_chord_points).
+        """
+        n = len(self.robot_path)
+        if n == 0:
+            return
+        
+        steps = self.angles_to_steps(self.joint_angles)
+        self.joint_angles = steps / self.steps_per_degree
+        
+        # Chỉ xét bỏ các điểm nằm giữa hai điểm cùng đang vẽ
+        pen = self.robot_path.pen
+        candidate = np.zeros(n, dtype=bool)
+        candidate[1:-1] = (pen[:-2] == 1) & (pen[1:-1] == 1) & (pen[2:] == 1)
+        candidate &= self.reachable
+        
+        keep = np.ones(n, dtype=bool)
+        last = None
+        for i, (s1, s2) in enumerate(steps.tolist()):
+            if not self.reachable[i]:
+                continue
+            if candidate[i] and last is not None and \
+                    abs(s1 - last[0]) < self.min_step_change and abs(s2 - last[1]) < self.min_step_change:
+                keep[i] = False
+                continue
+            last = (s1, s2)
+        
+        restored = self.restore_chord_points(keep)
+        kept = int(keep.sum())
+        self.trajectory_report.update({"points_before_compaction": n, "points_after_compaction": kept})
+        if kept == n:
+            return
+        
+        self.robot_path = self.robot_path.select(keep)
+        self.joint_angles = self.joint_angles[keep]
+        self.reachable = self.reachable[keep]
+        self.elbow_up = self.elbow_up[keep]
+        self.debug(f"Nén quỹ đạo theo bước động cơ: {n} -> {kept} điểm "
+                   f"(ngưỡng {self.min_step_change} bước = {self.min_step_change / self.steps_per_degree:.3f}°, "
+                   f"giữ lại {restored} điểm theo sai số dây cung)")
+    
+    def restore_chord_points(self, keep):
+        """Giữ lại các điểm bị bỏ khi nén mà đường bút giữa hai điểm giữ lại kề nó đi lệch quá chord_tolerance
+        
+        Giữa hai điểm giữ lại cánh tay nội suy tuyến tính góc khớp (đã lượng tử hóa), nên điểm
+        bị bỏ được so với vị trí đầu bút tại hình chiếu góc khớp của nó lên đoạn nối hai điểm đó.
+        Mỗi lượt lấy lại điểm lệch nhất của từng khoảng vi phạm (thường là điểm resample_robot_path
+        chèn ở đoạn cong) rồi xét lại. Sửa keep tại chỗ, trả về số điểm được lấy lại.
+        """
+        xy = self.robot_path.points.astype(float)
+        restored = 0
+        while True:
+            dropped = np.flatnonzero(~keep)
+            if len(dropped) == 0:
+                return restored
+            kept = np.flatnonzero(keep)
+            position = np.searchsorted(kept, dropped)
+            a, b = kept[position - 1], kept[position]
+            
+            angles_a, angles_b = self.joint_angles[a], self.joint_angles[b]
+            delta = angles_b - angles_a
+            delta_sq = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-12)
+            t = np.clip(np.einsum("ij,ij->i", self.joint_angles[dropped] - angles_a, delta) / delta_sq, 0.0, 1.0)
+            angles = angles_a + t[:, None] * delta
+            tip = forward_kinematics_batch(angles[:, 0], angles[:, 1], self.L1, self.L2)[1]
+            deviation = np.where(self.reachable[a] & self.reachable[b], np.hypot(*(tip - xy[dropped]).T), 0.0)
+            
+            violating = deviation > self.chord_tolerance
+            if not violating.any():
+                return restored
+            # Điểm lệch nhất của mỗi khoảng giữa hai điểm giữ lại
+            worst = np.lexsort((-deviation[violating], position[violating]))
+            gap = position[violating][worst]
+            first = np.concatenate(([True], gap[1:] != gap[:-1]))
+            keep[dropped[violating][worst[first]]] = True
+            restored += int(first.sum())
+    
+    def insert_pen_lifts(self, idx, splits):
+        """Chèn nhấc bút - quay ngược - hạ bút tại các vị trí tách đoạn do giới hạn khớp
+        
+        Tại mỗi vị trí, điểm đó được lặp lại: vẽ tới điểm và nhấc bút với góc cũ, di chuyển
+        nhấc bút tới góc mới, rồi hạ bút với góc mới và vẽ tiếp. Khi không có góc cũ (phần mới
+        bắt đầu ở điểm kế tiếp), bút được nhấc tại điểm trước đó.
+        """
+        inserts = {}
+        for pos, old_theta1, new_theta1 in splits:
+            if old_theta1 is None:
+                prev = idx[pos - 1]
+                lift_xy, lift_pen = self.robot_path.points[prev], 0
+                old_theta1, prev_theta2 = self.joint_angles[prev]
+                inserts[idx[pos]] = (lift_xy, lift_pen, (old_theta1, prev_theta2), new_theta1)
+            else:
+                lift_xy, lift_pen = self.robot_path.points[idx[pos]], self.robot_path.pen[idx[pos]]
+                theta2 = self.joint_angles[idx[pos], 1]
+                inserts[idx[pos]] = (lift_xy, lift_pen, (old_theta1, theta2), new_theta1)
+        
+        # Mỗi vị trí i nhận ba điểm chèn ngay trước nó: (điểm nhấc, bút cũ), (điểm nhấc, 0), (điểm i, 0)
+        positions = np.repeat(np.array(sorted(inserts), dtype=np.int64), 3)
+        points, pen, angles = [], [], []
+        for i in sorted(inserts):
+            lift_xy, lift_pen, old_angles, new_theta1 = inserts[i]
+            points.extend([lift_xy, lift_xy, self.robot_path.points[i]])
+            pen.extend([lift_pen, 0, 0])
+            angles.extend([old_angles, old_angles, (new_theta1, self.joint_angles[i, 1])])
+            self.joint_angles[i, 0] = new_theta1
+        
+        self.robot_path = self.robot_path.insert(positions, points, pen)
+        self.joint_angles = np.insert(self.joint_angles, positions, np.array(angles, dtype=float), axis=0)
+        self.reachable = np.insert(self.reachable, positions, True)
+        self.elbow_up = np.insert(self.elbow_up, positions, self.elbow_up[positions])
+    
+    def compute_trajectory_timing(self):
+        """Gán mốc thời gian tới từng điểm của robot_path theo giới hạn vận tốc, gia tốc khớp và tốc độ đầu bút
+        
+        Mỗi bước chuyển là một đoạn thẳng trong không gian khớp chạy theo profile hình thang.
+        Tốc độ trên đoạn bị chặn bởi tốc độ tối đa của từng khớp và, khi đang vẽ, bởi tốc độ
+        đầu bút tính qua Jacobian tại hai đầu đoạn. Tốc độ tại các điểm nối lấy từ hai lượt quét
+        xuôi/ngược (v² thay đổi tối đa 2·a·s trên mỗi đoạn); cánh tay dừng hẳn khi nâng/hạ bút
+        và đi chậm lại ở các điểm gãy. Thời gian servo được cộng vào các bước đổi trạng thái bút.
+        """
+        n = len(self.robot_path)
+        self.timestamps = np.zeros(n)
+        idx = np.flatnonzero(self.reachable)
+        if len(idx) == 0:
+            return self.timestamps
+        
+        # Bắt đầu từ home (0, 0) với bút nhấc, giống drawing_process
+        pen = np.concatenate(([0], self.robot_path.pen[idx].astype(int)))
+        angles = np.vstack((np.zeros((1, 2)), self.joint_angles[idx]))
+        
+        delta = np.diff(angles, axis=0)
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        moving = length > 1e-9
+        direction = delta / np.where(moving, length, 1.0)[:, None]
+        
+        # Khớp đi xa nhất theo hướng đoạn quyết định tốc độ và gia tốc dọc đoạn (độ/giây trong không gian khớp)
+        dominant = np.where(moving, np.abs(direction).max(axis=1), 1.0)
+        speed = self.max_joint_speed / dominant
+        accel = self.max_joint_accel / dominant
+        
+        # Khi đang vẽ: tốc độ đầu bút |J·u|·v không vượt quá max_pen_speed
+        drawing = moving & (pen[:-1] == 1) & (pen[1:] == 1)
+        gain = np.maximum(self.tool_speed_gain(angles[:-1], direction), self.tool_speed_gain(angles[1:], direction))
+        speed = np.where(drawing, np.minimum(speed, self.max_pen_speed / np.maximum(gain, 1e-12)), speed)
+        
+        # Giới hạn tốc độ tại các điểm nối: không vượt tốc độ của hai đoạn kề và đủ chậm
+        # để mỗi khớp đổi vận tốc trong junction_time tại điểm gãy
+        cap = np.zeros(len(angles))
+        turn = np.abs(direction[1:] - direction[:-1]).max(axis=1) / self.max_joint_accel
+        corner = self.junction_time / np.maximum(turn, 1e-12)
+        cap[1:-1] = np.minimum(np.minimum(speed[:-1], speed[1:]), corner)
+        
+        # Dừng hẳn quanh các bước không di chuyển (nâng/hạ bút, điểm trùng)
+        still = np.flatnonzero(~moving)
+        cap[still] = 0
+        cap[still + 1] = 0
+        
+        # Lượt quét xuôi rồi ngược: v²[i+1] <= v²[i] + 2·a·s, viết dưới dạng cực tiểu tích lũy
+        gain_sq = np.concatenate(([0.0], np.cumsum(2 * accel * length)))
+        v_sq = gain_sq + np.minimum.accumulate(cap**2 - gain_sq)
+        remaining = gain_sq[-1] - gain_sq
+        v_sq = remaining + np.minimum.accumulate((v_sq - remaining)[::-1])[::-1]
+        v_sq = np.maximum(v_sq, 0.0)
+        
+        # Thời gian từng đoạn theo profile hình thang (hoặc tam giác nếu đoạn quá ngắn)
+        v0_sq, v1_sq = v_sq[:-1], v_sq[1:]
+        v0, v1 = np.sqrt(v0_sq), np.sqrt(v1_sq)
+        peak = np.minimum(speed, np.sqrt((2 * accel * length + v0_sq + v1_sq) / 2))
+        peak = np.maximum(peak, np.maximum(v0, v1))
+        cruise = np.maximum(length - (2 * peak**2 - v0_sq - v1_sq) / (2 * accel), 0.0)
+        duration = (2 * peak - v0 - v1) / accel + cruise / np.where(peak > 0, peak, 1.0)
+        duration = np.where(moving, duration, 0.0)
+        duration += self.pen_servo_time * (pen[1:] != pen[:-1])
+        
+        self.timestamps[idx] = np.cumsum(duration)
+        
+        # Điểm ngoài tầm với giữ mốc thời gian của điểm tới được ngay trước nó
+        last = np.maximum.accumulate(np.where(self.reachable, np.arange(n), -1))
+        self.timestamps = np.where(last >= 0, self.timestamps[np.maximum(last, 0)], 0.0)
+        
+        total = float(self.timestamps[-1])
+        self.trajectory_report["duration"] = total
+        if self.trajectory_info == "Quỹ đạo: -":
+            self.trajectory_info = f"Thời gian vẽ ước lượng: {total:.1f} s"
+        else:
+            self.trajectory_info += f", vẽ ~{total:.0f} s"
+        self.debug(f"Lập lịch quỹ đạo: {len(idx)} điểm, thời gian vẽ ước lượng {total:.1f} s")
+        return self.timestamps
+    
+    def tool_speed_gain(self, angles, direction):
+        """Tốc độ đầu bút (mm/giây) ứng với 1 độ/giây theo hướng khớp direction, |J(θ)·u|"""
+        t1 = np.radians(angles[:, 0])
+        t12 = t1 + np.radians(angles[:, 1])
+        d1, d2 = np.radians(direction[:, 0]), np.radians(direction[:, 1])
+        vx = -(self.L1 * np.sin(t1) + self.L2 * np.sin(t12)) * d1 - self.L2 * np.sin(t12) * d2
+        vy = (self.L1 * np.cos(t1) + self.L2 * np.cos(t12)) * d1 + self.L2 * np.cos(t12) * d2
+        return np.hypot(vx, vy)
+    
+    def compute_feed_limits(self):
+        """Tốc độ tiến lớn nhất (mm/phút) của bước chuyển tới từng điểm mà không khớp nào vượt max_joint_speed
+        
+        Khi vẽ, G-code nội suy đường thẳng Descartes nên tốc độ khớp là J⁻¹·u nhân tốc độ tiến;
+        hệ số này được lấy lớn nhất giữa hai đầu đoạn và dây cung Δθ/Δxy. Khi nhấc bút, khớp chạy
+        thẳng trong không gian khớp nên chỉ dùng dây cung. Ở vùng điều kiện tốt giới hạn này lớn
+        hơn tốc độ vẽ nên không thay đổi gì; chỉ gần tư thế duỗi thẳng hoặc sát vòng trong
+        (số điều kiện lớn) tốc độ tiến mới bị giảm.
+        
+        Khi số điều kiện ở một đầu đoạn vẽ vượt ill_conditioned, J⁻¹ đổi nhanh dọc đoạn nên
+        ước lượng từ hai đầu và dây cung không còn đáng tin; tốc độ tiến của đoạn đó được nhân
+        thêm ill_conditioned / số điều kiện (sau khi đã giới hạn theo tốc độ vẽ) để chừa biên an toàn.
+        """
+        pen_feed = self.max_pen_speed * 60
+        pen = self.robot_path.pen.astype(int)
+        self.feed_limits = np.where(pen == 1, pen_feed, float(self.travel_feed))
+        idx = np.flatnonzero(self.reachable)
+        if len(idx) == 0:
+            return self.feed_limits
+        
+        # Bắt đầu từ home (0, 0) với bút nhấc, giống compute_trajectory_timing
+        pen = np.concatenate(([0], self.robot_path.pen[idx].astype(int)))
+        xy = np.vstack(([[self.L1 + self.L2, 0.0]], self.robot_path.points[idx]))
+        angles = np.vstack((np.zeros((1, 2)), self.joint_angles[idx]))
+        
+        delta_xy = np.diff(xy, axis=0)
+        length = np.hypot(delta_xy[:, 0], delta_xy[:, 1])
+        moving = length > 1e-9
+        direction = delta_xy / np.where(moving, length, 1.0)[:, None]
+        
+        # Số độ khớp (khớp đi xa nhất) trên mỗi mm dịch chuyển đầu bút
+        rate = np.abs(np.diff(angles, axis=0)).max(axis=1) / np.where(moving, length, 1.0)
+        drawing = moving & (pen[:-1] == 1) & (pen[1:] == 1)
+        rate = np.where(drawing, np.maximum.reduce([
+            rate, self.joint_rate_per_mm(angles[:-1], direction), self.joint_rate_per_mm(angles[1:], direction),
+        ]), rate)
+        
+        with np.errstate(divide='ignore'):
+            feed = self.max_joint_speed / rate * 60
+        
+        cap = np.where(pen[1:] == 1, pen_feed, float(self.travel_feed))
+        feed = np.where(moving, np.clip(feed, 1.0, cap), cap)
+        
+        # Giảm thêm tốc độ vẽ ở các đoạn có đầu mút gần kỳ dị
+        _, condition = self.jacobian_conditioning(angles)
+        segment_condition = np.maximum(condition[:-1], condition[1:])
+        ill_segment = drawing & (segment_condition > self.ill_conditioned)
+        feed = np.where(ill_segment, np.maximum(feed * self.ill_conditioned / segment_condition, 1.0), feed)
+        self.feed_limits[idx] = feed
+        
+        # Thống kê vùng gần kỳ dị
+        condition = condition[1:]
+        ill = int(np.count_nonzero(condition > self.ill_conditioned))
+        slowed = int(np.count_nonzero(drawing & (feed < pen_feed)))
+        self.trajectory_report.update({
+            "max_condition": float(condition.max()),
+            "ill_conditioned_points": ill,
+            "slowed_moves": slowed,
+            "min_feed": float(feed[drawing].min()) if drawing.any() else pen_feed,
+        })
+        if slowed:
+            self.trajectory_info += f", giảm tốc {slowed} đoạn gần kỳ dị"
+        self.debug(f"Giới hạn tốc độ tiến: {slowed}/{int(drawing.sum())} đoạn vẽ bị giảm tốc, "
+                   f"{ill} điểm có số điều kiện > {self.ill_conditioned:g} (lớn nhất {condition.max():.1f})")
+        return self.feed_limits
+    
+    def jacobian_conditioning(self, angles):
+        """Giá trị suy biến nhỏ nhất của Jacobian (mm/rad) và số điều kiện tại từng tư thế (N, 2)
+        
+        Với J 2x2: σ_max² + σ_min² = ‖J‖² = L1² + 2·L2² + 2·L1·L2·cosθ2 và σ_max·σ_min = |det J| = L1·L2·|sinθ2|.
+        """
+        t2 = np.radians(angles[:, 1])
+        trace = self.L1**2 + 2 * self.L2**2 + 2 * self.L1 * self.L2 * np.cos(t2)
+        det = self.L1 * self.L2 * np.abs(np.sin(t2))
+        s_max = np.sqrt(trace / 2 + np.sqrt(np.maximum(trace**2 / 4 - det**2, 0)))
+        s_min = det / s_max
+        with np.errstate(divide='ignore'):
+            return s_min, np.where(s_min > 0, s_max / s_min, np.inf)
+    
+    def joint_rate_per_mm(self, angles, direction):
+        """Tốc độ khớp lớn nhất (độ/mm) khi đầu bút đi theo hướng Descartes direction, ‖J⁻¹(θ)·u‖∞"""
+        t1 = np.radians(angles[:, 0])
+        t12 = t1 + np.radians(angles[:, 1])
+        a = -(self.L1 * np.sin(t1) + self.L2 * np.sin(t12))
+        b = -self.L2 * np.sin(t12)
+        c = self.L1 * np.cos(t1) + self.L2 * np.cos(t12)
+        d = self.L2 * np.cos(t12)
+        det = self.L1 * self.L2 * np.sin(np.radians(angles[:, 1]))
+        ux, uy = direction[:, 0], direction[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.maximum(np.abs(d * ux - b * uy), np.abs(a * uy - c * ux)) / np.abs(det)
+        return np.degrees(np.where(np.isfinite(rate), rate, np.inf))
+    
+    def wait_until(self, deadline):
+        """Chờ tới thời điểm deadline (theo time.perf_counter) nếu chưa tới"""
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+    
+    def mirror_elbow_branch(self, xy, joint_angles):
+        """Nghiệm IK của nhánh khuỷu còn lại: đối xứng cánh tay qua đường nối gốc với điểm đích"""
+        phi = np.degrees(np.arctan2(xy[:, 1], xy[:, 0]))
+        return np.column_stack((2 * phi - joint_angles[:, 0], -joint_angles[:, 1]))
+    
+    def joint_move_costs(self, angles):
+        """Quãng đường (tổng |Δθ|) và thời gian ước lượng của từng bước chuyển giữa các điểm liên tiếp"""
+        delta = np.diff(angles, axis=0)
+        delta[:, 0] = (delta[:, 0] + 180) % 360 - 180  # θ1 đi theo chiều quay ngắn nhất
+        delta = np.abs(delta)
+        # Hai khớp chạy đồng thời nên thời gian do khớp đi xa nhất quyết định
+        return delta.sum(axis=1), delta.max(axis=1) / self.max_joint_speed
+    
+    def segment_groups(self, pen):
+        """Chia dãy điểm thành các đoạn ngăn cách bởi bước di chuyển nhấc bút (hai điểm liên tiếp cùng pen = 0)
+        
+        Trả về (travel_move, group, starts, ends): travel_move[i] đúng khi bước chuyển tới điểm i là
+        di chuyển nhấc bút (luôn đúng với điểm đầu), group là chỉ số đoạn của từng điểm.
+        """
+        travel_move = np.concatenate(([True], (pen[1:] == 0) & (pen[:-1] == 0)))
+        group = np.cumsum(travel_move) - 1
+        starts = np.flatnonzero(travel_move)
+        ends = np.append(starts[1:] - 1, len(pen) - 1)
+        return travel_move, group, starts, ends
+    
+    def select_elbow_branches(self, xy, pen):
+        """Chọn nhánh khuỷu cho từng đoạn để tổng thời gian di chuyển khớp nhỏ nhất
+        
+        Chỉ đổi nhánh khi bút nhấc (giữa hai điểm liên tiếp cùng pen = 0), vì đổi nhánh
+        buộc cánh tay đi qua tư thế duỗi thẳng. Giải bằng quy hoạch động trên các đoạn với
+        hai trạng thái (elbow-down/up), chi phí từng điểm được tính vector hóa.
+        """
+        idx = np.flatnonzero(self.reachable)
+        if len(idx) == 0:
+            return
+        
+        # Điểm xuất phát là vị trí home (0, 0) giống drawing_process
+        home = np.zeros((1, 2))
+        down = np.vstack((home, self.joint_angles[idx]))
+        up = np.vstack((home, self.mirror_elbow_branch(xy[idx], self.joint_angles[idx])))
+        
+        travel_move, group, starts, ends = self.segment_groups(pen[idx])
+        n_groups = len(starts)
+        
+        # Chi phí bên trong từng đoạn cho mỗi nhánh (thời gian, quãng đường)
+        inside = ~travel_move[1:]
+        within = []
+        branch_travel = []
+        for angles in (down, up):
+            travel, move_time = self.joint_move_costs(angles)
+            within.append(np.bincount(group[1:][inside], weights=move_time[1:][inside], minlength=n_groups))
+            branch_travel.append(np.bincount(group[1:][inside], weights=travel[1:][inside], minlength=n_groups))
+        within = np.array(within)
+        branch_travel = np.array(branch_travel)
+        
+        # Chi phí chuyển giữa điểm cuối đoạn trước (nhánh a) và điểm đầu đoạn sau (nhánh b)
+        # Chỉ số +1 vì phần tử đầu của down/up là vị trí home
+        prev_end = np.concatenate(([-1], ends[:-1])) + 1
+        transition = np.empty((2, 2, n_groups))
+        transition_travel = np.empty((2, 2, n_groups))
+        branches = (down, up)
+        for a in range(2):
+            for b in range(2):
+                pair = np.stack((branches[a][prev_end], branches[b][starts + 1]), axis=1)
+                delta = pair[:, 1] - pair[:, 0]
+                delta[:, 0] = (delta[:, 0] + 180) % 360 - 180
+                delta = np.abs(delta)
+                transition_travel[a, b] = delta.sum(axis=1)
+                transition[a, b] = delta.max(axis=1) / self.max_joint_speed
+        
+        # Tối ưu thời gian, quãng đường khớp chỉ dùng để phân định khi thời gian bằng nhau
+        tie_break = 1e-6 / self.max_joint_speed
+        within_cost = within + tie_break * branch_travel
+        transition_cost = transition + tie_break * transition_travel
+        
+        # Quy hoạch động (Viterbi) qua các đoạn; home dùng chung cho cả hai nhánh
+        cost = transition_cost[0, :, 0] + within_cost[:, 0]
+        choice = np.zeros((n_groups, 2), dtype=int)
+        for g in range(1, n_groups):
+            options = cost[:, None] + transition_cost[:, :, g]
+            choice[g] = np.argmin(options, axis=0)
+            cost = options[choice[g], [0, 1]] + within_cost[:, g]
+        
+        best = np.empty(n_groups, dtype=int)
+        best[-1] = int(np.argmin(cost))
+        for g in range(n_groups - 1, 0, -1):
+            best[g - 1] = choice[g, best[g]]
+        
+        # Tổng quãng đường và thời gian của phương án cũ (luôn elbow-down) và phương án chọn
+        prev_best = np.concatenate(([0], best[:-1]))
+        groups = np.arange(n_groups)
+        before_time = transition[0, 0].sum() + within[0].sum()
+        before_travel = transition_travel[0, 0].sum() + branch_travel[0].sum()
+        after_time = transition[prev_best, best, groups].sum() + within[best, groups].sum()
+        after_travel = transition_travel[prev_best, best, groups].sum() + branch_travel[best, groups].sum()
+        
+        use_up = best[group].astype(bool)
+        self.joint_angles[idx[use_up]] = up[1:][use_up]
+        self.elbow_up[idx] = use_up
+        
+        saved = before_travel - after_travel
+        self.trajectory_report.update({
+            "travel_before": before_travel,
+            "travel_after": after_travel,
+            "time_before": before_time,
+            "time_after": after_time,
+            "elbow_up_segments": int(best.sum()),
+            "segments": int(n_groups),
+        })
+        self.trajectory_info = (f"Quãng khớp: {after_travel:.0f}° (tiết kiệm {saved:.0f}°, "
+                                f"{before_time - after_time:.1f} s)")
+        self.debug(f"Chọn nhánh khuỷu: {int(best.sum())}/{n_groups} đoạn elbow-up, "
+                   f"quãng khớp {before_travel:.0f}° -> {after_travel:.0f}°, "
+                   f"thời gian ước lượng {before_time:.1f} s -> {after_time:.1f} s")
+    
     def toggle_connection(self):
         """Kết nối/ngắt kết nối với Arduino"""
         if self.is_connected:
@@ -968,7 +2414,9 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             ]
             
             for theta1, theta2 in test_angles:
-                command = f"GOTO {theta1} {theta2}"
+                # GOTO nhận vị trí bước tuyệt đối, giống move_physical_robot
+                s1, s2 = self.angles_to_steps((theta1, theta2))
+                command = f"GOTO {s1} {s2}"
                 print(f"Testing movement to {theta1}°, {theta2}°")
                 self.send_command(command)
                 time.sleep(1)  # Wait for movement to complete
@@ -995,37 +2443,19 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             
             # Handle pen state first
             # If changing from drawing to lifting, lift pen before moving
+            # Timing is handled by the caller's schedule (timestamps), including servo time
             if hasattr(self, 'current_pen') and self.current_pen == 1 and pen == 0:
                 self.send_command("PU")  # Lift pen first
-                time.sleep(self.servo_delay * 3)  # Wait longer to ensure pen is lifted
                 self.current_pen = 0
             
-            # Direct angle command - the Arduino code expects angles directly
-            command = f"GOTO {theta1:.2f} {theta2:.2f}"
-            success = self.send_command(command)
-            
-            # Add a delay to ensure the command is processed
-            time.sleep(self.motor_delay * 2)
-            
-            # Wait for a response to confirm movement is complete
-            if success:
-                # Try to get a response
-                response = ""
-                start_time = time.time()
-                while time.time() - start_time < 1.0:  # Timeout after 1 second
-                    if self.arduino.in_waiting > 0:
-                        response += self.arduino.readline().decode().strip()
-                        if "Moved to angle" in response:
-                            break
-                    time.sleep(0.1)
-                
-                if not response:
-                    print("Warning: No movement confirmation received")
+            # servo.ino parses GOTO arguments with toInt() as absolute step positions
+            s1, s2 = self.angles_to_steps((theta1, theta2))
+            command = f"GOTO {s1} {s2}"
+            self.send_command(command)
             
             # If changing from lifting to drawing, lower pen after movement
             if (not hasattr(self, 'current_pen') or self.current_pen == 0) and pen == 1:
                 self.send_command("PD")  # Lower pen after reaching position
-                time.sleep(self.servo_delay * 3)  # Wait longer to ensure pen is down
                 self.current_pen = 1
                 
             return True
@@ -1102,32 +2532,33 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             total_points = len(self.robot_path)
             print(f"Bắt đầu mô phỏng {total_points} điểm với G-code")
             
+            # Giữ tham chiếu tới quỹ đạo khớp và lịch thời gian đã tính sẵn
+            joint_angles, reachable, timestamps = self.joint_angles, self.reachable, self.timestamps
+            start_time = time.perf_counter()
+            
             # Lặp qua từng điểm trong đường đi robot
             for i, (x, y, pen) in enumerate(self.robot_path):
                 # Kiểm tra dừng
                 if self.stop_drawing:
                     break
                 
+                # Chờ tới thời điểm cánh tay tới điểm này theo lịch
+                self.wait_until(start_time + timestamps[i])
+                
                 # Hiển thị mô phỏng
                 self.root.after(0, lambda idx=i: self.simulate_robot_arm(self.robot_path, idx))
                 
-                # Tính toán góc
-                angles = self.inverse_kinematics(x, y)
-                
-                if not angles:
+                if not reachable[i]:
                     print(f"Bỏ qua điểm {i}: Ngoài tầm với ({x}, {y})")
                     continue
                 
-                theta1, theta2 = angles
+                theta1, theta2 = joint_angles[i]
                 self.theta1_var.set(f"θ1: {theta1:.1f}°")
                 self.theta2_var.set(f"θ2: {theta2:.1f}°")
                 
                 # Cập nhật tiến độ
                 progress = (i + 1) / total_points * 100
                 self.root.after(0, lambda p=progress: self.update_progress(p))
-                
-                # Chờ một chút giữa các điểm
-                time.sleep(0.05)
             
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("Lỗi", f"Lỗi trong quá trình mô phỏng: {str(e)}"))
@@ -1150,19 +2581,26 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             # Theo dõi chuyển động giữa các điểm
             prev_x, prev_y, prev_pen = 0, 0, 0  # Giả sử bắt đầu từ gốc toạ độ
             
+            # Giữ tham chiếu tới quỹ đạo khớp và lịch thời gian đã tính sẵn
+            joint_angles, reachable, timestamps = self.joint_angles, self.reachable, self.timestamps
+            start_time = time.perf_counter()
+            prev_time = 0.0
+            
             # Lặp qua từng điểm trong đường đi robot
             for i, (x, y, pen) in enumerate(self.robot_path):
                 # Kiểm tra dừng
                 if self.stop_drawing:
                     break
                 
-                # Tính toán góc tại điểm đích
-                angles = self.inverse_kinematics(x, y)
-                if not angles:
+                # Góc tại điểm đích lấy từ quỹ đạo khớp
+                if not reachable[i]:
                     print(f"Bỏ qua điểm {i}: Ngoài tầm với ({x}, {y})")
                     continue
                 
-                theta1, theta2 = angles
+                theta1, theta2 = joint_angles[i]
+                
+                # Gửi lệnh tới điểm này khi cánh tay tới điểm trước theo lịch thời gian
+                self.wait_until(start_time + prev_time)
                 
                 # Kiểm tra xem đây có phải là chuyển động nhấc bút và dời xa không
                 is_long_move = False
@@ -1173,7 +2611,8 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
                 
                 if is_long_move:
                     # Tạo animation cho chuyển động dài giữa các đoạn vẽ
-                    self.animate_long_move(prev_x, prev_y, x, y, self.prev_angles, [theta1, theta2])
+                    self.animate_long_move(prev_x, prev_y, x, y, self.prev_angles, [theta1, theta2],
+                                           timestamps[i] - prev_time)
                 else:
                     # Điều khiển robot thực tế
                     self.move_physical_robot(self.prev_angles, theta1, theta2, pen)
@@ -1184,15 +2623,16 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
                 # Cập nhật góc hiện tại
                 self.prev_angles = [theta1, theta2]
                 prev_x, prev_y, prev_pen = x, y, pen
+                prev_time = timestamps[i]
                 
                 # Cập nhật tiến độ
                 progress = (i + 1) / total_points * 100
                 self.root.after(0, lambda p=progress: self.update_progress(p))
-                
-                # Chờ một chút giữa các điểm nếu pen_state = 1 (đang vẽ)
-                if pen == 1:
-                    time.sleep(self.step_size * 0.01)
-                
+            
+            # Chờ cánh tay tới điểm cuối rồi nâng bút
+            if not self.stop_drawing:
+                self.wait_until(start_time + prev_time)
+            
             # Nâng bút khi kết thúc
             self.send_command("PU")
             
@@ -1291,45 +2731,37 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             self.is_drawing = False
             self.root.after(0, self.reset_drawing_ui)
 
-    def animate_long_move(self, start_x, start_y, end_x, end_y, start_angles, end_angles):
-        """Tạo animation cho chuyển động dài giữa các đoạn vẽ"""
+    def animate_long_move(self, start_x, start_y, end_x, end_y, start_angles, end_angles, duration=1.0):
+        """Tạo animation cho chuyển động dài giữa các đoạn vẽ, kéo dài duration giây theo lịch quỹ đạo"""
         # Số lượng bước cho animation
         num_steps = 20
         
-        # Tính toán bước dịch chuyển
-        dx = (end_x - start_x) / num_steps
-        dy = (end_y - start_y) / num_steps
-        
-        # Tính toán bước thay đổi góc
-        d_theta1 = (end_angles[0] - start_angles[0]) / num_steps
-        d_theta2 = (end_angles[1] - start_angles[1]) / num_steps
+        # Nội suy tọa độ và góc cho mọi khung hình, rồi tính động học thuận một lần
+        ratio = np.linspace(0.0, 1.0, num_steps + 1)
+        xs = start_x + (end_x - start_x) * ratio
+        ys = start_y + (end_y - start_y) * ratio
+        theta1s = start_angles[0] + (end_angles[0] - start_angles[0]) * ratio
+        theta2s = start_angles[1] + (end_angles[1] - start_angles[1]) * ratio
+        elbows, tips = forward_kinematics_batch(theta1s, theta2s, self.L1, self.L2)
         
         # Thực hiện animation
         for step in range(num_steps + 1):
-            # Tính toạ độ hiện tại
-            current_x = start_x + dx * step
-            current_y = start_y + dy * step
-            
-            # Tính góc hiện tại
-            current_theta1 = start_angles[0] + d_theta1 * step
-            current_theta2 = start_angles[1] + d_theta2 * step
-            
             # Tạo điểm tạm thời để mô phỏng
-            temp_point = (current_x, current_y, 0)  # Bút luôn nhấc lên trong chuyển động dài
+            temp_point = (xs[step], ys[step], 0)  # Bút luôn nhấc lên trong chuyển động dài
             
             # Hiển thị mô phỏng với điểm tạm thời
-            self.root.after(0, lambda pt=temp_point, t1=current_theta1, t2=current_theta2: 
-                            self.simulate_arm_at_point(pt, t1, t2))
+            self.root.after(0, lambda pt=temp_point, elbow=elbows[step], tip=tips[step]:
+                            self.simulate_arm_at_point(pt, elbow, tip))
             
             # Điều khiển robot thực tế di chuyển đến vị trí trung gian
             if step % 4 == 0:  # Chỉ gửi lệnh sau mỗi 4 bước để tránh quá tải
-                self.move_physical_robot_smooth(current_theta1, current_theta2, 0)
+                self.move_physical_robot_smooth(theta1s[step], theta2s[step], 0)
             
-            # Chờ một khoảng thời gian ngắn
-            time.sleep(0.05)  # Tốc độ animation - càng thấp càng nhanh
+            # Chia đều thời gian của bước chuyển cho các khung hình
+            time.sleep(max(duration, 0.0) / (num_steps + 1))
 
-    def simulate_arm_at_point(self, point, theta1, theta2):
-        """Mô phỏng cánh tay robot tại một điểm cụ thể"""
+    def simulate_arm_at_point(self, point, elbow, tip):
+        """Mô phỏng cánh tay robot tại một điểm cụ thể, với vị trí khuỷu và đầu bút đã tính sẵn"""
         self.ax_robot.clear()
         
         x, y, pen = point
@@ -1341,12 +2773,8 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
         if hasattr(self, 'drawn_path_x') and hasattr(self, 'drawn_path_y'):
             self.ax_robot.plot(self.drawn_path_x, self.drawn_path_y, 'g-', linewidth=1.5, zorder=2)
         
-        # Tính toán vị trí điểm nối và điểm cuối
-        x1 = self.L1 * np.cos(np.radians(theta1))
-        y1 = self.L1 * np.sin(np.radians(theta1))
-        
-        x2 = x1 + self.L2 * np.cos(np.radians(theta1 + theta2))
-        y2 = y1 + self.L2 * np.sin(np.radians(theta1 + theta2))
+        x1, y1 = elbow
+        x2, y2 = tip
         
         # Vẽ cánh tay robot với độ dày và màu sắc rõ ràng hơn
         self.ax_robot.plot([0, x1], [0, y1], 'ro-', linewidth=4, markersize=8, zorder=3)  # Link 1
@@ -1388,9 +2816,8 @@ Chú ý: Đảm bảo robot đã ở vị trí home trước khi vẽ."""
             return False
 
         try:
-            # Tính số bước cho động cơ dựa trên góc
-            dx = int(theta1 * self.step_per_mm)
-            dy = int(theta2 * self.step_per_mm)
+            # Tính số bước cho động cơ dựa trên góc (cùng mô hình bước với quỹ đạo đã lượng tử hóa)
+            dx, dy = self.angles_to_steps((theta1, theta2))
 
             # Gửi lệnh quay tuyệt đối
             self.send_command(f"GOTO {dx} {dy}")
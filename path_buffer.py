@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class PathBuffer:
+    """Đường đi dạng mảng liền, thay cho danh sách tuple có dấu tách nét (-1, -1)
+
+    points là tọa độ float32 (N, 2), offsets là chỉ số điểm đầu từng nét kiểu CSR (S + 1
+    phần tử, offsets[-1] = N) nên nét s là points[offsets[s]:offsets[s + 1]], pen là trạng
+    thái bút (1: hạ, 0: nhấc) tại từng điểm. Với drawing_path mọi điểm là điểm vẽ và bút
+    được nhấc giữa hai nét; robot_path ghi rõ các điểm nhấc/hạ bút trong pen, mỗi nét gồm
+    cả điểm tiếp cận và điểm nhấc bút. Tách nét không sao chép: segment() trả về view.
+    """
+
+    __slots__ = ("points", "offsets", "pen")
+
+    def __init__(self, points=None, offsets=None, pen=None):
+        if points is None:
+            points = np.empty((0, 2), dtype=np.float32)
+        self.points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 2)
+        n = len(self.points)
+        if offsets is None:
+            offsets = [0, n] if n else [0]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.pen = np.ones(n, dtype=np.uint8) if pen is None else np.asarray(pen, dtype=np.uint8)
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Ghép danh sách mảng điểm (k, 2) thành một đường vẽ, bỏ các nét rỗng"""
+        segments = [s for s in segments if len(s)]
+        if not segments:
+            return cls()
+        lengths = [len(s) for s in segments]
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        return cls(np.concatenate(segments).astype(np.float32, copy=False), offsets)
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        """Đọc lại từ các mảng do to_arrays tạo ra (định dạng của cache)"""
+        return cls(arrays[prefix + "points"], arrays[prefix + "offsets"], arrays[prefix + "pen"])
+
+    def to_arrays(self, prefix):
+        """Các mảng để lưu cache: {prefix}points, {prefix}offsets, {prefix}pen"""
+        return {prefix + "points": self.points, prefix + "offsets": self.offsets, prefix + "pen": self.pen}
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        """Duyệt (x, y, pen) từng điểm dưới dạng số Python"""
+        return zip(self.points[:, 0].tolist(), self.points[:, 1].tolist(), self.pen.tolist())
+
+    @property
+    def segment_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.offsets.nbytes + self.pen.nbytes
+
+    def lengths(self):
+        """Số điểm của từng nét"""
+        return np.diff(self.offsets)
+
+    def segment(self, s):
+        """View các điểm của nét s"""
+        return self.points[self.offsets[s]:self.offsets[s + 1]]
+
+    def segments(self):
+        """Các view điểm của từng nét theo thứ tự"""
+        bounds = self.offsets.tolist()
+        return [self.points[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def segment_ids(self):
+        """Chỉ số nét của từng điểm"""
+        return np.repeat(np.arange(self.segment_count), self.lengths())
+
+    def select(self, keep):
+        """Đường mới chỉ gồm các điểm có keep đúng, giữ nguyên ranh giới nét"""
+        keep = np.asarray(keep, dtype=bool)
+        kept_before = np.concatenate(([0], np.cumsum(keep, dtype=np.int64)))
+        return PathBuffer(self.points[keep], kept_before[self.offsets], self.pen[keep])
+
+    def insert(self, positions, points, pen):
+        """Đường mới với các điểm chèn ngay trước positions (như np.insert), thuộc nét chứa vị trí đó"""
+        positions = np.asarray(positions, dtype=np.int64)
+        offsets = self.offsets + np.searchsorted(np.sort(positions), self.offsets, side="left")
+        offsets[-1] = len(self) + len(positions)
+        return PathBuffer(np.insert(self.points, positions, np.asarray(points, dtype=np.float32).reshape(-1, 2), axis=0),
+                          offsets, np.insert(self.pen, positions, pen))
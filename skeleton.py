@@ -0,0 +1,355 @@
+import heapq
+
+import cv2
+import numpy as np
+
+# Lân cận của một pixel: 4 hướng chính trước, 4 đường chéo sau (dy, dx)
+NEIGHBOR_OFFSETS = ((-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1))
+
+
+def _zhang_suen_tables():
+    """Bảng tra 256 phần tử cho hai bước lặp của Zhang-Suen theo mã 8 lân cận P2..P9"""
+    tables = []
+    for step in (0, 1):
+        table = np.zeros(256, dtype=bool)
+        for code in range(256):
+            p = [(code >> k) & 1 for k in range(8)]  # P2, P3, ..., P9 theo chiều kim đồng hồ từ phía trên
+            b = sum(p)
+            a = sum(p[k] == 0 and p[(k + 1) % 8] == 1 for k in range(8))
+            p2, p4, p6, p8 = p[0], p[2], p[4], p[6]
+            if step == 0:
+                extra = p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+            else:
+                extra = p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+            table[code] = 2 <= b <= 6 and a == 1 and extra
+        tables.append(table)
+    return tables
+
+
+_ZS_TABLES = _zhang_suen_tables()
+# P2..P9: trên, trên-phải, phải, dưới-phải, dưới, dưới-trái, trái, trên-trái
+_ZS_OFFSETS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+
+
+def thin(binary):
+    """Làm mảnh ảnh nhị phân về đường trục 1 pixel (Zhang-Suen), trả về mảng bool
+
+    Dùng cv2.ximgproc.thinning nếu có opencv-contrib; nếu không, chạy Zhang-Suen chỉ trên
+    các pixel tiền cảnh còn lại nên chi phí tỉ lệ với số pixel nét, không phải cả ảnh.
+    """
+    if hasattr(cv2, "ximgproc"):
+        return cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN) > 0
+
+    img = np.pad(binary > 0, 1).astype(np.uint8)
+    ys, xs = np.nonzero(img)
+    weights = [np.uint8(1 << k) for k in range(8)]
+
+    changed = True
+    while changed:
+        changed = False
+        for table in _ZS_TABLES:
+            code = np.zeros(len(ys), dtype=np.uint8)
+            for (dy, dx), weight in zip(_ZS_OFFSETS, weights):
+                code |= img[ys + dy, xs + dx] * weight
+            remove = table[code]
+            if remove.any():
+                img[ys[remove], xs[remove]] = 0
+                ys, xs = ys[~remove], xs[~remove]
+                changed = True
+
+    return img[1:-1, 1:-1].astype(bool)
+
+
+def _pixel_graph(skel):
+    """Tọa độ và danh sách kề của các pixel skeleton theo liên thông m
+
+    Lân cận chéo chỉ được tính khi hai pixel 4-lân cận chung đều trống, để bậc thang
+    trên đường chéo không bị coi là điểm rẽ nhánh.
+    """
+    img = np.pad(skel, 1).astype(bool)
+    ys, xs = np.nonzero(img)
+    ids = np.full(img.shape, -1, dtype=np.int64)
+    ids[ys, xs] = np.arange(len(ys))
+
+    neighbors = np.stack([ids[ys + dy, xs + dx] for dy, dx in NEIGHBOR_OFFSETS], axis=1)
+    for k, (dy, dx) in enumerate(NEIGHBOR_OFFSETS[4:], start=4):
+        shared = img[ys + dy, xs] | img[ys, xs + dx]
+        neighbors[shared, k] = -1
+
+    adjacency = [[j for j in row if j >= 0] for row in neighbors.tolist()]
+    return xs - 1, ys - 1, adjacency
+
+
+def stroke_graph(skel, min_spur=0.0):
+    """Đồ thị nét của skeleton: (số nút, cạnh, vòng kín rời)
+
+    Nút là điểm cuối và cụm điểm rẽ nhánh, cạnh là (nút đầu, nút cuối, điểm (N, 2) theo
+    (x, y)) đi qua chuỗi pixel bậc 2 giữa chúng. Nhánh cụt (từ điểm cuối tới điểm rẽ) ngắn
+    hơn min_spur pixel bị bỏ. Vòng kín không chạm nút nào được trả riêng, điểm cuối trùng
+    điểm đầu.
+    """
+    xs, ys, adjacency = _pixel_graph(skel)
+    n = len(xs)
+    degree = [len(a) for a in adjacency]
+
+    # Nút: điểm cuối / pixel cô lập đứng riêng, pixel bậc >= 3 kề nhau gộp thành một cụm
+    node_of = [-1] * n
+    nodes = []
+    for i in range(n):
+        if degree[i] == 2 or node_of[i] >= 0:
+            continue
+        node_id = len(nodes)
+        node_of[i] = node_id
+        members, stack = [], [i]
+        while stack:
+            p = stack.pop()
+            members.append(p)
+            if degree[p] >= 3:
+                for q in adjacency[p]:
+                    if degree[q] >= 3 and node_of[q] < 0:
+                        node_of[q] = node_id
+                        stack.append(q)
+        nodes.append(members)
+
+    node_xy = np.array([(xs[m].mean(), ys[m].mean()) for m in nodes], dtype=np.float32).reshape(-1, 2)
+    is_endpoint = [len(m) == 1 and degree[m[0]] <= 1 for m in nodes]
+
+    # Cạnh: (nút đầu, nút cuối, các pixel bậc 2 ở giữa)
+    edges = []
+    visited = bytearray(n)
+    for a, members in enumerate(nodes):
+        for p in members:
+            for q in adjacency[p]:
+                b = node_of[q]
+                if b == a:
+                    continue
+                if b >= 0:
+                    # Hai nút kề trực tiếp: ghi một lần
+                    if a < b:
+                        edges.append((a, b, []))
+                    continue
+                if visited[q]:
+                    continue
+                pixels, prev, cur = [], p, q
+                while node_of[cur] < 0:
+                    visited[cur] = 1
+                    pixels.append(cur)
+                    nxt = adjacency[cur][0] if adjacency[cur][0] != prev else adjacency[cur][1]
+                    prev, cur = cur, nxt
+                edges.append((a, node_of[cur], pixels))
+
+    # Vòng kín không chạm nút nào (ví dụ chữ O)
+    loops = []
+    for i in range(n):
+        if node_of[i] >= 0 or visited[i]:
+            continue
+        pixels, prev, cur = [], adjacency[i][1], i
+        while True:
+            visited[cur] = 1
+            pixels.append(cur)
+            nxt = adjacency[cur][0] if adjacency[cur][0] != prev else adjacency[cur][1]
+            prev, cur = cur, nxt
+            if cur == i:
+                break
+        loops.append(pixels + [i])
+
+    def edge_points(edge):
+        a, b, pixels = edge
+        inner = np.stack([xs[pixels], ys[pixels]], axis=1).astype(np.float32) if pixels else np.empty((0, 2), np.float32)
+        return np.vstack([node_xy[a:a + 1], inner, node_xy[b:b + 1]])
+
+    # Bỏ nhánh cụt ngắn: một đầu là điểm cuối, đầu kia là điểm rẽ nhánh
+    incident = [0] * len(nodes)
+    for a, b, _ in edges:
+        incident[a] += 1
+        incident[b] += 1
+    kept = []
+    for edge in edges:
+        a, b, _ = edge
+        spur = is_endpoint[a] != is_endpoint[b] and incident[a if is_endpoint[b] else b] >= 3
+        if spur and _length(edge_points(edge)) < min_spur:
+            incident[a] -= 1
+            incident[b] -= 1
+            continue
+        kept.append((a, b, edge_points(edge)))
+
+    loops = [np.stack([xs[pixels], ys[pixels]], axis=1).astype(np.float32) for pixels in loops]
+    return len(nodes), kept, loops
+
+
+def _length(points):
+    return float(np.sum(np.hypot(*np.diff(points, axis=0).T)))
+
+
+def _shortest_paths(node_edges, edges, lengths, source, limit):
+    """Dijkstra từ source, chỉ trong bán kính limit: {nút: (khoảng cách, các cạnh trên đường đi)}"""
+    dist = {source: 0.0}
+    via = {}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in node_edges[u]:
+            a, b, _ = edges[k]
+            v = b if a == u else a
+            nd = d + lengths[k]
+            if nd <= limit and nd < dist.get(v, np.inf):
+                dist[v] = nd
+                via[v] = (u, k)
+                heapq.heappush(heap, (nd, v))
+
+    result = {}
+    for v, d in dist.items():
+        path, node = [], v
+        while node != source:
+            node, k = via[node]
+            path.append(k)
+        result[v] = (d, path)
+    return result
+
+
+def plan_strokes(node_count, edges, retrace_limit=0.0):
+    """Chia các cạnh của đồ thị nét thành ít nét bút liền nhất, trả về (danh sách điểm, báo cáo)
+
+    Mỗi thành phần liên thông có 2k nút bậc lẻ cần ít nhất k nét (đường Euler). Theo kiểu
+    bài toán người đưa thư Trung Hoa, các cặp nút lẻ gần nhau (theo đường đi trên đồ thị,
+    không quá retrace_limit) được nối bằng cách vẽ lại các cạnh trên đường đi giữa chúng,
+    mỗi cặp bớt một lần nhấc bút; ghép tham lam theo khoảng cách tăng dần và luôn để lại
+    một cặp làm hai đầu của nét cuối. Các nút lẻ còn lại được ghép bằng cạnh ảo, tìm chu
+    trình Euler (Hierholzer) rồi cắt tại cạnh ảo để được các nét.
+    """
+    lengths = [_length(points) for _, _, points in edges]
+    node_edges = [[] for _ in range(node_count)]
+    for k, (a, b, _) in enumerate(edges):
+        node_edges[a].append(k)
+        node_edges[b].append(k)
+
+    # Thành phần liên thông (union-find) và số nhấc bút nếu mỗi nhánh là một nét riêng:
+    # nhánh được nối qua các nút chỉ có đúng hai cạnh khác nhau
+    parent = list(range(node_count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    chain = list(range(len(edges)))
+
+    def find_chain(k):
+        while chain[k] != k:
+            chain[k] = chain[chain[k]]
+            k = chain[k]
+        return k
+
+    for a, b, _ in edges:
+        parent[find(a)] = find(b)
+    for ks in node_edges:
+        if len(ks) == 2 and ks[0] != ks[1]:
+            chain[find_chain(ks[0])] = find_chain(ks[1])
+    branch_strokes = len({find_chain(k) for k in range(len(edges))})
+
+    degree = [len(ks) for ks in node_edges]
+    odd = [v for v in range(node_count) if degree[v] % 2 == 1]
+    odd_left = {}
+    for v in odd:
+        odd_left[find(v)] = odd_left.get(find(v), 0) + 1
+
+    # Ghép tham lam các cặp nút lẻ gần nhau bằng đoạn vẽ lại
+    all_edges = list(edges)
+    retrace = 0.0
+    if retrace_limit > 0:
+        odd_set = set(odd)
+        candidates = []
+        for u in odd:
+            for v, (d, path) in _shortest_paths(node_edges, edges, lengths, u, retrace_limit).items():
+                if v in odd_set and u < v:
+                    candidates.append((d, u, v, path))
+        candidates.sort(key=lambda c: c[0])
+
+        paired = set()
+        for d, u, v, path in candidates:
+            component = find(u)
+            if u in paired or v in paired or odd_left[component] <= 2:
+                continue
+            paired.update((u, v))
+            odd_left[component] -= 2
+            all_edges.extend(edges[k] for k in path)
+            retrace += d
+
+    # Cạnh ảo giữa các nút còn lẻ (bất kể thành phần) rồi tìm chu trình Euler
+    node_edges = [[] for _ in range(node_count)]
+    for k, (a, b, _) in enumerate(all_edges):
+        node_edges[a].append(k)
+        node_edges[b].append(k)
+    still_odd = [v for v in range(node_count) if len(node_edges[v]) % 2 == 1]
+    virtual_start = len(all_edges)
+    for u, v in zip(still_odd[0::2], still_odd[1::2]):
+        k = len(all_edges)
+        all_edges.append((u, v, None))
+        node_edges[u].append(k)
+        node_edges[v].append(k)
+
+    used = [False] * len(all_edges)
+    pointer = [0] * node_count
+    strokes = []
+    for start in range(node_count):
+        if pointer[start] == len(node_edges[start]):
+            continue
+
+        # Hierholzer không đệ quy: circuit là các (cạnh, nút đến) theo thứ tự đi
+        circuit = []
+        stack = [(start, None)]
+        while stack:
+            v, arrived_by = stack[-1]
+            while pointer[v] < len(node_edges[v]) and used[node_edges[v][pointer[v]]]:
+                pointer[v] += 1
+            if pointer[v] == len(node_edges[v]):
+                stack.pop()
+                if arrived_by is not None:
+                    circuit.append((arrived_by, v))
+            else:
+                k = node_edges[v][pointer[v]]
+                used[k] = True
+                a, b, _ = all_edges[k]
+                stack.append((b if a == v else a, k))
+        circuit.reverse()
+        if not circuit:
+            continue
+
+        # Xoay chu trình để bắt đầu ngay sau một cạnh ảo, rồi cắt tại các cạnh ảo
+        cuts = [i for i, (k, _) in enumerate(circuit) if k >= virtual_start]
+        if cuts:
+            circuit = circuit[cuts[0] + 1:] + circuit[:cuts[0] + 1]
+
+        pieces = []
+        for k, v in circuit:
+            if k >= virtual_start:
+                if pieces:
+                    strokes.append(np.vstack(pieces))
+                pieces = []
+                continue
+            a, b, points = all_edges[k]
+            points = points if b == v else points[::-1]
+            pieces.append(points if not pieces else points[1:])
+        if pieces:
+            strokes.append(np.vstack(pieces))
+
+    report = {"branch_strokes": branch_strokes, "strokes": len(strokes), "retrace": retrace}
+    return strokes, report
+
+
+def trace_strokes(skel, min_spur=0.0, retrace_limit=0.0):
+    """Vector hóa skeleton thành ít nét bút liền nhất, trả về (polyline, báo cáo)
+
+    Polyline là mảng float32 (N, 1, 2) theo (x, y) như contour của OpenCV. Báo cáo gồm số
+    nét nếu mỗi nhánh vẽ riêng (branch_strokes), số nét sau khi lập lộ trình (strokes) và
+    tổng chiều dài vẽ lại (retrace, pixel).
+    """
+    node_count, edges, loops = stroke_graph(skel, min_spur)
+    strokes, report = plan_strokes(node_count, edges, retrace_limit)
+    strokes = strokes + loops
+    report["branch_strokes"] += len(loops)
+    report["strokes"] += len(loops)
+    return [s.reshape(-1, 1, 2) for s in strokes if len(s) >= 2], report
@@ -6,6 +6,7 @@ import math
 import time
 import os
 from matplotlib.animation import FuncAnimation
+from ik_table import analytic_ik, forward_kinematics_batch
 
 # Thông số cánh tay robot (đơn vị mm)
 LINK1_LENGTH = 100  # Độ dài link 1
@@ -64,10 +65,10 @@ def forward_kinematics(angle1, angle2):
     
     return (x1, y1), (x2, y2)
 
-# Vẽ cánh tay robot
-def plot_arm(angle1, angle2, ax):
-    # Tính tọa độ các khớp
-    (x1, y1), (x2, y2) = forward_kinematics(angle1, angle2)
+# Vẽ cánh tay robot từ vị trí khuỷu và đầu bút đã tính sẵn
+def plot_arm(elbow, tip, ax):
+    x1, y1 = elbow
+    x2, y2 = tip
     
     # Vẽ các link
     ax.plot([0, x1], [0, y1], 'b-', linewidth=3, label='Link 1')
@@ -101,6 +102,17 @@ def move_to_position(x, y):
         return True
     return False
 
+# Cập nhật vị trí cánh tay với góc khớp đã tính sẵn (mô phỏng)
+def move_to_computed_position(point, angles):
+    global current_angles, current_position, drawing_points
+    
+    current_angles = angles
+    current_position = point
+    
+    # Nếu bút đang được hạ xuống, ghi lại điểm vẽ
+    if pen_down:
+        drawing_points.append(point)
+
 # Hạ bút xuống (mô phỏng)
 def pen_down_sim():
     global pen_down, drawing_points, current_position
@@ -268,7 +280,9 @@ def simulate_drawing(contours):
     pen_up_sim()
     
     # Vẽ cánh tay robot ở vị trí ban đầu
-    plot_arm(current_angles[0], current_angles[1], ax1)
+    elbow, tip = forward_kinematics_batch(current_angles[0], current_angles[1], LINK1_LENGTH, LINK2_LENGTH)
+    arm_state = [elbow[0], tip[0]]
+    plot_arm(arm_state[0], arm_state[1], ax1)
     
     # Danh sách các điểm cần vẽ
     drawing_sequence = []
@@ -301,6 +315,16 @@ def simulate_drawing(contours):
         # Thêm lệnh nhấc bút
         drawing_sequence.append(("pen_up", None))
     
+    # Tính sẵn góc khớp và vị trí cánh tay cho mọi lệnh di chuyển (một lần cho cả dãy lệnh)
+    move_index = {}
+    move_points = []
+    for i, (command, point) in enumerate(drawing_sequence):
+        if command == "move" and point:
+            move_index[i] = len(move_points)
+            move_points.append(point)
+    angle1, angle2, reachable = analytic_ik(move_points, LINK1_LENGTH, LINK2_LENGTH, elbow_up=True)
+    arm_elbow, arm_tip = forward_kinematics_batch(angle1, angle2, LINK1_LENGTH, LINK2_LENGTH)
+    
     # Chỉ số hiện tại trong dãy lệnh
     current_idx = 0
     
@@ -331,18 +355,22 @@ def simulate_drawing(contours):
             
             # Thực hiện lệnh
             if command == "move" and point:
-                x, y = point
-                if move_to_position(x, y):
+                k = move_index[current_idx]
+                if reachable[k]:
+                    move_to_computed_position(point, (angle1[k], angle2[k]))
+                    arm_state[:] = arm_elbow[k], arm_tip[k]
                     # Vẽ cánh tay robot ở vị trí mới
-                    end_pos = plot_arm(current_angles[0], current_angles[1], ax1)
+                    end_pos = plot_arm(arm_state[0], arm_state[1], ax1)
+                else:
+                    print(f"Điểm ({point[0]}, {point[1]}) nằm ngoài phạm vi hoạt động!")
             elif command == "pen_down":
                 pen_down_sim()
                 # Vẽ lại cánh tay
-                plot_arm(current_angles[0], current_angles[1], ax1)
+                plot_arm(arm_state[0], arm_state[1], ax1)
             elif command == "pen_up":
                 pen_up_sim()
                 # Vẽ lại cánh tay
-                plot_arm(current_angles[0], current_angles[1], ax1)
+                plot_arm(arm_state[0], arm_state[1], ax1)
             
             # Vẽ hình vẽ
             ax2.clear()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Các module nằm ở thư mục gốc của repo (không đóng gói thành package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Var:
+    """Biến Tk không cần cửa sổ"""
+
+    def __init__(self, master=None, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Root:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+@pytest.fixture
+def controller(monkeypatch, tmp_path):
+    """RobotArmController với các thiết lập mặc định nhưng không tạo cửa sổ"""
+    tk = pytest.importorskip("tkinter")
+    mainne = pytest.importorskip("mainne")
+    for name in ("BooleanVar", "StringVar", "IntVar", "DoubleVar"):
+        monkeypatch.setattr(tk, name, Var)
+    monkeypatch.setattr(mainne.RobotArmController, "setup_ui", lambda self: None)
+    monkeypatch.setattr(mainne.RobotArmController, "update_image_list", lambda self: None)
+    monkeypatch.chdir(tmp_path)
+    controller = mainne.RobotArmController(Root())
+    yield controller
+    controller.reprocess_worker.shutdown()
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from ik_table import forward_kinematics_batch
+from path_buffer import PathBuffer
+
+pytest.importorskip("mainne")
+
+
+def pen_distance(controller, points):
+    """Khoảng cách từ mỗi điểm tới đường bút khi nội suy góc khớp giữa các điểm vẽ liên tiếp"""
+    angles, pen = controller.joint_angles, controller.robot_path.pen
+    drawn = (pen[:-1] == 1) & (pen[1:] == 1)
+    t = np.linspace(0, 1, 33)[:, None, None]
+    arc = (angles[:-1][drawn] + t * (angles[1:] - angles[:-1])[drawn]).reshape(-1, 2)
+    tip = forward_kinematics_batch(arc[:, 0], arc[:, 1], controller.L1, controller.L2)[1]
+    return np.array([np.hypot(*(tip - p).T).min() for p in points])
+
+
+def test_compaction_keeps_chord_tolerance(controller):
+    # Cung nhỏ, dày điểm, gần tầm với lớn nhất: mỗi bước động cơ dịch đầu bút nhiều nhất
+    t = np.linspace(0, np.pi, 400)
+    curve = np.column_stack((3 * np.cos(t), 245 + 3 * np.sin(t)))
+    controller.robot_path = controller.resample_robot_path(PathBuffer.from_segments([curve]))
+    points = controller.robot_path.points.astype(float)
+
+    controller.compute_joint_trajectory()
+
+    report = controller.trajectory_report
+    assert report["points_after_compaction"] < report["points_before_compaction"]
+    # Sai số lượng tử hóa của chính điểm giữ lại (nửa bước) không do bước nén gây ra
+    quantization = 0.5 / controller.steps_per_degree * np.pi / 180 * (controller.L1 + controller.L2)
+    assert pen_distance(controller, points).max() <= controller.chord_tolerance + quantization
+
+
+def test_restore_chord_points_restores_worst_point(controller):
+    # Cả hai điểm giữa lệch khỏi đường bút 0 -> 3; lấy lại điểm 1 (lệch nhất) thì điểm 2 nằm đúng trên đường 1 -> 3
+    theta = np.array([[0.0, 90.0], [0.0, 95.0], [0.0, 92.0], [0.0, 91.0]])
+    xy = forward_kinematics_batch(theta[:, 0], theta[:, 1], controller.L1, controller.L2)[1]
+    controller.robot_path = PathBuffer.from_segments([xy])
+    controller.joint_angles = theta
+    controller.reachable = np.ones(4, dtype=bool)
+
+    keep = np.array([True, False, False, True])
+    assert controller.restore_chord_points(keep) == 1
+    assert keep.tolist() == [True, True, False, True]
@@ -0,0 +1,58 @@
+import numpy as np
+
+from contour_dedup import densify, dedup_contours
+
+SHAPE = (120, 120)
+
+
+def contour(points):
+    return np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+
+
+SQUARE = contour([(20, 20), (80, 20), (80, 80), (20, 80)])
+
+
+def test_densify_spacing():
+    dense = densify(SQUARE, closed=True)
+    steps = np.hypot(*np.diff(np.vstack([dense, dense[:1]]), axis=0).T)
+    assert steps.max() <= 1 + 1e-9
+    assert abs(steps.sum() - 240) < 1e-9
+    opened = densify(contour([(0, 0), (10, 0)]), closed=False)
+    np.testing.assert_array_equal(opened[[0, -1]], [[0, 0], [10, 0]])
+
+
+def test_exact_and_near_duplicates_are_removed():
+    shifted = SQUARE + np.array([1, 1], dtype=np.int32)
+    kept, closed, removed = dedup_contours([SQUARE, SQUARE.copy(), shifted], [True] * 3, SHAPE, tolerance=2)
+    assert len(kept) == 1 and kept[0] is SQUARE and closed == [True]
+    assert abs(removed - 2 * 240) < 1e-6
+
+
+def test_separate_contours_are_kept_unchanged():
+    other = contour([(40, 40), (60, 40), (60, 60), (40, 60)])
+    far = contour([(100, 5), (110, 5), (110, 15)])
+    kept, closed, removed = dedup_contours([SQUARE, other, far], [True, True, False], SHAPE, tolerance=1)
+    assert [k is c for k, c in zip(kept, [SQUARE, other, far])] == [True, True, True]
+    assert closed == [True, True, False] and removed == 0
+
+
+def test_partial_overlap_keeps_only_the_new_part():
+    short = contour([(10, 10), (50, 10)])
+    long = contour([(10, 10), (100, 10)])
+    kept, closed, removed = dedup_contours([short, long], [False, False], SHAPE, tolerance=1)
+    assert len(kept) == 2 and closed == [False, False]
+    piece = kept[1].reshape(-1, 2)
+    # Phần giữ lại bắt đầu ở mép vùng đã vẽ và đi tới hết đoạn dài
+    assert 50 <= piece[0, 0] <= 53 and piece[-1, 0] == 100
+    assert np.all(piece[:, 1] == 10)
+    assert 40 <= removed <= 43
+
+
+def test_short_crossings_are_redrawn_below_min_cut():
+    horizontal = contour([(10, 60), (110, 60)])
+    vertical = contour([(60, 10), (60, 110)])
+    kept, _, removed = dedup_contours([horizontal, vertical], [False, False], SHAPE, tolerance=1, min_cut=10)
+    assert len(kept) == 2 and kept[1] is vertical and removed == 0
+
+    kept, _, removed = dedup_contours([horizontal, vertical], [False, False], SHAPE, tolerance=1, min_cut=0)
+    assert len(kept) == 3 and 0 < removed <= 6
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+mainne = pytest.importorskip("mainne")
+
+
+@pytest.fixture
+def controller(controller):
+    controller.pixels_per_pen_width = 1  # Ảnh làm việc 480 pixel: ảnh thử nhỏ vẫn được giải mã thu nhỏ
+    controller.tile_size = 128
+    return controller
+
+
+def drawing(path):
+    img = np.full((1000, 1300), 255, np.uint8)
+    cv2.circle(img, (320, 320), 200, 0, 12)
+    cv2.circle(img, (320, 320), 60, 0, -1)
+    cv2.rectangle(img, (500, 600), (1200, 700), 0, 10)
+    cv2.line(img, (700, 50), (1000, 950), 0, 14)
+    cv2.putText(img, "AB", (80, 900), cv2.FONT_HERSHEY_SIMPLEX, 8, 0, 20)
+    cv2.imwrite(str(path), img)
+    return img
+
+
+def extract(controller, path, tiling):
+    controller.tiling = tiling
+    controller.drawing_job = mainne.DrawingJob()
+    return controller.extract_drawing_path(str(path), 128, True, "contour", 0.5)
+
+
+def as_set(drawing_path):
+    return sorted(segment.tobytes() for segment in drawing_path.segments())
+
+
+def test_tiling_on_matches_whole_image(controller, tmp_path, monkeypatch):
+    path = tmp_path / "drawing.png"
+    drawing(path)
+    img, whole = extract(controller, path, "off")
+
+    tiled_calls = []
+    extract_tiled = controller.extract_contours_tiled
+    monkeypatch.setattr(controller, "extract_contours_tiled", lambda *args: tiled_calls.append(args) or extract_tiled(*args))
+    _, tiled = extract(controller, path, "on")
+
+    assert len(tiled_calls) == 1 and max(img.shape) > controller.tile_size
+    assert whole.segment_count > 0
+    assert as_set(tiled) == as_set(whole)
+
+
+def test_tiling_auto_uses_tile_pixels(controller, tmp_path):
+    img = np.zeros((300, 400), np.uint8)
+    controller.tiling = "auto"
+    controller.tile_pixels = img.size
+    assert not controller.use_tiling(img, "contour")
+    controller.tile_pixels = img.size - 1
+    assert controller.use_tiling(img, "contour")
+    assert not controller.use_tiling(img, "skeleton")
+    controller.tiling = "off"
+    assert not controller.use_tiling(img, "contour")
+
+
+def test_large_png_decoded_in_bands(controller, tmp_path, monkeypatch):
+    path = tmp_path / "drawing.png"
+    original = drawing(path)
+    monkeypatch.setattr(cv2, "imread", lambda *args: pytest.fail("PNG phải được đọc theo dải"))
+
+    img, scale, origin, shape = controller.decode_working_image(str(path))
+
+    assert shape == original.shape
+    np.testing.assert_allclose(scale, controller.working_resolution() / max(original.shape), rtol=0.01)
+    assert img.min() == 0 and img.max() == 255
+    # Gốc cắt và tỉ lệ đưa nét về đúng chỗ trên ảnh gốc
+    x, y = (np.argwhere(img < 128)[0][::-1] / scale + origin).astype(int)
+    assert original[y - 4:y + 5, x - 4:x + 5].min() < 128
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from ik_table import IKTable, analytic_ik, forward_kinematics_batch
+
+L1, L2 = 140, 120
+
+
+def annulus_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Gồm cả sát mép trong và mép ngoài vành khuyên
+    r = np.concatenate([rng.uniform(abs(L1 - L2), L1 + L2, n), [abs(L1 - L2), L1 + L2, L1 + L2 - 1e-9]])
+    phi = rng.uniform(-np.pi, np.pi, len(r))
+    return np.column_stack((r * np.cos(phi), r * np.sin(phi)))
+
+
+def angle_error(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180) % 360 - 180)
+
+
+@pytest.mark.parametrize("elbow_up", [True, False])
+@pytest.mark.parametrize("max_error", [0.01, 0.001])
+def test_error_within_bound(tmp_path, elbow_up, max_error):
+    table = IKTable(L1, L2, elbow_up=elbow_up, max_error_deg=max_error, cache_dir=str(tmp_path))
+    assert table.error_deg <= max_error
+
+    points = annulus_points(200_000)
+    ref1, ref2, ref_reach = analytic_ik(points, L1, L2, elbow_up)
+    tab1, tab2, reach = table.solve(points)
+    np.testing.assert_array_equal(reach, ref_reach)
+    assert angle_error(tab1, ref1).max() <= max_error
+    assert np.abs(tab2 - ref2).max() <= max_error
+
+    for (x, y), r1, r2 in zip(points[:2000].tolist(), ref1, ref2):
+        theta1, theta2 = table.solve_point(x, y)
+        assert angle_error(theta1, r1) <= max_error
+        assert abs(theta2 - r2) <= max_error
+
+
+def test_unreachable_points(tmp_path):
+    table = IKTable(L1, L2, cache_dir=str(tmp_path))
+    assert table.solve_point(L1 + L2 + 1, 0) is None
+    assert table.solve_point(0, 0) is None
+    _, _, reach = table.solve([[L1 + L2 + 1, 0], [0, 0], [200, 0]])
+    assert reach.tolist() == [False, False, True]
+
+
+def test_table_reloaded_from_disk(tmp_path):
+    built = IKTable(L1, L2, max_error_deg=0.005, cache_dir=str(tmp_path))
+    loaded = IKTable(L1, L2, max_error_deg=0.005, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(built.theta2_nodes, loaded.theta2_nodes)
+    assert loaded.error_deg == built.error_deg
+
+
+def test_forward_kinematics_matches_ik():
+    points = annulus_points(1000)
+    theta1, theta2, _ = analytic_ik(points, L1, L2, elbow_up=False)
+    elbow, tip = forward_kinematics_batch(theta1, theta2, L1, L2)
+    np.testing.assert_allclose(tip, points, atol=1e-6)
+    np.testing.assert_allclose(np.hypot(*elbow.T), L1)
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+
+from job_cache import CACHE_VERSION, JobCache, MemoryLRU
+
+
+def write_image(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def test_key_depends_on_content_and_params(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"))
+    a = write_image(tmp_path / "a.png", b"image-a")
+    b = write_image(tmp_path / "b.png", b"image-a")
+    c = write_image(tmp_path / "c.png", b"image-c")
+    params = {"threshold": 100, "method": "contour"}
+
+    # Cùng nội dung khác tên file cho cùng khóa
+    assert cache.make_key(a, params) == cache.make_key(b, params)
+    assert cache.make_key(a, params) != cache.make_key(c, params)
+    # Thứ tự tham số không ảnh hưởng, giá trị và tham số mới thì có
+    assert cache.make_key(a, {"method": "contour", "threshold": 100}) == cache.make_key(a, params)
+    assert cache.make_key(a, dict(params, threshold=101)) != cache.make_key(a, params)
+    assert cache.make_key(a, dict(params, tiling=(1024, 16))) != cache.make_key(a, params)
+
+
+def test_key_includes_version(tmp_path, monkeypatch):
+    cache = JobCache(str(tmp_path / "cache"))
+    image = write_image(tmp_path / "a.png", b"image-a")
+    key = cache.make_key(image, {})
+    monkeypatch.setattr("job_cache.CACHE_VERSION", CACHE_VERSION + 1)
+    assert cache.make_key(image, {}) != key
+
+
+def test_store_and_load_roundtrip(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"))
+    points = np.arange(12, dtype=np.float32).reshape(6, 2)
+    cache.store("k", points=points, pen=np.ones(6, dtype=np.uint8))
+
+    loaded = cache.load("k")
+    np.testing.assert_array_equal(loaded["points"], points)
+    assert loaded["pen"].dtype == np.uint8
+    assert cache.load("missing") is None
+    # Không để lại file tạm
+    assert sorted(os.listdir(cache.cache_dir)) == ["k.npz"]
+
+
+def test_corrupt_entry_is_dropped(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"))
+    os.makedirs(cache.cache_dir)
+    with open(os.path.join(cache.cache_dir, "bad.npz"), "wb") as f:
+        f.write(b"not a zip")
+    assert cache.load("bad") is None
+    assert not os.path.exists(os.path.join(cache.cache_dir, "bad.npz"))
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"), max_bytes=10**9)
+    data = np.random.default_rng(0).random(2000)
+    for i, key in enumerate(("old", "used", "new")):
+        cache.store(key, data=data)
+        path = cache._path(key)
+        os.utime(path, (1000 + i, 1000 + i))
+    size = os.path.getsize(cache._path("old"))
+
+    # Đọc "old" đánh dấu vừa dùng, nên "used" (cũ nhất còn lại) bị xóa trước
+    cache.load("old")
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert cache.load("used") is None
+    assert cache.load("old") is not None
+    assert cache.load("new") is not None
+
+
+def test_invalidate_image(tmp_path):
+    cache = JobCache(str(tmp_path / "cache"))
+    a = write_image(tmp_path / "a.png", b"image-a")
+    c = write_image(tmp_path / "c.png", b"image-c")
+    key_a1, key_a2 = cache.make_key(a, {"t": 1}), cache.make_key(a, {"t": 2})
+    key_c = cache.make_key(c, {"t": 1})
+    for key in (key_a1, key_a2, key_c):
+        cache.store(key, x=np.zeros(1))
+
+    cache.invalidate_image(a)
+    assert cache.load(key_a1) is None and cache.load(key_a2) is None
+    assert cache.load(key_c) is not None
+
+
+def test_memory_lru_bounded():
+    lru = MemoryLRU(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
@@ -0,0 +1,67 @@
+import numpy as np
+
+from path_buffer import PathBuffer
+
+
+def sample():
+    return PathBuffer.from_segments([
+        np.array([[0, 0], [1, 0], [2, 0]]),
+        np.empty((0, 2)),
+        np.array([[5, 5], [6, 5]]),
+    ])
+
+
+def test_from_segments_skips_empty_segments():
+    path = sample()
+    assert len(path) == 5 and path.segment_count == 2
+    assert path.points.dtype == np.float32 and path.points.flags.c_contiguous
+    assert path.offsets.tolist() == [0, 3, 5]
+    assert path.pen.tolist() == [1] * 5
+    assert path.lengths().tolist() == [3, 2]
+    assert path.segment_ids().tolist() == [0, 0, 0, 1, 1]
+    assert list(path) == [(0, 0, 1), (1, 0, 1), (2, 0, 1), (5, 5, 1), (6, 5, 1)]
+
+
+def test_segments_are_views():
+    path = sample()
+    segment = path.segment(1)
+    np.testing.assert_array_equal(segment, [[5, 5], [6, 5]])
+    assert np.shares_memory(segment, path.points)
+    assert [len(s) for s in path.segments()] == [3, 2]
+
+
+def test_empty_path():
+    path = PathBuffer()
+    assert len(path) == 0 and path.segment_count == 0 and not path
+    assert PathBuffer.from_segments([]).offsets.tolist() == [0]
+    assert PathBuffer(np.array([[1, 2]])).offsets.tolist() == [0, 1]
+
+
+def test_arrays_roundtrip():
+    path = sample()
+    path.pen[3] = 0
+    arrays = path.to_arrays("robot_")
+    assert set(arrays) == {"robot_points", "robot_offsets", "robot_pen"}
+    loaded = PathBuffer.from_arrays(arrays, "robot_")
+    np.testing.assert_array_equal(loaded.points, path.points)
+    assert loaded.offsets.tolist() == path.offsets.tolist()
+    assert loaded.pen.tolist() == path.pen.tolist()
+    assert loaded.nbytes == path.points.nbytes + path.offsets.nbytes + path.pen.nbytes
+
+
+def test_select_keeps_segment_boundaries():
+    path = sample()
+    selected = path.select([True, False, True, False, True])
+    np.testing.assert_array_equal(selected.points, [[0, 0], [2, 0], [6, 5]])
+    assert selected.offsets.tolist() == [0, 2, 3]
+    # Nét bị bỏ hết điểm vẫn giữ chỗ (rỗng)
+    assert path.select([True, True, True, False, False]).lengths().tolist() == [3, 0]
+
+
+def test_insert_matches_np_insert():
+    path = sample()
+    inserted = path.insert([1, 3, 5], [[0.5, 0], [4, 4], [7, 5]], [1, 0, 1])
+    np.testing.assert_array_equal(inserted.points, [[0, 0], [0.5, 0], [1, 0], [2, 0], [4, 4], [5, 5], [6, 5], [7, 5]])
+    assert inserted.pen.tolist() == [1, 1, 1, 1, 0, 1, 1, 1]
+    # Điểm chèn tại ranh giới hai nét thuộc nét phía sau, chèn ở cuối thuộc nét cuối
+    assert inserted.offsets.tolist() == [0, 4, 8]
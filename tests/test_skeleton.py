@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+from skeleton import plan_strokes, thin, trace_strokes
+
+
+def line(p, q):
+    """Các điểm nguyên (x, y) trên đoạn p-q, kể cả hai đầu"""
+    n = int(max(abs(q[0] - p[0]), abs(q[1] - p[1])))
+    t = np.linspace(0, 1, n + 1)[:, None]
+    return np.rint(np.asarray(p) + (np.asarray(q) - np.asarray(p)) * t)
+
+
+def length(points):
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+
+def assert_continuous(strokes):
+    for stroke in strokes:
+        steps = np.hypot(*np.diff(stroke, axis=0).T)
+        assert steps.max() <= np.sqrt(2) + 1e-9
+
+
+def star():
+    """Nút 0 ở giữa, ba nhánh tới nút 1, 2, 3 dài 10, 20, 30"""
+    center = (50, 50)
+    ends = [(60, 50), (50, 30), (20, 50)]
+    return 4, [(0, k + 1, line(center, end)) for k, end in enumerate(ends)]
+
+
+def test_star_without_retrace_needs_one_stroke_per_odd_pair():
+    node_count, edges = star()
+    strokes, report = plan_strokes(node_count, edges)
+    # 4 nút bậc lẻ -> 2 nét thay vì 3 nhánh riêng
+    assert report == {"branch_strokes": 3, "strokes": 2, "retrace": 0.0}
+    assert len(strokes) == 2
+    assert_continuous(strokes)
+    assert sum(map(length, strokes)) == sum(length(p) for _, _, p in edges)
+
+
+def test_star_with_retrace_draws_one_stroke():
+    node_count, edges = star()
+    strokes, report = plan_strokes(node_count, edges, retrace_limit=100)
+    assert report["strokes"] == len(strokes) == 1
+    # Nút giữa (bậc 3) và đầu nhánh ngắn nhất là cặp nút lẻ gần nhất: vẽ lại nhánh dài 10
+    assert report["retrace"] == 10
+    assert_continuous(strokes)
+    assert length(strokes[0]) == 60 + 10
+
+
+def test_retrace_limit_is_respected():
+    node_count, edges = star()
+    _, report = plan_strokes(node_count, edges, retrace_limit=5)
+    assert report["strokes"] == 2 and report["retrace"] == 0
+
+
+def test_cycle_and_separate_components():
+    square = [(0, 1, line((0, 0), (10, 0))), (1, 2, line((10, 0), (10, 10))),
+              (2, 3, line((10, 10), (0, 10))), (3, 0, line((0, 10), (0, 0)))]
+    extra = [(4, 5, line((30, 0), (30, 20)))]
+    strokes, report = plan_strokes(6, square + extra, retrace_limit=100)
+    assert report["strokes"] == 2
+    assert_continuous(strokes)
+    loop = max(strokes, key=len)
+    np.testing.assert_array_equal(loop[0], loop[-1])
+    assert length(loop) == 40
+
+
+def test_trace_strokes_on_cross_image():
+    img = np.zeros((80, 80), np.uint8)
+    cv2.line(img, (10, 40), (70, 40), 255, 3)
+    cv2.line(img, (40, 10), (40, 70), 255, 3)
+    skel = thin(img)
+    assert skel.dtype == bool and skel.sum() < (img > 0).sum() / 2
+
+    separate, report = trace_strokes(skel)
+    assert report["branch_strokes"] == 4 and report["strokes"] == 2
+    joined, report = trace_strokes(skel, retrace_limit=100)
+    assert report["strokes"] == len(joined) == 1
+    assert joined[0].dtype == np.float32 and joined[0].shape[1:] == (1, 2)
@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from tiled import clip_to_core, compress_chain, map_tiles, read_reduced_gray, stitch_pieces, tile_boxes
+
+
+def drawing():
+    img = np.zeros((100, 130), np.uint8)
+    cv2.circle(img, (32, 32), 20, 255, -1)
+    cv2.circle(img, (32, 32), 8, 0, -1)  # Lỗ: có cả viền ngoài và viền trong
+    cv2.rectangle(img, (50, 60), (120, 70), 255, -1)
+    cv2.line(img, (70, 5), (100, 95), 255, 3)
+    cv2.rectangle(img, (5, 80), (12, 90), 255, -1)  # Nằm trọn trong một ô
+    return img
+
+
+def tiled_contours(binary, tile_size, overlap):
+    """Như extract_contours_tiled của mainne.py, với ảnh nhị phân có sẵn"""
+    def work(tile, core, padded):
+        whole, pieces = [], []
+        offset = np.array(padded[:2], dtype=np.int32)
+        full = cv2.findContours(tile, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)[0]
+        simple = cv2.findContours(tile, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0]
+        for contour, points in zip(simple, full):
+            inside, parts = clip_to_core(points + offset, core)
+            if inside is not None:
+                whole.append(contour + offset)
+            pieces.extend(parts)
+        return whole, pieces
+
+    results = map_tiles(binary, tile_boxes(binary.shape, tile_size, overlap), work, workers=2)
+    contours = [(c.reshape(-1, 2), True) for whole, _ in results for c in whole]
+    pieces = [piece for _, parts in results for piece in parts]
+    return contours + stitch_pieces(pieces)
+
+
+def as_set(contours):
+    return sorted(np.asarray(c, dtype=np.int32).reshape(-1, 2).tobytes() for c in contours)
+
+
+def test_tile_boxes_cover_image_once():
+    boxes = tile_boxes((100, 130), 32, 4)
+    count = np.zeros((100, 130), np.int32)
+    for (x0, y0, x1, y1), (px0, py0, px1, py1) in boxes:
+        count[y0:y1, x0:x1] += 1
+        assert px0 == max(x0 - 4, 0) and py1 == min(y1 + 4, 100)
+    assert np.all(count == 1)
+
+
+def test_stitched_contours_match_whole_image():
+    binary = drawing()
+    expected = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0]
+    for tile_size in (24, 32, 50):
+        result = tiled_contours(binary, tile_size, 4)
+        assert all(closed for _, closed in result)
+        assert as_set(points for points, _ in result) == as_set(expected)
+
+
+def test_unmatched_pieces_stay_open():
+    # Hai đoạn nối nhau ở (5, 0)-(6, 0), đoạn thứ ba không nối với đoạn nào
+    a = np.array([[0, 0], [1, 0], [5, 0], [6, 0]])
+    b = np.array([[5, 0], [6, 0], [9, 0], [9, 3]])
+    c = np.array([[40, 40], [41, 40], [45, 40], [46, 40]])
+    stitched = stitch_pieces([a, b, c])
+    assert [closed for _, closed in stitched] == [False, False]
+    np.testing.assert_array_equal(stitched[0][0], [[1, 0], [5, 0], [6, 0], [9, 0]])
+
+
+def test_compress_chain_matches_chain_approx_simple():
+    square = np.array([[x, 0] for x in range(5)] + [[4, y] for y in range(1, 5)]
+                      + [[x, 4] for x in range(3, -1, -1)] + [[0, y] for y in range(3, 0, -1)])
+    np.testing.assert_array_equal(compress_chain(square, True), [[0, 0], [4, 0], [4, 4], [0, 4]])
+    np.testing.assert_array_equal(compress_chain(square[:9], False), [[0, 0], [4, 0], [4, 4]])
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P"])
+@pytest.mark.parametrize("factor", [2, 4])
+def test_read_reduced_gray_png(tmp_path, mode, factor):
+    rng = np.random.default_rng(0)
+    rgb = cv2.GaussianBlur((rng.random((120, 160, 3)) * 255).astype(np.uint8), (9, 9), 3)
+    path = tmp_path / "image.png"
+    image = Image.fromarray(rgb).quantize(64) if mode == "P" else Image.fromarray(rgb).convert(mode)
+    image.save(path)
+
+    reduced = read_reduced_gray(str(path), factor, band_pixels=1000)
+
+    full = np.asarray(Image.open(path).convert("L"))
+    expected = cv2.resize(full, (160 // factor, 120 // factor), interpolation=cv2.INTER_AREA)
+    assert reduced.shape == expected.shape
+    assert np.abs(reduced.astype(int) - expected).max() <= 1
+
+
+def test_read_reduced_gray_tiff(tmp_path):
+    rgb = cv2.GaussianBlur((np.random.default_rng(1).random((90, 100, 3)) * 255).astype(np.uint8), (9, 9), 3)
+    raw, compressed = tmp_path / "raw.tif", tmp_path / "lzw.tif"
+    Image.fromarray(rgb).save(raw)
+    Image.fromarray(rgb).save(compressed, compression="tiff_lzw")
+
+    expected = cv2.resize(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY), (50, 45), interpolation=cv2.INTER_AREA)
+    assert np.abs(read_reduced_gray(str(raw), 2, band_pixels=1000).astype(int) - expected).max() <= 1
+    assert read_reduced_gray(str(compressed), 2) is None  # Nén: để cv2.imread đọc
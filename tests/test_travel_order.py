@@ -0,0 +1,73 @@
+import numpy as np
+
+from travel_order import order_segments, travel_length
+
+
+def random_segments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    segments, closed = [], []
+    for k in range(n):
+        center = rng.uniform(0, 1000, 2)
+        if k % 3 == 0:
+            angle = np.linspace(0, 2 * np.pi, 9)
+            ring = center + 5 * np.column_stack((np.cos(angle), np.sin(angle)))
+            ring[-1] = ring[0]
+            segments.append(ring)
+            closed.append(True)
+        else:
+            segments.append(center + rng.uniform(-20, 20, (rng.integers(2, 6), 2)).cumsum(axis=0))
+            closed.append(False)
+    return segments, closed
+
+
+def check_result(segments, closed, order, reverse, starts, report):
+    n = len(segments)
+    assert sorted(order) == list(range(n))
+    assert len(reverse) == len(starts) == n
+    for s in range(n):
+        if closed[s]:
+            assert 0 <= starts[s] < len(segments[s]) - 1 and not reverse[s]
+        else:
+            assert starts[s] == -1
+    assert report["after"] == travel_length(segments, order, reverse, starts)
+    assert report["before"] == travel_length(segments, range(n), [False] * n, np.where(closed, 0, -1))
+    assert report["after"] <= report["greedy"] + 1e-9
+    assert report["after"] <= report["before"] + 1e-9
+
+
+def test_random_drawing_is_permutation_with_shorter_travel():
+    segments, closed = random_segments(300)
+    order, reverse, starts, report = order_segments(segments, closed, time_limit=0.5)
+    check_result(segments, closed, order, reverse, starts, report)
+    assert report["after"] < 0.5 * report["before"]
+
+
+def test_shuffled_row_is_drawn_in_sequence():
+    # Các đoạn nằm trên một hàng, thứ tự bị xáo trộn và một nửa bị đảo chiều
+    rng = np.random.default_rng(1)
+    row = [np.array([[10.0 * k, 0], [10.0 * k + 5, 0]]) for k in range(40)]
+    shuffled = [row[0]] + [row[k] for k in rng.permutation(np.arange(1, 40))]
+    segments = [s[::-1] if k % 2 else s for k, s in enumerate(shuffled)]
+    closed = [False] * len(segments)
+    order, reverse, starts, report = order_segments(segments, closed, time_limit=0.5)
+    check_result(segments, closed, order, reverse, starts, report)
+    # Tối ưu: đi dọc hàng, mỗi khoảng hở 5
+    assert abs(report["after"] - 5 * 39) < 1e-6
+
+
+def test_closed_segment_starts_at_nearest_vertex():
+    square = np.array([[0.0, 0], [10, 0], [10, 10], [0, 10], [0, 0]])
+    segments = [np.array([[30.0, 10], [20, 10]]), square, np.array([[100.0, 0], [90, 0]])]
+    closed = [False, True, False]
+    order, reverse, starts, report = order_segments(segments, closed, time_limit=0.2)
+    check_result(segments, closed, order, reverse, starts, report)
+    # Tối ưu: hình vuông bắt đầu và kết thúc tại đỉnh (10, 10), rồi hai nét mở theo chiều ngược
+    assert order == [1, 0, 2] and starts[1] == 2 and reverse[0] and reverse[2]
+    assert abs(report["after"] - (10 + np.hypot(60, 10))) < 1e-9
+
+
+def test_small_inputs():
+    assert order_segments([], [])[:3] == ([], [], [])
+    segments = [np.array([[0.0, 0], [1, 0]]), np.array([[5.0, 0], [6, 0]])]
+    order, reverse, starts, report = order_segments(segments, [False, False])
+    assert order == [0, 1] and report["after"] == report["before"] == 4
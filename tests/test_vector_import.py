@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from vector_import import is_vector_file, load_vector_drawing, parse_dxf, parse_svg
+
+TOLERANCE = 0.01
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def svg(body):
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="200" height="200">{body}</svg>'
+
+
+def dxf(*entities):
+    lines = ["0", "SECTION", "2", "ENTITIES"]
+    for name, fields in entities:
+        lines += ["0", name]
+        for code, value in fields:
+            lines += [str(code), str(value)]
+    lines += ["0", "ENDSEC", "0", "EOF"]
+    return "\n".join(lines) + "\n"
+
+
+def strokes(curves, tolerance=TOLERANCE):
+    points, sizes = curves.flatten(tolerance)
+    return np.split(points, np.cumsum(sizes)[:-1])
+
+
+def test_is_vector_file():
+    assert is_vector_file("a/B.SVG") and is_vector_file("x.dxf")
+    assert not is_vector_file("x.png")
+
+
+def test_svg_circle_within_tolerance(tmp_path):
+    (circle,) = strokes(parse_svg(write(tmp_path, "c.svg", svg('<circle cx="50" cy="40" r="10"/>'))))
+    radius = np.hypot(circle[:, 0] - 50, circle[:, 1] - 40)
+    assert np.all(np.abs(radius - 10) <= TOLERANCE)
+    # Sai số dây cung: trung điểm mỗi dây không lệch quá tolerance so với đường tròn
+    middle = (circle[1:] + circle[:-1]) / 2
+    assert np.all(10 - np.hypot(middle[:, 0] - 50, middle[:, 1] - 40) <= TOLERANCE)
+    np.testing.assert_allclose(circle[0], circle[-1], atol=1e-9)
+
+
+def test_svg_path_commands_and_transforms(tmp_path):
+    body = ('<path d="M10 10 h20 v20 h-20 z m40 0 l10 0"/>'
+            '<g transform="translate(5,0) scale(2)"><line x1="0" y1="50" x2="10" y2="50"/></g>'
+            '<defs><circle cx="0" cy="0" r="5"/></defs>'
+            '<rect x="0" y="0" width="5" height="5" style="display: none"/>')
+    square, segment, line = strokes(parse_svg(write(tmp_path, "p.svg", svg(body))))
+    np.testing.assert_allclose(square, [[10, 10], [30, 10], [30, 30], [10, 30], [10, 10]])
+    # m tương đối sau z tính từ điểm đầu của nét vừa đóng
+    np.testing.assert_allclose(segment, [[50, 10], [60, 10]])
+    np.testing.assert_allclose(line, [[5, 100], [25, 100]])
+
+
+def test_svg_arc_command(tmp_path):
+    (arc,) = strokes(parse_svg(write(tmp_path, "a.svg", svg('<path d="M0 50 A50 50 0 0 1 100 50"/>'))))
+    np.testing.assert_allclose(arc[[0, -1]], [[0, 50], [100, 50]], atol=1e-9)
+    # Cung trên (trục y hướng xuống, sweep = 1 theo chiều kim đồng hồ)
+    assert arc[:, 1].min() == pytest.approx(0, abs=TOLERANCE)
+    assert np.all(np.abs(np.hypot(arc[:, 0] - 50, arc[:, 1] - 50) - 50) <= TOLERANCE)
+
+
+def test_dxf_entities_flip_y_and_count_skipped(tmp_path):
+    text = dxf(
+        ("LINE", [(10, 0), (20, 0), (11, 100), (21, 0)]),
+        ("CIRCLE", [(10, 50), (20, 20), (40, 10)]),
+        # Nửa đường tròn bán kính 10 bằng bulge = 1
+        ("LWPOLYLINE", [(90, 2), (70, 0), (10, 0), (20, 50), (42, 1), (10, 20), (20, 50)]),
+        ("INSERT", [(2, "BLOCK"), (10, 0), (20, 0)]),
+        ("TEXT", [(10, 0), (20, 0), (1, "x")]),
+    )
+    curves = parse_dxf(write(tmp_path, "d.dxf", text))
+    assert curves.skipped == {"INSERT": 1, "TEXT": 1}
+
+    line, circle, bulge = strokes(curves)
+    np.testing.assert_allclose(line, [[0, 0], [100, 0]], atol=1e-9)
+    assert np.all(np.abs(np.hypot(circle[:, 0] - 50, circle[:, 1] + 20) - 10) <= TOLERANCE)
+    np.testing.assert_allclose(bulge[[0, -1]], [[0, -50], [20, -50]], atol=1e-9)
+    assert np.all(np.abs(np.hypot(bulge[:, 0] - 10, bulge[:, 1] + 50) - 10) <= TOLERANCE)
+
+
+def test_binary_dxf_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        parse_dxf(write(tmp_path, "b.dxf", "AutoCAD Binary DXF\n"))
+
+
+def test_load_vector_drawing(tmp_path):
+    path = write(tmp_path, "s.svg", svg('<rect x="20" y="30" width="100" height="50"/><line x1="20" y1="90" x2="70" y2="90"/>'))
+    drawing_path, (height, width), skipped = load_vector_drawing(path, 0.05, 240)
+    assert skipped == {}
+    assert drawing_path.segment_count == 2
+    assert (height, width) == pytest.approx((60, 100))
+    np.testing.assert_allclose(drawing_path.points.min(axis=0), [0, 0])
+    assert drawing_path.pen.tolist() == [1] * len(drawing_path)
+
+    empty, shape, _ = load_vector_drawing(write(tmp_path, "e.svg", svg("")), 0.05, 240)
+    assert len(empty) == 0 and shape == (1, 1)
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+
+class ThresholdLevels:
+    """Contour của ảnh đã tiền xử lý theo mọi ngưỡng 0-255, tính một lần và tra lại khi đổi ngưỡng
+
+    Phép đóng hình thái học trên ảnh nhị phân giao hoán với phân ngưỡng: đóng tập
+    {ảnh <= t} bằng nhân phẳng cho đúng tập {mở_xám(ảnh) <= t} (và đóng {ảnh > t} cho
+    {đóng_xám(ảnh) > t}). Vì vậy ảnh mức (level image) được tính một lần và mỗi ngưỡng chỉ
+    còn một phép so sánh cộng findContours. Tập mức chỉ thay đổi tại các giá trị xám thực sự
+    có trong ảnh mức, nên mọi ngưỡng giữa hai giá trị liên tiếp dùng chung một kết quả.
+
+    Đây không phải cây thành phần (max-tree/min-tree): mỗi mức vẫn gọi findContours một lần
+    rồi nhớ lại. Giữa hai mức liền nhau chỉ 20-60% contour giữ nguyên (nét khử răng cưa đổi
+    biên ở hầu hết các mức), nên cây vẫn phải dò lại biên phần lớn thành phần, trong khi
+    dựng cây bằng union-find trên NumPy chậm hơn nhiều so với findContours viết bằng C.
+    """
+
+    def __init__(self, img, invert=True, kernel=None):
+        if kernel is None:
+            kernel = np.ones((2, 2), np.uint8)
+        self.invert = invert
+
+        # invert: nét tối (ảnh <= t) là tiền cảnh, ngược lại nét sáng (ảnh > t)
+        op = cv2.MORPH_OPEN if invert else cv2.MORPH_CLOSE
+        self.level_image = cv2.morphologyEx(img, op, kernel)
+
+        # Ngưỡng t cho cùng tập mức với giá trị xám có mặt lớn nhất <= t
+        present = np.bincount(self.level_image.ravel(), minlength=256) > 0
+        self.canonical = np.maximum.accumulate(np.where(present, np.arange(256), -1))
+        self._contours = {}
+
+    def level(self, threshold):
+        """Giá trị đại diện cho lớp ngưỡng chứa threshold (-1 nếu tập mức rỗng / toàn ảnh)"""
+        t = int(np.floor(threshold))
+        if t < 0:
+            return -1
+        return int(self.canonical[min(t, 255)])
+
+    def binary(self, threshold, dst=None):
+        """Ảnh nhị phân giống threshold + MORPH_CLOSE trên ảnh gốc"""
+        mode = cv2.THRESH_BINARY_INV if self.invert else cv2.THRESH_BINARY
+        _, binary = cv2.threshold(self.level_image, self.level(threshold), 255, mode, dst=dst)
+        return binary
+
+    def contours(self, threshold):
+        """Contour (RETR_LIST, CHAIN_APPROX_SIMPLE) tại ngưỡng, nhớ theo lớp ngưỡng"""
+        level = self.level(threshold)
+        if level not in self._contours:
+            self._contours[level] = cv2.findContours(self.binary(level), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0]
+        return self._contours[level]
+
+    def sweep(self, thresholds=range(256)):
+        """Tính trước contour cho nhiều ngưỡng (ví dụ để tự dò ngưỡng), trả về {ngưỡng: contour}"""
+        return {t: self.contours(t) for t in thresholds}
+
+
+def otsu_threshold(hist):
+    """Ngưỡng Otsu từ histogram: cực đại phương sai giữa hai lớp (<= t và > t)"""
+    hist = np.asarray(hist, dtype=np.float64)
+    values = np.arange(len(hist))
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    if total == 0:
+        return 0
+    mean = np.cumsum(hist * values)
+    w0, w1 = weight[:-1], total - weight[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * w0 - mean[:-1] * total) ** 2 / (w0 * w1)
+    between[(w0 == 0) | (w1 == 0)] = -1
+    return int(np.argmax(between))
+
+
+def triangle_threshold(hist):
+    """Ngưỡng tam giác từ histogram: điểm xa nhất dưới đường nối đỉnh với đầu đuôi dài hơn
+
+    Hợp với ảnh nét vẽ trên nền, nơi đỉnh nền chiếm gần hết ảnh và nét chỉ là một đuôi mỏng.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    nonzero = np.flatnonzero(hist)
+    if len(nonzero) < 2:
+        return int(nonzero[0]) if len(nonzero) else 0
+    left, right = nonzero[0], nonzero[-1]
+    peak = int(np.argmax(hist))
+
+    # Đi về phía đuôi dài hơn; đuôi nằm ở phía giá trị nhỏ thì ngưỡng là cận trên của đuôi
+    if peak - left >= right - peak:
+        end, span = left, np.arange(left, peak + 1)
+    else:
+        end, span = right, np.arange(peak, right + 1)
+    # Khoảng cách (chưa chuẩn hóa) từ điểm (i, hist[i]) tới đường (end, 0)-(peak, hist[peak])
+    distance = hist[peak] * (span - end) - (peak - end) * hist[span]
+    distance *= np.sign(peak - end)
+    return int(span[np.argmax(distance)])
+
+
+def auto_threshold(hist):
+    """Ngưỡng tự động từ histogram 256 mức xám của ảnh
+
+    Mặc định dùng Otsu. Khi một lớp Otsu gần như rỗng (nét rất thưa trên nền), Otsu chỉ
+    chia đôi nhiễu của nền; khi đó dùng ngưỡng tam giác nếu nó nằm đủ xa đỉnh nền.
+    """
+    hist = np.asarray(hist)
+    threshold = otsu_threshold(hist)
+    total = max(hist.sum(), 1)
+    minority = min(hist[:threshold + 1].sum(), hist[threshold + 1:].sum()) / total
+    if minority < 0.01:
+        triangle = triangle_threshold(hist)
+        if abs(int(np.argmax(hist)) - triangle) >= 16:
+            return triangle
+    return threshold
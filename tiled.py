@@ -0,0 +1,311 @@
+import io
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def tile_boxes(shape, tile_size, overlap):
+    """Chia ảnh thành các ô: danh sách (vùng lõi, vùng có lề), mỗi vùng là (x0, y0, x1, y1)
+
+    Vùng lõi phủ kín ảnh và không chồng nhau; vùng có lề rộng thêm overlap pixel mỗi phía
+    (cắt theo biên ảnh) để các bộ lọc cục bộ cho cùng kết quả trong lõi như khi xử lý cả ảnh.
+    """
+    height, width = shape[:2]
+    boxes = []
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            x1, y1 = min(x0 + tile_size, width), min(y0 + tile_size, height)
+            padded = (max(x0 - overlap, 0), max(y0 - overlap, 0), min(x1 + overlap, width), min(y1 + overlap, height))
+            boxes.append(((x0, y0, x1, y1), padded))
+    return boxes
+
+
+def map_tiles(img, boxes, work, workers=None):
+    """Gọi work(ô ảnh có lề, vùng lõi, vùng có lề) song song trên các lõi CPU
+
+    OpenCV nhả GIL trong các hàm xử lý ảnh nên luồng là đủ; ô ảnh là view của img, chỉ các
+    ảnh trung gian của những ô đang chạy được cấp phát cùng lúc.
+    """
+    def run(box):
+        core, (x0, y0, x1, y1) = box
+        return work(img[y0:y1, x0:x1], core, (x0, y0, x1, y1))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(run, boxes))
+
+
+def clip_to_core(contour, core):
+    """Cắt contour (tọa độ toàn ảnh, kín) theo vùng lõi: (contour kín nằm trọn trong lõi hoặc None, các đoạn mở)
+
+    Mỗi đoạn mở giữ thứ tự duyệt của contour và kèm thêm một điểm ngoài lõi ở mỗi đầu
+    (điểm ngay trước và ngay sau) để stitch_pieces nối đúng với đoạn của ô bên cạnh.
+    """
+    points = contour.reshape(-1, 2)
+    x0, y0, x1, y1 = core
+    inside = (points[:, 0] >= x0) & (points[:, 0] < x1) & (points[:, 1] >= y0) & (points[:, 1] < y1)
+    if inside.all():
+        return contour, []
+    if not inside.any():
+        return None, []
+
+    # Xoay để bắt đầu tại đầu một đoạn nằm trong lõi, không đoạn nào vắt qua điểm 0
+    shift = int(np.flatnonzero(inside & ~np.roll(inside, 1))[0])
+    points, inside = np.roll(points, -shift, axis=0), np.roll(inside, -shift)
+    edges = np.diff(np.concatenate([[False], inside, [False]]).astype(np.int8))
+    ring = np.vstack([points[-1:], points, points[:1]])
+    return None, [ring[s:e + 2] for s, e in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
+
+
+def compress_chain(points, closed):
+    """Bỏ các điểm giữa của đoạn thẳng ngang/dọc/chéo, như cv2.CHAIN_APPROX_SIMPLE"""
+    if len(points) < 3:
+        return points
+    step = np.diff(np.vstack([points[-1:], points]) if closed else points, axis=0)
+    if closed:
+        keep = np.any(step != np.roll(step, -1, axis=0), axis=1)
+    else:
+        keep = np.concatenate([[True], np.any(step[1:] != step[:-1], axis=1), [True]])
+    return points[keep] if keep.any() else points[:1]
+
+
+def _trace_start(points):
+    """Chỉ số điểm findContours bắt đầu dò một đường viền kín (đã có đủ mọi điểm)
+
+    findContours quét ảnh theo hàng: viền ngoài bắt đầu tại điểm trên cùng bên trái, viền
+    lỗ (chiều dương theo contourArea(oriented=True)) bắt đầu ngay trước điểm đó.
+    """
+    top_left = int(np.lexsort((points[:, 0], points[:, 1]))[0])
+    hole = cv2.contourArea(points.reshape(-1, 1, 2).astype(np.int32), oriented=True) > 0
+    return (top_left - int(hole)) % len(points)
+
+
+def stitch_pieces(pieces, tolerance=1.5):
+    """Nối các đoạn contour bị cắt ở mép ô thành polyline liền, trả về danh sách (điểm, kín)
+
+    Ở lõi các ô, ảnh nhị phân giống hệt ảnh toàn cục nên một đường viền đi qua mép ô được
+    hai ô dò theo cùng chiều: hai điểm cuối (trong lõi, ngoài lõi) của một đoạn trùng đúng
+    hai điểm đầu của đoạn kế tiếp. Khi không khớp đúng (bước trễ của Canny khác nhau ở mép
+    ô) thì nối với đoạn có điểm đầu gần nhất trong phạm vi tolerance. Chuỗi quay về đoạn
+    xuất phát là contour kín, được xoay về cùng điểm đầu như findContours trả về khi xử lý cả ảnh.
+    """
+    exact, starts = {}, {}
+    for k, piece in enumerate(pieces):
+        exact.setdefault((tuple(piece[0]), tuple(piece[1])), []).append(k)
+        key = tuple(np.floor(piece[1] / tolerance).astype(np.int64))
+        starts.setdefault(key, []).append(k)
+
+    def successor(k, chain_start):
+        for j in exact.get((tuple(pieces[k][-2]), tuple(pieces[k][-1])), ()):
+            if not used[j] or j == chain_start:
+                return j
+        end = pieces[k][-2]
+        cx, cy = np.floor(end / tolerance).astype(np.int64)
+        best, best_distance = None, tolerance
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in starts.get((cx + dx, cy + dy), ()):
+                    if used[j] and j != chain_start:
+                        continue
+                    distance = float(np.hypot(*(pieces[j][1] - end)))
+                    if distance <= best_distance:
+                        best, best_distance = j, distance
+        return best
+
+    used = [False] * len(pieces)
+    stitched = []
+    for first in range(len(pieces)):
+        if used[first]:
+            continue
+        chain_start = first
+        used[first] = True
+        chain, k, closed = [pieces[first][1:-1]], first, False
+        while True:
+            nxt = successor(k, chain_start)
+            if nxt is None:
+                break
+            if nxt == chain_start:
+                closed = True
+                break
+            used[nxt] = True
+            chain.append(pieces[nxt][1:-1])
+            k = nxt
+        points = np.vstack(chain)
+        if closed:
+            points = np.roll(points, -_trace_start(points), axis=0)
+        stitched.append((compress_chain(points, closed), closed))
+    return stitched
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # Loại màu PNG -> số kênh (8 bit mỗi kênh)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png_layout(path):
+    """(rộng, cao, loại màu, chunk PLTE, vị trí chunk đầu sau IHDR) nếu reduce_png_bands đọc được, ngược lại None"""
+    with open(path, "rb") as f:
+        if f.read(8) != _PNG_SIGNATURE:
+            return None
+        length, kind = struct.unpack(">I4s", f.read(8))
+        if kind != b"IHDR" or length != 13:
+            return None
+        width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", f.read(13))
+        f.read(4)
+        if depth != 8 or interlace or color not in _PNG_CHANNELS:
+            return None
+        palette = b""
+        while True:
+            position = f.tell()
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, kind = struct.unpack(">I4s", header)
+            if kind == b"IDAT":
+                return width, height, color, palette, position
+            if kind == b"IEND":
+                return None
+            data = f.read(length)
+            f.read(4)
+            if kind == b"PLTE":
+                palette = _png_chunk(kind, data)
+
+
+def _png_idat(f, position, piece=1 << 20):
+    """Dữ liệu nén của các chunk IDAT liên tiếp, đọc từng phần piece byte"""
+    f.seek(position)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack(">I4s", header)
+        if kind != b"IDAT":
+            return
+        while length > 0:
+            data = f.read(min(piece, length))
+            length -= len(data)
+            yield data
+        f.read(4)
+
+
+def _png_gray_bands(path, layout, band_rows):
+    """Các dải ảnh xám band_rows hàng của PNG, giải mã lần lượt
+
+    Dữ liệu IDAT được giải nén dần; mỗi dải (các hàng đã lọc) được gói lại thành một PNG
+    nhỏ có thêm hàng trước đó (đã bỏ lọc, lọc "None") ở đầu để các bộ lọc Up/Average/Paeth
+    của hàng đầu dải được giải đúng, rồi giải mã bằng PIL.
+    """
+    width, height, color, palette, position = layout
+    channels = _PNG_CHANNELS[color]
+    stride = width * channels + 1
+    if color == 3:
+        rgb = np.frombuffer(palette[8:-4], np.uint8).reshape(-1, 1, 3)
+        lut = np.zeros(256, np.uint8)
+        lut[:len(rgb)] = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)[:, 0]
+    
+    previous = bytes(stride - 1)  # Hàng "trước" hàng đầu ảnh coi như toàn 0 theo chuẩn PNG
+    inflate = zlib.decompressobj()
+    buffer = bytearray()
+    with open(path, "rb") as f:
+        pieces = _png_idat(f, position)
+        for y in range(0, height, band_rows):
+            rows = min(band_rows, height - y)
+            need = rows * stride
+            while len(buffer) < need:
+                data = inflate.unconsumed_tail or next(pieces, b"")
+                if not data:
+                    raise ValueError(f"PNG bị cắt cụt: {path}")
+                buffer += inflate.decompress(data, need - len(buffer))
+            
+            ihdr = struct.pack(">IIBBBBB", width, rows + 1, 8, color, 0, 0, 0)
+            idat = zlib.compress(b"\x00" + previous + bytes(buffer[:need]), 0)
+            del buffer[:need]
+            mini = (_PNG_SIGNATURE + _png_chunk(b"IHDR", ihdr) + palette + _png_chunk(b"IDAT", idat)
+                    + _png_chunk(b"IEND", b""))
+            with Image.open(io.BytesIO(mini)) as band:
+                raw = np.asarray(band)
+            previous = raw[-1].tobytes()
+            raw = raw[1:]
+            if color == 0:
+                yield raw
+            elif color == 3:
+                yield lut[raw]
+            elif color == 4:
+                yield np.ascontiguousarray(raw[:, :, 0])
+            else:
+                yield cv2.cvtColor(raw, cv2.COLOR_RGB2GRAY if color == 2 else cv2.COLOR_RGBA2GRAY)
+
+
+def _tiff_gray_bands(path, band_rows):
+    """Các dải ảnh xám của TIFF không nén (strip đọc thẳng từ file), None nếu không hỗ trợ"""
+    with Image.open(path) as im:
+        tiles = list(im.tile)
+        width, height = im.size
+        mode = im.mode
+    if mode not in ("L", "RGB", "RGBA") or not tiles:
+        return None
+    for tile in tiles:
+        x0, y0, x1, y1 = tile.extents
+        rawmode, stride, orientation = (tuple(tile.args) + (0, 1))[:3]
+        if tile.codec_name != "raw" or rawmode != mode or stride not in (0, None) or orientation != 1 \
+                or x0 != 0 or x1 != width:
+            return None
+    channels = len(mode)
+    
+    def bands():
+        with open(path, "rb") as f:
+            for y in range(0, height, band_rows):
+                rows = min(band_rows, height - y)
+                band = np.empty((rows, width, channels), np.uint8)
+                for tile in tiles:
+                    _, top, _, bottom = tile.extents
+                    start, end = max(top, y), min(bottom, y + rows)
+                    if start >= end:
+                        continue
+                    f.seek(tile.offset + (start - top) * width * channels)
+                    data = np.frombuffer(f.read((end - start) * width * channels), np.uint8)
+                    band[start - y:end - y] = data.reshape(end - start, width, channels)
+                if channels == 1:
+                    yield band[:, :, 0]
+                else:
+                    yield cv2.cvtColor(band, cv2.COLOR_RGB2GRAY if channels == 3 else cv2.COLOR_RGBA2GRAY)
+    return bands()
+
+
+def read_reduced_gray(path, factor, band_pixels=1 << 20):
+    """Đọc ảnh xám thu nhỏ factor lần theo từng dải hàng, None nếu định dạng không hỗ trợ
+
+    Chỉ một dải khoảng band_pixels pixel của ảnh gốc được giải mã cùng lúc, nên bộ nhớ
+    không phụ thuộc kích thước ảnh (cv2.imread với PNG/TIFF giải mã toàn bộ rồi mới thu
+    nhỏ). Hỗ trợ PNG 8 bit không interlace và TIFF không nén; mỗi pixel kết quả là trung
+    bình một khối factor x factor (INTER_AREA).
+    """
+    layout = _png_layout(path)
+    if layout is not None:
+        width = layout[0]
+    else:
+        try:
+            with Image.open(path) as header:
+                if header.format != "TIFF":
+                    return None
+                width = header.size[0]
+        except (OSError, ValueError):
+            return None
+    band_rows = max(factor, band_pixels // max(width, 1) // factor * factor)
+    bands = _png_gray_bands(path, layout, band_rows) if layout is not None else _tiff_gray_bands(path, band_rows)
+    if bands is None:
+        return None
+    
+    out_width = -(-width // factor)
+    reduced = []
+    for band in bands:
+        size = (out_width, -(-band.shape[0] // factor))
+        reduced.append(cv2.resize(band, size, interpolation=cv2.INTER_AREA))
+    return np.vstack(reduced)
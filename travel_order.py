@@ -0,0 +1,372 @@
+import math
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class PointGrid:
+    """Chỉ mục lưới đều cho truy vấn điểm gần nhất, hỗ trợ loại bỏ điểm theo nhóm
+
+    Mỗi điểm thuộc một nhóm (nét); khi một nét đã được chọn, mọi điểm của nó bị loại cùng
+    lúc (kill) và được dọn khỏi danh sách của ô khi ô đó được quét lại.
+    """
+
+    def __init__(self, points, groups, cell=None):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.groups = np.asarray(groups)
+        self.group_sizes = np.bincount(self.groups) if len(self.groups) else np.zeros(0, dtype=np.int64)
+        self.alive_group = np.ones(len(self.group_sizes), dtype=bool)
+        self.alive = len(self.points)
+        self._build(cell)
+
+    def _build(self, cell=None, index=None):
+        index = np.arange(len(self.points)) if index is None else index
+        pts = self.points[index]
+        if cell is None:
+            extent = float(np.ptp(pts, axis=0).max()) if len(pts) else 1.0
+            cell = max(extent / math.sqrt(max(len(pts), 1)) * 1.5, 1e-9)
+        self.cell = cell
+        self.origin = pts.min(axis=0) if len(pts) else np.zeros(2)
+        keys = np.floor((pts - self.origin) / cell).astype(np.int64)
+        self.size = keys.max(axis=0) + 1 if len(pts) else np.ones(2, dtype=np.int64)
+        flat = keys[:, 0] * self.size[1] + keys[:, 1]
+        order = np.argsort(flat, kind="stable")
+        bounds = np.flatnonzero(np.diff(flat[order])) + 1
+        self.cells = {}
+        for chunk in np.split(order, bounds):
+            if len(chunk):
+                cx, cy = divmod(int(flat[chunk[0]]), int(self.size[1]))
+                self.cells[(cx, cy)] = index[chunk].tolist()
+        self.indexed = len(index)
+
+    def kill(self, group):
+        """Loại mọi điểm của một nhóm"""
+        if self.alive_group[group]:
+            self.alive_group[group] = False
+            self.alive -= int(self.group_sizes[group])
+
+    def _cell_points(self, key):
+        items = self.cells.get(key)
+        if not items:
+            return ()
+        alive = self.alive_group
+        groups = self.groups
+        kept = [i for i in items if alive[groups[i]]]
+        if len(kept) != len(items):
+            if kept:
+                self.cells[key] = kept
+            else:
+                del self.cells[key]
+        return kept
+
+    def _rings(self, x, y):
+        """Các ô theo vòng vuông đồng tâm quanh ô chứa (x, y): (bán kính vòng, danh sách khóa)"""
+        cx = int(math.floor((x - self.origin[0]) / self.cell))
+        cy = int(math.floor((y - self.origin[1]) / self.cell))
+        limit = int(max(cx, self.size[0] - cx, cy, self.size[1] - cy)) + 1
+        for r in range(limit + 1):
+            if r == 0:
+                yield 0, [(cx, cy)]
+                continue
+            keys = [(cx + dx, cy - r) for dx in range(-r, r + 1)] + [(cx + dx, cy + r) for dx in range(-r, r + 1)]
+            keys += [(cx - r, cy + dy) for dy in range(-r + 1, r)] + [(cx + r, cy + dy) for dy in range(-r + 1, r)]
+            yield r, keys
+
+    def nearest(self, x, y):
+        """Chỉ số điểm còn lại gần (x, y) nhất, hoặc None nếu không còn điểm nào"""
+        if self.alive <= 0:
+            return None
+        # Khi phần lớn điểm đã bị loại, lưới thưa làm các vòng quét rất dài: dựng lại thô hơn
+        if self.alive * 4 < self.indexed and self.indexed > 64:
+            index = np.flatnonzero(self.alive_group[self.groups])
+            self._build(index=index)
+        best, best_d = None, math.inf
+        points = self.points
+        for r, keys in self._rings(x, y):
+            for key in keys:
+                for i in self._cell_points(key):
+                    px, py = points[i]
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    if d < best_d:
+                        best, best_d = i, d
+            # Điểm ở vòng r+1 cách (x, y) ít nhất r ô
+            if best is not None and best_d <= (r * self.cell) ** 2:
+                break
+        return best
+
+    def within(self, x, y, radius):
+        """Các điểm còn lại cách (x, y) không quá radius"""
+        reach = int(math.ceil(radius / self.cell))
+        found = []
+        for r, keys in self._rings(x, y):
+            if r > reach:
+                break
+            for key in keys:
+                for i in self._cell_points(key):
+                    px, py = self.points[i]
+                    if (px - x) ** 2 + (py - y) ** 2 <= radius * radius:
+                        found.append(i)
+        return found
+
+
+def travel_length(segments, order, reverse, starts):
+    """Tổng quãng di chuyển nhấc bút giữa các nét theo thứ tự; reverse, starts theo chỉ số nét"""
+    total = 0.0
+    previous = None
+    for s in order:
+        entry, exit_ = _ends(segments[s], reverse[s], starts[s])
+        if previous is not None:
+            total += math.dist(previous, entry)
+        previous = exit_
+    return total
+
+
+def _ends(points, flip, start):
+    if start >= 0:
+        return tuple(points[start]), tuple(points[start])
+    return (tuple(points[-1]), tuple(points[0])) if flip else (tuple(points[0]), tuple(points[-1]))
+
+
+def order_segments(segments, closed, time_limit=2.0, neighbors=8):
+    """Sắp thứ tự nét để giảm quãng đường nhấc bút, trả về (thứ tự, đảo chiều, điểm bắt đầu, báo cáo)
+
+    segments: danh sách mảng (k, 2); closed: cờ kín (điểm cuối trùng điểm đầu). Nét mở có
+    thể được vẽ ngược chiều; nét kín có thể bắt đầu tại bất kỳ đỉnh nào (starts >= 0, -1
+    với nét mở); reverse và starts đánh theo chỉ số nét. Tour tham lam láng giềng gần nhất trên lưới chỉ mục các điểm vào có thể,
+    bắt đầu từ nét đầu tiên theo thứ tự cũ; sau đó cải thiện bằng 2-opt và Or-opt trên
+    danh sách láng giềng gần trong tối đa time_limit giây. Báo cáo gồm quãng nhấc bút
+    trước (thứ tự cũ) và sau.
+    """
+    n = len(segments)
+    reverse = np.zeros(n, dtype=bool)
+    starts = np.where(closed, 0, -1)
+    before = travel_length(segments, range(n), reverse, starts)
+    if n < 3:
+        return list(range(n)), reverse.tolist(), starts.tolist(), {"before": before, "greedy": before, "after": before, "moves": 0}
+
+    # Điểm vào có thể: hai đầu của nét mở, mọi đỉnh (trừ điểm lặp cuối) của nét kín
+    cand_points, cand_groups, cand_modes = [], [], []
+    for s, (points, is_closed) in enumerate(zip(segments, closed)):
+        if is_closed:
+            count = max(len(points) - 1, 1)
+            cand_points.append(points[:count])
+            cand_groups.append(np.full(count, s))
+            cand_modes.append(np.arange(count))
+        else:
+            cand_points.append(points[[0, -1]])
+            cand_groups.append(np.full(2, s))
+            cand_modes.append(np.array([-1, -2]))  # -1: xuôi, -2: ngược
+    grid = PointGrid(np.concatenate(cand_points), np.concatenate(cand_groups))
+    modes = np.concatenate(cand_modes)
+
+    # Tour tham lam láng giềng gần nhất
+    order, reverse, starts = [0], np.zeros(n, dtype=bool), np.where(closed, 0, -1)
+    grid.kill(0)
+    x, y = segments[0][-1]
+    while len(order) < n:
+        i = grid.nearest(x, y)
+        s, mode = int(grid.groups[i]), int(modes[i])
+        grid.kill(s)
+        order.append(s)
+        if mode >= 0:
+            starts[s] = mode
+            x, y = segments[s][mode]
+        else:
+            reverse[s] = mode == -2
+            x, y = segments[s][0] if reverse[s] else segments[s][-1]
+    greedy = travel_length(segments, order, reverse, starts)
+
+    tour = _Tour(segments, closed, order, reverse, starts)
+    tour.improve(neighbors, time.perf_counter() + time_limit)
+    order, reverse, starts = tour.result()
+    after = travel_length(segments, order, reverse, starts)
+    return order, reverse, starts, {"before": before, "greedy": greedy, "after": after, "moves": tour.moves}
+
+
+class _Tour:
+    """Tour nét với điểm vào/ra theo vị trí, cho các bước 2-opt và Or-opt"""
+
+    def __init__(self, segments, closed, order, reverse, starts):
+        self.segments = segments
+        self.closed = np.asarray(closed, dtype=bool)
+        self.order = np.array(order, dtype=np.int64)
+        self.reverse = np.asarray(reverse, dtype=bool).copy()
+        self.starts = np.asarray(starts, dtype=np.int64).copy()
+        n = len(order)
+        self.pos = np.empty(n, dtype=np.int64)
+        self.pos[self.order] = np.arange(n)
+        self.entry = np.empty((n, 2))
+        self.exit = np.empty((n, 2))
+        for p, s in enumerate(self.order):
+            self.entry[p], self.exit[p] = _ends(segments[s], self.reverse[s], self.starts[s])
+        self.moves = 0
+
+    def result(self):
+        return self.order.tolist(), self.reverse.tolist(), self.starts.tolist()
+
+    def gap(self, a, b):
+        """Quãng nhấc bút giữa vị trí a và b (0 nếu một trong hai nằm ngoài tour)"""
+        if a < 0 or b >= len(self.order):
+            return 0.0
+        return math.dist(self.exit[a], self.entry[b])
+
+    def neighbor_lists(self, k):
+        """k nét gần nhất của mỗi nét theo các điểm đầu/cuối hiện tại (cây k-d FLANN của OpenCV)"""
+        n = len(self.order)
+        ends = np.concatenate([self.entry, self.exit]).astype(np.float32)
+        owners = np.concatenate([self.order, self.order])
+        count = min(2 * k + 2, len(ends))
+        index = cv2.flann_Index(ends, dict(algorithm=1, trees=1))
+        found, distance = index.knnSearch(ends, count, params=dict(checks=max(32, 4 * count)))
+        found, distance = owners[found], distance
+
+        lists = [None] * n
+        for row in range(n):
+            # Hàng row là điểm vào và hàng row + n là điểm ra của nét ở vị trí row
+            candidates = np.concatenate([found[row], found[row + n]])
+            closest = candidates[np.argsort(np.concatenate([distance[row], distance[row + n]]), kind="stable")]
+            s = int(self.order[row])
+            lists[s] = [t for t in dict.fromkeys(closest.tolist()) if t != s][:k]
+        return lists
+
+    def reverse_span(self, i, j):
+        """Đảo đoạn tour từ vị trí i tới j: nét mở đổi chiều, điểm vào/ra đổi chỗ"""
+        span = self.order[i:j + 1][::-1].copy()
+        self.order[i:j + 1] = span
+        self.pos[span] = np.arange(i, j + 1)
+        entry = self.exit[i:j + 1][::-1].copy()
+        self.exit[i:j + 1] = self.entry[i:j + 1][::-1]
+        self.entry[i:j + 1] = entry
+        open_ = span[~self.closed[span]]
+        self.reverse[open_] = ~self.reverse[open_]
+
+    def best_insertion(self, s, before_point, after_point):
+        """Cách vào nét s tốt nhất giữa hai điểm: (chi phí, đảo chiều, đỉnh bắt đầu, vào, ra)"""
+        points = self.segments[s]
+
+        def cost(a, b):
+            return ((math.dist(before_point, a) if before_point is not None else 0.0)
+                    + (math.dist(b, after_point) if after_point is not None else 0.0))
+
+        if self.closed[s]:
+            vertices = points[:max(len(points) - 1, 1)]
+            total = np.zeros(len(vertices))
+            if before_point is not None:
+                total += np.hypot(*(vertices - before_point).T)
+            if after_point is not None:
+                total += np.hypot(*(vertices - after_point).T)
+            v = int(np.argmin(total))
+            return float(total[v]), False, v, points[v], points[v]
+        forward, backward = cost(points[0], points[-1]), cost(points[-1], points[0])
+        if backward < forward:
+            return backward, True, -1, points[-1], points[0]
+        return forward, False, -1, points[0], points[-1]
+
+    def move(self, p, q):
+        """Or-opt: chuyển nét ở vị trí p tới ngay sau vị trí q (q theo chỉ số trước khi chuyển)"""
+        s = self.order[p]
+        if q < p:
+            target = q + 1
+            sl = slice(target, p + 1)
+            self.order[target + 1:p + 1] = self.order[target:p].copy()
+            self.entry[target + 1:p + 1] = self.entry[target:p].copy()
+            self.exit[target + 1:p + 1] = self.exit[target:p].copy()
+        else:
+            target = q
+            sl = slice(p, q + 1)
+            self.order[p:q] = self.order[p + 1:q + 1].copy()
+            self.entry[p:q] = self.entry[p + 1:q + 1].copy()
+            self.exit[p:q] = self.exit[p + 1:q + 1].copy()
+        self.order[target] = s
+        self.pos[self.order[sl]] = np.arange(sl.start, sl.stop)
+        return target
+
+    def improve(self, k, deadline):
+        """Áp dụng nước 2-opt / Or-opt cải thiện đầu tiên tìm được cho tới khi hết cải thiện hoặc hết giờ
+
+        Hàng đợi các nét cần xét ("don't look bits"): chỉ nét có cạnh vừa thay đổi mới
+        được xét lại, nên mỗi lượt không phải duyệt lại toàn bộ tour.
+        """
+        lists = self.neighbor_lists(k)
+        queue = deque(range(len(self.order)))
+        queued = np.ones(len(self.order), dtype=bool)
+        while queue and time.perf_counter() < deadline:
+            s = queue.popleft()
+            queued[s] = False
+            for t in lists[s]:
+                touched = self.try_two_opt(s, t) or self.try_or_opt(s, t)
+                if touched:
+                    self.moves += 1
+                    for p in touched:
+                        if 0 <= p < len(self.order):
+                            u = int(self.order[p])
+                            if not queued[u]:
+                                queued[u] = True
+                                queue.append(u)
+                    break
+
+    def try_two_opt(self, s, t):
+        """Nối điểm ra của s với điểm ra của t (hoặc điểm vào với điểm vào) bằng một lần đảo đoạn
+
+        Cũng thử đảo phần đầu / phần cuối tour quanh s (chỉ đổi một cạnh vì tour không khép kín).
+        """
+        a, b = int(self.pos[s]), int(self.pos[t])
+        for i, j in ((a + 1, b), (b + 1, a), (a, b - 1), (b, a - 1)):
+            # Đảo [i, j]: cạnh (i-1, i) và (j, j+1) thay bằng (i-1 ra -> j ra) và (i vào -> j+1 vào)
+            if i > j:
+                continue
+            old = self.gap(i - 1, i) + self.gap(j, j + 1)
+            new = 0.0
+            if i - 1 >= 0:
+                new += math.dist(self.exit[i - 1], self.exit[j])
+            if j + 1 < len(self.order):
+                new += math.dist(self.entry[i], self.entry[j + 1])
+            if new < old - 1e-9:
+                self.reverse_span(i, j)
+                return (i - 1, i, j, j + 1)
+        for i, j in ((0, a - 1), (a + 1, len(self.order) - 1)):
+            if i > j or (i, j) == (0, len(self.order) - 1):
+                continue
+            old = self.gap(i - 1, i) + self.gap(j, j + 1)
+            if i == 0:
+                new = math.dist(self.entry[i], self.entry[j + 1])
+            else:
+                new = math.dist(self.exit[i - 1], self.exit[j])
+            if new < old - 1e-9:
+                self.reverse_span(i, j)
+                return (i - 1, i, j, j + 1)
+        return None
+
+    def try_or_opt(self, s, t):
+        """Chuyển nét s tới cạnh t (trước hoặc sau t), chọn lại chiều / đỉnh bắt đầu
+
+        Trả về các vị trí có cạnh thay đổi, hoặc None nếu không có nước cải thiện (như try_two_opt).
+        """
+        n = len(self.order)
+        p = int(self.pos[s])
+        prev_exit = self.exit[p - 1] if p > 0 else None
+        next_entry = self.entry[p + 1] if p + 1 < n else None
+        removed = self.gap(p - 1, p) + self.gap(p, p + 1)
+        if prev_exit is not None and next_entry is not None:
+            removed -= math.dist(prev_exit, next_entry)
+
+        q_t = int(self.pos[t])
+        for q in (q_t - 1, q_t):  # Chèn vào giữa vị trí q và q+1
+            if q == p or q == p - 1:
+                continue
+            before = self.exit[q] if q >= 0 else None
+            after = self.entry[q + 1] if q + 1 < n else None
+            if before is None and after is None:
+                continue
+            cost, flip, start, entry, exit_ = self.best_insertion(s, before, after)
+            base = math.dist(before, after) if before is not None and after is not None else 0.0
+            if cost - base < removed - 1e-9:
+                target = self.move(p, q)
+                self.reverse[s], self.starts[s] = flip, start
+                self.entry[target], self.exit[target] = entry, exit_
+                # Hai nét kề cũ của s giờ nằm cạnh nhau
+                old_neighbors = (p, p + 1) if target < p else (p - 1, p)
+                return (target - 1, target, target + 1) + old_neighbors
+        return None
@@ -0,0 +1,566 @@
+import math
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from path_buffer import PathBuffer
+
+VECTOR_EXTENSIONS = ('.svg', '.dxf')
+
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_PATH_TOKEN = re.compile(rf"[MmZzLlHhVvCcSsQqTtAa]|{_NUMBER}")
+_NUMBER_RE = re.compile(_NUMBER)
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_SKIPPED_SVG = {"defs", "clipPath", "mask", "symbol", "marker", "pattern", "style", "script", "metadata", "title", "desc"}
+
+
+def is_vector_file(path):
+    """File SVG/DXF được nhập trực tiếp thành đường nét, không qua xử lý ảnh"""
+    return path.lower().endswith(VECTOR_EXTENSIONS)
+
+
+class CurveSet:
+    """Tập đường cong dưới dạng các đoạn Bézier bậc ba, gom theo nét (subpath)
+
+    Đoạn thẳng, Bézier bậc hai và cung elip đều được đổi chính xác (cung: sai số ~4e-6
+    bán kính với mỗi phần <= 45°) sang Bézier bậc ba, nên mọi nét được rời rạc hóa chung
+    trong một lượt numpy (flatten). Tọa độ điểm điều khiển được lưu ở hệ tọa độ cục bộ của
+    phần tử rồi nhân ma trận affine khi kết thúc phần tử (Bézier bất biến qua phép affine).
+    """
+
+    def __init__(self):
+        self.curves = []  # Mảng (k, 4, 2) của từng phần tử
+        self.counts = []  # Số đoạn của từng nét
+        self._flat = []
+        self._count = 0
+        self.start = self.current = (0.0, 0.0)
+        self.skipped = {}  # Loại thực thể không hỗ trợ -> số lượng đã bỏ qua (DXF)
+
+    def move_to(self, point):
+        self.end_subpath()
+        self.start = self.current = point
+
+    def line_to(self, point):
+        # Điểm điều khiển chia đều đoạn thẳng: sai phân bậc hai bằng 0 nên chỉ cần một đoạn
+        (x0, y0), (x3, y3) = self.current, point
+        dx, dy = (x3 - x0) / 3, (y3 - y0) / 3
+        self._flat += (x0, y0, x0 + dx, y0 + dy, x3 - dx, y3 - dy, x3, y3)
+        self._count += 1
+        self.current = point
+
+    def quad_to(self, control, point):
+        (x0, y0), (x1, y1), (x3, y3) = self.current, control, point
+        self.cubic_to((x0 + 2 / 3 * (x1 - x0), y0 + 2 / 3 * (y1 - y0)),
+                      (x3 + 2 / 3 * (x1 - x3), y3 + 2 / 3 * (y1 - y3)), point)
+
+    def cubic_to(self, control1, control2, point):
+        self._flat += (*self.current, *control1, *control2, *point)
+        self._count += 1
+        self.current = point
+
+    def polyline(self, points, closed=False):
+        self.move_to(points[0])
+        for point in points[1:]:
+            self.line_to(point)
+        if closed:
+            self.close()
+
+    def close(self):
+        if self._count and math.dist(self.current, self.start) > 1e-9 * (1 + math.hypot(*self.start)):
+            self.line_to(self.start)
+        self.current = self.start
+
+    def arc(self, center, rx, ry, rotation, start, sweep):
+        """Cung elip tâm center, bán trục rx, ry, trục lớn xoay rotation, từ góc start quét sweep (radian)"""
+        pieces = max(1, math.ceil(abs(sweep) / (math.pi / 4) - 1e-9))
+        delta = sweep / pieces
+        alpha = 4 / 3 * math.tan(delta / 4)
+        cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+
+        def to_world(u, v):
+            u, v = u * rx, v * ry
+            return (center[0] + u * cos_r - v * sin_r, center[1] + u * sin_r + v * cos_r)
+
+        a = start
+        for _ in range(pieces):
+            b = a + delta
+            ca, sa, cb, sb = math.cos(a), math.sin(a), math.cos(b), math.sin(b)
+            self.cubic_to(to_world(ca - alpha * sa, sa + alpha * ca), to_world(cb + alpha * sb, sb - alpha * cb),
+                          to_world(cb, sb))
+            a = b
+
+    def arc_to(self, rx, ry, rotation_deg, large_arc, sweep_flag, point):
+        """Cung theo tham số điểm cuối của SVG (lệnh A), đổi sang tâm theo phụ lục F.6.5"""
+        (x1, y1), (x2, y2) = self.current, point
+        rx, ry = abs(rx), abs(ry)
+        if (x1, y1) == (x2, y2):
+            return
+        if rx == 0 or ry == 0:
+            self.line_to(point)
+            return
+
+        phi = math.radians(rotation_deg)
+        cos_p, sin_p = math.cos(phi), math.sin(phi)
+        dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+        x1p, y1p = cos_p * dx + sin_p * dy, -sin_p * dx + cos_p * dy
+
+        # Bán kính quá nhỏ để nối hai điểm thì phóng to vừa đủ
+        scale = x1p ** 2 / rx ** 2 + y1p ** 2 / ry ** 2
+        if scale > 1:
+            rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+
+        numerator = rx ** 2 * ry ** 2 - rx ** 2 * y1p ** 2 - ry ** 2 * x1p ** 2
+        factor = math.sqrt(max(0.0, numerator / (rx ** 2 * y1p ** 2 + ry ** 2 * x1p ** 2)))
+        if large_arc == sweep_flag:
+            factor = -factor
+        cxp, cyp = factor * rx * y1p / ry, -factor * ry * x1p / rx
+        center = (cos_p * cxp - sin_p * cyp + (x1 + x2) / 2, sin_p * cxp + cos_p * cyp + (y1 + y2) / 2)
+
+        start = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+        end = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx)
+        sweep = end - start
+        if sweep_flag and sweep < 0:
+            sweep += 2 * math.pi
+        elif not sweep_flag and sweep > 0:
+            sweep -= 2 * math.pi
+
+        self.arc(center, rx, ry, phi, start, sweep)
+        self.current = point  # Điểm cuối đúng như trong file, không lệch do sai số làm tròn
+
+    def end_subpath(self):
+        if self._count:
+            self.counts.append(self._count)
+            self._count = 0
+
+    def end_element(self, matrix=None):
+        """Kết thúc một phần tử: đưa các đoạn đã thêm về hệ tọa độ chung bằng ma trận affine 3x3"""
+        self.end_subpath()
+        if not self._flat:
+            return
+        curves = np.array(self._flat, dtype=np.float64).reshape(-1, 4, 2)
+        self._flat = []
+        if matrix is not None:
+            curves = curves @ matrix[:2, :2].T + matrix[:2, 2]
+        self.curves.append(curves)
+
+    def flatten(self, tolerance):
+        """Rời rạc hóa mọi nét với sai số dây cung <= tolerance
+
+        Số đoạn của mỗi Bézier lấy từ cận đạo hàm bậc hai: chia đều n đoạn cho sai số
+        <= 3/4 * max(|P0-2P1+P2|, |P1-2P2+P3|) / n². Trả về (điểm (M, 2), số điểm mỗi nét).
+        """
+        self.end_element()
+        if not self.curves:
+            return np.empty((0, 2)), np.empty(0, dtype=np.int64)
+        curves = np.concatenate(self.curves)
+        p0, p1, p2, p3 = curves[:, 0], curves[:, 1], curves[:, 2], curves[:, 3]
+
+        bend = np.maximum(np.hypot(*(p0 - 2 * p1 + p2).T), np.hypot(*(p1 - 2 * p2 + p3).T))
+        steps = np.clip(np.ceil(np.sqrt(0.75 * bend / tolerance)), 1, 4096).astype(np.int64)
+
+        index = np.repeat(np.arange(len(curves)), steps)
+        t = ((np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps) + 1) / np.repeat(steps, steps))[:, None]
+        s = 1 - t
+        samples = (s ** 3 * p0[index] + 3 * s ** 2 * t * p1[index] + 3 * s * t ** 2 * p2[index]
+                   + t ** 3 * p3[index])
+
+        # Chèn điểm đầu của mỗi nét trước các điểm mẫu của nét đó
+        counts = np.asarray(self.counts, dtype=np.int64)
+        first_curve = np.cumsum(counts) - counts
+        first_sample = (np.cumsum(steps) - steps)[first_curve]
+        points = np.insert(samples, first_sample, p0[first_curve], axis=0)
+        sizes = np.add.reduceat(steps, first_curve) + 1
+        return points, sizes
+
+
+def parse_svg(path, curves=None):
+    """Đọc các phần tử hình học của SVG (path, line, polyline, polygon, rect, circle, ellipse)
+
+    Áp dụng thuộc tính transform lồng nhau; bỏ qua phần tử ẩn (display:none) và nội dung
+    của defs/clipPath/mask/... Phần tử use (tham chiếu) không được hỗ trợ.
+    """
+    curves = curves if curves is not None else CurveSet()
+    stack = [np.eye(3)]
+    hidden = 0
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            invisible = (tag in _SKIPPED_SVG or element.get("display") == "none"
+                         or "display:none" in element.get("style", "").replace(" ", ""))
+            if hidden or invisible:
+                hidden += 1
+                continue
+            stack.append(stack[-1] @ _parse_transform(element.get("transform", "")))
+            _svg_shape(curves, tag, element)
+            curves.end_element(stack[-1])
+        else:
+            if hidden:
+                hidden -= 1
+            else:
+                stack.pop()
+            element.clear()  # Giải phóng cây XML đã đọc (file lớn)
+    return curves
+
+
+def _length(value, default=0.0):
+    match = _NUMBER_RE.match(value.strip()) if value else None
+    return float(match.group()) if match else default
+
+
+def _parse_transform(text):
+    matrix = np.eye(3)
+    for name, args in _TRANSFORM.findall(text):
+        values = [float(v) for v in _NUMBER_RE.findall(args)]
+        m = np.eye(3)
+        if name == "matrix" and len(values) == 6:
+            m[0, :] = values[0], values[2], values[4]
+            m[1, :] = values[1], values[3], values[5]
+        elif name == "translate" and values:
+            m[0, 2], m[1, 2] = values[0], values[1] if len(values) > 1 else 0.0
+        elif name == "scale" and values:
+            m[0, 0], m[1, 1] = values[0], values[1] if len(values) > 1 else values[0]
+        elif name == "rotate" and values:
+            angle = math.radians(values[0])
+            m[:2, :2] = [[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]]
+            if len(values) == 3:
+                cx, cy = values[1], values[2]
+                m = _translation(cx, cy) @ m @ _translation(-cx, -cy)
+        elif name == "skewX" and values:
+            m[0, 1] = math.tan(math.radians(values[0]))
+        elif name == "skewY" and values:
+            m[1, 0] = math.tan(math.radians(values[0]))
+        matrix = matrix @ m
+    return matrix
+
+
+def _translation(x, y):
+    m = np.eye(3)
+    m[0, 2], m[1, 2] = x, y
+    return m
+
+
+def _svg_shape(curves, tag, element):
+    get = element.get
+    if tag == "path":
+        _svg_path(curves, get("d", ""))
+    elif tag == "line":
+        curves.move_to((_length(get("x1")), _length(get("y1"))))
+        curves.line_to((_length(get("x2")), _length(get("y2"))))
+    elif tag in ("polyline", "polygon"):
+        values = [float(v) for v in _NUMBER_RE.findall(get("points", ""))]
+        points = list(zip(values[0::2], values[1::2]))
+        if len(points) >= 2:
+            curves.polyline(points, closed=tag == "polygon")
+    elif tag == "rect":
+        x, y = _length(get("x")), _length(get("y"))
+        w, h = _length(get("width")), _length(get("height"))
+        if w <= 0 or h <= 0:
+            return
+        rx, ry = get("rx"), get("ry")
+        rx, ry = _length(rx if rx is not None else ry), _length(ry if ry is not None else rx)
+        rx, ry = min(rx, w / 2), min(ry, h / 2)
+        if rx <= 0 or ry <= 0:
+            curves.polyline([(x, y), (x + w, y), (x + w, y + h), (x, y + h)], closed=True)
+            return
+        # Hình chữ nhật bo góc: cạnh thẳng xen với cung 90° theo chiều kim đồng hồ (trục y hướng xuống)
+        curves.move_to((x + rx, y))
+        corners = ((x + w - rx, y, x + w - rx, y + ry), (x + w, y + h - ry, x + w - rx, y + h - ry),
+                   (x + rx, y + h, x + rx, y + h - ry), (x, y + ry, x + rx, y + ry))
+        for i, (lx, ly, cx, cy) in enumerate(corners):
+            curves.line_to((lx, ly))
+            curves.arc((cx, cy), rx, ry, 0.0, -math.pi / 2 + i * math.pi / 2, math.pi / 2)
+        curves.close()
+    elif tag in ("circle", "ellipse"):
+        cx, cy = _length(get("cx")), _length(get("cy"))
+        if tag == "circle":
+            rx = ry = _length(get("r"))
+        else:
+            rx, ry = _length(get("rx")), _length(get("ry"))
+        if rx > 0 and ry > 0:
+            curves.move_to((cx + rx, cy))
+            curves.arc((cx, cy), rx, ry, 0.0, 0.0, 2 * math.pi)
+            curves.close()
+
+
+def _svg_path(curves, data):
+    """Đọc chuỗi lệnh d của phần tử path (mọi lệnh SVG 1.1, tuyệt đối và tương đối)"""
+    tokens = _PATH_TOKEN.findall(data)
+    i, count = 0, len(tokens)
+    command = None
+    previous_control, previous_command = None, ""
+    curves.start = curves.current = (0.0, 0.0)  # Lệnh m đầu tiên được tính như M
+
+    def number():
+        nonlocal i
+        value = float(tokens[i])
+        i += 1
+        return value
+
+    def flag():
+        # Cờ của lệnh A có thể viết liền nhau ("a1 1 0 011 1"): mỗi cờ chỉ là một ký tự
+        nonlocal i
+        token = tokens[i]
+        if len(token) > 1 and token[0] in "01":
+            tokens[i] = token[1:]
+            return token[0] == "1"
+        i += 1
+        return float(token) != 0
+
+    while i < count:
+        token = tokens[i]
+        if token.isalpha():
+            command = token
+            i += 1
+            if command in "Zz":
+                curves.close()
+                previous_control, previous_command = None, command
+                continue
+        elif command is None:
+            break  # Số đứng trước mọi lệnh: dữ liệu hỏng
+
+        relative = command.islower()
+        ox, oy = curves.current if relative else (0.0, 0.0)
+        upper = command.upper()
+        control = None
+        try:
+            if upper == "M":
+                curves.move_to((ox + number(), oy + number()))
+                command = "l" if relative else "L"  # Các cặp số tiếp theo là lệnh L ngầm
+            elif upper == "L":
+                curves.line_to((ox + number(), oy + number()))
+            elif upper == "H":
+                curves.line_to((ox + number(), curves.current[1]))
+            elif upper == "V":
+                curves.line_to((curves.current[0], oy + number()))
+            elif upper in "CS":
+                if upper == "C":
+                    control1 = (ox + number(), oy + number())
+                elif previous_command in "CcSs" and previous_control is not None:
+                    control1 = _reflect(previous_control, curves.current)
+                else:
+                    control1 = curves.current
+                control = (ox + number(), oy + number())
+                curves.cubic_to(control1, control, (ox + number(), oy + number()))
+            elif upper in "QT":
+                if upper == "Q":
+                    control = (ox + number(), oy + number())
+                elif previous_command in "QqTt" and previous_control is not None:
+                    control = _reflect(previous_control, curves.current)
+                else:
+                    control = curves.current
+                curves.quad_to(control, (ox + number(), oy + number()))
+            elif upper == "A":
+                rx, ry, rotation = number(), number(), number()
+                large_arc, sweep = flag(), flag()
+                curves.arc_to(rx, ry, rotation, large_arc, sweep, (ox + number(), oy + number()))
+            else:
+                break
+        except (IndexError, ValueError):
+            break  # Thiếu tham số ở cuối chuỗi: bỏ lệnh dở dang như trình duyệt
+        previous_control, previous_command = control, command
+    curves.end_subpath()
+
+
+def _reflect(point, center):
+    return (2 * center[0] - point[0], 2 * center[1] - point[1])
+
+
+def parse_dxf(path, curves=None):
+    """Đọc các thực thể 2D trong mục ENTITIES của DXF dạng văn bản
+
+    Hỗ trợ LINE, LWPOLYLINE và POLYLINE (kể cả bulge), CIRCLE, ARC, ELLIPSE, SPLINE.
+    Khối (INSERT) và thực thể khác được bỏ qua và đếm trong curves.skipped. Trục y của DXF
+    hướng lên nên được lật lại như tọa độ ảnh.
+    """
+    curves = curves if curves is not None else CurveSet()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+    if len(lines) < 2 or lines[0].startswith("AutoCAD Binary DXF"):
+        raise ValueError("Chỉ hỗ trợ DXF dạng văn bản (ASCII)")
+
+    pairs = list(zip((code.strip() for code in lines[0::2]), (value.strip() for value in lines[1::2])))
+    in_entities = False
+    skipped = curves.skipped
+    polyline = None  # (đỉnh, bulge, kín) của POLYLINE cũ đang đọc các VERTEX
+    entity, fields = None, []
+
+    def finish(entity, fields):
+        nonlocal polyline
+        if entity is None:
+            return
+        if entity == "VERTEX" and polyline is not None:
+            group = _dxf_group(fields)
+            polyline[0].append((group.get("10", [0.0])[0], group.get("20", [0.0])[0]))
+            polyline[1].append(group.get("42", [0.0])[0])
+        elif entity == "SEQEND" and polyline is not None:
+            _dxf_polyline(curves, *polyline)
+            polyline = None
+        elif entity == "POLYLINE":
+            polyline = ([], [], int(_dxf_group(fields).get("70", [0])[0]) & 1)
+        elif not _dxf_entity(curves, entity, fields):
+            skipped[entity] = skipped.get(entity, 0) + 1
+        curves.end_element(_FLIP_Y)
+
+    for code, value in pairs:
+        if code == "0":
+            if in_entities:
+                finish(entity, fields)
+                entity, fields = value, []
+                if value == "ENDSEC":
+                    in_entities, entity = False, None
+            continue
+        if code == "2" and value == "ENTITIES" and entity is None:
+            in_entities = True
+        elif in_entities and entity is not None:
+            fields.append((code, value))
+
+    return curves
+
+
+_FLIP_Y = np.diag([1.0, -1.0, 1.0])
+
+
+def _dxf_group(fields):
+    group = {}
+    for code, value in fields:
+        try:
+            group.setdefault(code, []).append(float(value))
+        except ValueError:
+            pass
+    return group
+
+
+def _dxf_entity(curves, entity, fields):
+    """Thêm một thực thể DXF vào curves, trả về False nếu không hỗ trợ"""
+    group = _dxf_group(fields)
+
+    def first(code, default=0.0):
+        return group.get(code, [default])[0]
+
+    if entity == "LINE":
+        curves.move_to((first("10"), first("20")))
+        curves.line_to((first("11"), first("21")))
+    elif entity == "LWPOLYLINE":
+        # Bulge (42) đi sau đỉnh mà nó thuộc về; đỉnh không có bulge là đoạn thẳng
+        vertices, bulges = [], []
+        for code, value in fields:
+            if code == "10":
+                vertices.append([float(value), 0.0])
+                bulges.append(0.0)
+            elif code == "20" and vertices:
+                vertices[-1][1] = float(value)
+            elif code == "42" and vertices:
+                bulges[-1] = float(value)
+        _dxf_polyline(curves, [tuple(v) for v in vertices], bulges, int(first("70")) & 1)
+    elif entity == "CIRCLE":
+        cx, cy, r = first("10"), first("20"), first("40")
+        if r > 0:
+            curves.move_to((cx + r, cy))
+            curves.arc((cx, cy), r, r, 0.0, 0.0, 2 * math.pi)
+    elif entity == "ARC":
+        cx, cy, r = first("10"), first("20"), first("40")
+        start, end = math.radians(first("50")), math.radians(first("51"))
+        sweep = (end - start) % (2 * math.pi) or 2 * math.pi
+        curves.move_to((cx + r * math.cos(start), cy + r * math.sin(start)))
+        curves.arc((cx, cy), r, r, 0.0, start, sweep)
+    elif entity == "ELLIPSE":
+        cx, cy = first("10"), first("20")
+        mx, my = first("11"), first("21")
+        ratio = first("40", 1.0)
+        start, end = first("41"), first("42", 2 * math.pi)
+        rx = math.hypot(mx, my)
+        if rx == 0:
+            return True
+        rotation = math.atan2(my, mx)
+        sweep = (end - start) % (2 * math.pi) or 2 * math.pi
+        cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+        u, v = rx * math.cos(start), rx * ratio * math.sin(start)
+        curves.move_to((cx + u * cos_r - v * sin_r, cy + u * sin_r + v * cos_r))
+        curves.arc((cx, cy), rx, rx * ratio, rotation, start, sweep)
+    elif entity == "SPLINE":
+        degree = int(first("71", 3))
+        control = list(zip(group.get("10", []), group.get("20", [])))
+        knots = group.get("40", [])
+        weights = group.get("41")
+        if len(control) < 2:
+            return True
+        if len(knots) != len(control) + degree + 1:
+            curves.polyline(control)  # Không có vector nút hợp lệ: nối các điểm điều khiển
+        else:
+            curves.polyline(_bspline_points(np.array(control), np.array(knots), degree,
+                                            np.array(weights) if weights and len(weights) == len(control) else None))
+    else:
+        return False
+    return True
+
+
+def _dxf_polyline(curves, vertices, bulges, closed):
+    if len(vertices) < 2:
+        return
+    curves.move_to(vertices[0])
+    count = len(vertices) if closed else len(vertices) - 1
+    for k in range(count):
+        end = vertices[(k + 1) % len(vertices)]
+        bulge = bulges[k]
+        if bulge == 0 or end == vertices[k]:
+            curves.line_to(end)
+        else:
+            # Bulge = tan(góc ở tâm / 4), dương là ngược chiều kim đồng hồ
+            chord = math.dist(vertices[k], end)
+            radius = chord * (1 + bulge ** 2) / (4 * abs(bulge))
+            curves.arc_to(radius, radius, 0.0, abs(bulge) > 1, bulge > 0, end)
+
+
+def _bspline_points(control, knots, degree, weights=None, samples_per_span=16):
+    """Lấy mẫu B-spline (có thể hữu tỉ) bằng de Boor, vectơ hóa theo tham số
+
+    SPLINE của DXF không đổi được sang Bézier đơn giản như các thực thể khác nên được lấy
+    mẫu đều samples_per_span điểm mỗi khoảng nút (không theo sai số dây cung); CurveSet
+    coi kết quả là các đoạn thẳng.
+    """
+    if weights is None:
+        weights = np.ones(len(control))
+    homogeneous = np.column_stack([control * weights[:, None], weights])
+    spans = [k for k in range(degree, len(control)) if knots[k + 1] > knots[k]]
+    u = np.concatenate([np.linspace(knots[k], knots[k + 1], samples_per_span, endpoint=False) for k in spans]
+                       + [[knots[len(control)]]])
+    span = np.clip(np.searchsorted(knots, u, side="right") - 1, degree, len(control) - 1)
+
+    d = np.stack([homogeneous[span - degree + j] for j in range(degree + 1)], axis=1)
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[span - degree + j]
+            right = knots[span + 1 + j - r]
+            alpha = np.where(right > left, (u - left) / np.where(right > left, right - left, 1), 0.0)[:, None]
+            d[:, j] = (1 - alpha) * d[:, j - 1] + alpha * d[:, j]
+    points = d[:, degree]
+    return [tuple(p) for p in (points[:, :2] / points[:, 2:]).tolist()]
+
+
+def load_vector_drawing(path, tolerance_mm, drawing_size_mm):
+    """Nhập SVG/DXF thành drawing_path như extract_drawing_path, trả về (drawing_path, (cao, rộng), bỏ qua)
+
+    Hình được dời về gốc (0, 0) với trục y hướng xuống như tọa độ ảnh; (cao, rộng) là
+    khung bao, dùng như kích thước ảnh gốc khi chuyển sang tọa độ robot. Đường cong được
+    rời rạc hóa với sai số dây cung tolerance_mm sau khi hình được thu phóng để cạnh dài
+    bằng drawing_size_mm (như convert_to_robot_coords khi không tự căn chỉnh). bỏ qua là
+    số thực thể DXF không hỗ trợ theo loại (rỗng với SVG).
+    """
+    curves = parse_svg(path) if path.lower().endswith(".svg") else parse_dxf(path)
+    curves.end_element()
+    if not curves.curves:
+        return PathBuffer(), (1, 1), curves.skipped
+
+    # Khung bao theo điểm đầu/cuối các đoạn (nằm trên đường cong) nên không lớn hơn khung
+    # thật: sai số quy đổi từ mm sang đơn vị của file không vượt tolerance_mm
+    ends = np.concatenate([c[:, [0, 3]].reshape(-1, 2) for c in curves.curves])
+    lo, hi = ends.min(axis=0), ends.max(axis=0)
+    size = max(float((hi - lo).max()), 1e-9)
+    points, sizes = curves.flatten(tolerance_mm * size / drawing_size_mm)
+
+    points -= points.min(axis=0)
+    width, height = points.max(axis=0)
+
+    drawing_path = PathBuffer(points, np.concatenate(([0], np.cumsum(sizes))))
+    return drawing_path, (max(float(height), 1e-9), max(float(width), 1e-9)), curves.skipped